@@ -1,11 +1,11 @@
-import os
-from pathlib import Path
 import socket
-import sys
 import threading
-import json
-from typing import List, Dict, Any, Optional
+from collections import deque
+from typing import Deque, List, Dict, Any, Optional
 from protocols import Protocols
+from codec import BINARY, CODECS, JSON
+from framing import FrameBuffer
+from lexicon import get_lexicon
 
 class Client:
     def __init__(self, host: str | None = "localhost", port: int | None = 55555) -> None:
@@ -25,8 +25,13 @@ class Client:
         self.started: bool = False
         self.closed: bool = False
 
-        self.guesses: List[List[str]] = []
+        # the server keeps the round's word and colours every guess itself,
+        # results wait here until the game loop shows them
         self.current_round_index: int = 0
+        self.guess_results: Deque[Dict[str, Any]] = deque()
+        # answers this player's guesses still allow and the last hint
+        self.remaining: int = 0
+        self.hint: str = ""
 
         self.opponent_name: str = ""
 
@@ -34,6 +39,11 @@ class Client:
 
         self.points: int = 0
         self.opponent_points: int = 0
+        # points of everyone in the room by name, kept up to date from the
+        # server's standings diffs, rank is this client's place in it
+        self.standings: Dict[str, int] = {}
+        self.rank: int = 0
+        self.room_size: int = 2
 
         self.new_round: bool = False
         self.opponent_left: bool = False
@@ -41,32 +51,47 @@ class Client:
         self.warning : str = ""
 
         self.max_guesses: int = 0
-        self.longer_list: List[str] = []
+        # every guess has to reuse the greens and yellows shown so far
+        self.hard_mode: bool = False
 
         self.leaderboard_data: List[Dict[str, Any]] = []
+        self.leaderboard_page: Dict[str, Any] = {}
+        self.rank_data: Dict[str, Any] = {}
+
+        # json until the server agrees to the binary format
+        self.codec: Any = CODECS[JSON]
+        self.framer: FrameBuffer = FrameBuffer()
+        self.wire_format_set: threading.Event = threading.Event()
 
     # starts thread on receive
     def start(self) -> None:
         receive_thread = threading.Thread(target=self.receive)
         receive_thread.start()
+        self.negotiate_wire_format(BINARY)
+
+    # asks the server to switch wire format, nothing else may be sent until
+    # it answers - an older server never does so the client stays on json
+    def negotiate_wire_format(self, wire_format: str, timeout: float = 2.0) -> None:
+        self.wire_format_set.clear()
+        self.send(Protocols.Request.WIRE_FORMAT, {"format": wire_format})
+        self.wire_format_set.wait(timeout)
 
     # send data
     def send(self, request: str, message: Any) -> None:
-        data: Dict[str, Any] = {"type": request, "data": message}
-        message_str: str = json.dumps(data) + "\n"
-        self.server.send(message_str.encode("ascii"))
+        self.server.sendall(self.codec.encode(request, message))
 
-    # recieves data in json, watches out for newlines
+    # recieves data, json lines or binary frames depending on the wire format
     def receive(self) -> None:
-        buffer: str = ""
+        chunk: bytearray = bytearray(4096)
+        chunk_view: memoryview = memoryview(chunk)
         while not self.closed:
             try:
-                buffer += self.server.recv(1024).decode("ascii")
-                while "\n" in buffer:
-                    line, buffer = buffer.split("\n", 1)
-                    if line.strip() == "":
-                        continue
-                    message: Dict[str, Any] = json.loads(line)
+                size: int = self.server.recv_into(chunk)
+                if not size:
+                    break
+                self.framer.feed(chunk_view[:size])
+                for frame in self.framer:
+                    message: Dict[str, Any] = self.codec.decode(frame)
                     self.handle_response(message)
             except (ConnectionResetError, ConnectionAbortedError, OSError):
                 break
@@ -76,56 +101,9 @@ class Client:
         self.closed = True
         self.server.close()
 
-    # based on the chosen word length fetch the list for word verification
-    def mode_choice(self) -> List[str]:
-        if getattr(sys, 'frozen', False):
-            # running as compiled executable
-            base_dir_str: str = os.path.dirname(sys.executable)
-            base_dir: Path = Path(base_dir_str)
-        else:
-            # running as script
-            base_dir : Path = Path(__file__).resolve().parent
-        
-        word_lists_dir : Path = Path(base_dir) / "word lists"
-        
-        if not word_lists_dir.exists():
-            word_lists_dir = Path(base_dir) / ".." / "word lists"
-
-        base_dir: Path = Path(__file__).resolve().parent
-        word_lists_dir: Path = base_dir / "word lists"
-
-        with open(
-            word_lists_dir / "longerfiveletterwords.txt", 'r'
-            , encoding='utf-8'
-        ) as file:
-            longer_fives: List[str] = file.read().splitlines()
-        with open(
-            word_lists_dir / "longersixletterwords.txt", 'r'
-            , encoding='utf-8'
-        ) as file:
-            longer_sixes: List[str] = file.read().splitlines()
-        with open(
-            word_lists_dir / "longersevenletterwords.txt", 'r'
-            , encoding='utf-8'
-        ) as file:
-            longer_sevens: List[str] = file.read().splitlines()
-
-        longer_list: List[str] = []
-        match self.mode:
-            case 5:
-                longer_list = longer_fives
-            case 6:
-                longer_list = longer_sixes
-            case 7:
-                longer_list = longer_sevens
-            case _:
-                pass
-
-        return longer_list
-
     # checks if submitted word is in fact a real word (zzzzz - isnt)
     def is_word_valid(self, word: str) -> bool:
-        return word.upper() in self.longer_list
+        return get_lexicon().is_guess(self.mode, word.upper())
 
     # handles protocol responses
     def handle_response(self, response: Dict[str, Any]) -> None:
@@ -134,35 +112,76 @@ class Client:
 
         if r_type == Protocols.Response.START:
             self.started = True
-        # receive words to be guessed from server
-        elif r_type == Protocols.Response.GUESSES:
-            self.guesses = data
         # receive settings (word lenght and max attempts)
         elif r_type == Protocols.Response.SETTINGS:
             self.mode = data["mode"]
             self.max_guesses = data["max_guesses"]
-            self.longer_list = self.mode_choice()
-        # set new round variables
-        elif r_type == Protocols.Response.NEW_ROUND:
-            self.current_round_index += 1
-            self.new_round = True
-        # receive opponent data (name and points)
-        elif r_type == Protocols.Response.OPPONENT:
-            self.opponent_name = data.get("name")
-            self.opponent_points = data.get("points", 0)
-        # updates points for players
-        elif r_type == Protocols.Response.POINTS_UPDATE:
-            self.points = data.get("your_points", 0)
-            self.opponent_points = data.get("opponent_points", 0)
+            self.room_size = data.get("players", 2)
+            self.hard_mode = data.get("hard_mode", False)
+            # read in the background, the receive loop goes on at once
+            get_lexicon().preload(self.mode)
+        # a round began, every round after the first also resets the board
+        elif r_type == Protocols.Response.ROUND_START:
+            self.current_round_index = data["round"]
+            self.remaining = data.get("remaining", 0)
+            self.hint = ""
+            if self.current_round_index > 0:
+                self.new_round = True
+        # colours of a guess as scored by the server
+        elif r_type == Protocols.Response.GUESS_RESULT:
+            if "remaining" in data:
+                self.remaining = data["remaining"]
+                self.hint = ""
+            self.guess_results.append(data)
+        # a word that still fits the guesses so far
+        elif r_type == Protocols.Response.HINT:
+            if data["round"] == self.current_round_index:
+                self.remaining = data["remaining"]
+                self.hint = data["hint"] or ""
+        # points that changed in the room (or the whole table)
+        elif r_type == Protocols.Response.STANDINGS:
+            self.update_standings(data)
         # recieves winner
         elif r_type == Protocols.Response.WINNER:
             self.winner = data
         # receives leaderboard data
         elif r_type == Protocols.Response.LEADERBOARD:
             self.leaderboard_data = data
+        # receives one page of the leaderboard (rows + cursor for the next)
+        elif r_type == Protocols.Response.LEADERBOARD_PAGE:
+            self.leaderboard_page = data
+        # receives a player's rank and the players around it
+        elif r_type == Protocols.Response.RANK:
+            self.rank_data = data
         # warning from server
         elif r_type == Protocols.Response.INVALID_REQUEST:
             self.warning = data
         # opponent has left
         elif r_type == Protocols.Response.OPPONENT_LEFT:
             self.opponent_left = True
+        # server switched wire format, every following frame uses it
+        elif r_type == Protocols.Response.WIRE_FORMAT:
+            wire_format: str = data.get("format", JSON)
+            self.codec = CODECS.get(wire_format, CODECS[JSON])
+            self.framer.length_prefixed = wire_format == BINARY
+            self.wire_format_set.set()
+
+    # applies a standings diff, then picks this player's points and rank and
+    # the best placed other player as the opponent shown next to them
+    def update_standings(self, data: Dict[str, Any]) -> None:
+        if data.get("full"):
+            self.standings.clear()
+        for row in data.get("players", []):
+            self.standings[row["name"]] = row["points"]
+        for name in data.get("left", []):
+            self.standings.pop(name, None)
+
+        ranked: List[str] = sorted(
+            self.standings, key=lambda name: (-self.standings[name], name)
+        )
+        self.points = self.standings.get(self.nickname, 0)
+        self.rank = ranked.index(self.nickname) + 1 if self.nickname in ranked else 0
+        others: List[str] = [name for name in ranked if name != self.nickname]
+        if others:
+            self.opponent_name = others[0]
+            self.opponent_points = self.standings[others[0]]
@@ -0,0 +1,275 @@
+import json
+import struct
+from typing import Any, Dict, List, Optional, Set, Tuple
+from protocols import Protocols
+from framing import LENGTH_PREFIX
+
+JSON: str = "json"
+BINARY: str = "binary"
+
+# binary frame: body length, message type id, body kind, body
+TYPE_AND_KIND: struct.Struct = struct.Struct(">BB")
+
+# how the body of a binary frame is encoded
+KIND_NONE: int = 0
+KIND_PACKED: int = 1
+KIND_TEXT: int = 2
+KIND_JSON: int = 3
+
+
+# numbers every message type of a Protocols class in declaration order
+def message_ids(protocol_class: type, start: int) -> Dict[str, int]:
+    names: List[str] = [
+        value for key, value in vars(protocol_class).items()
+        if not key.startswith("_") and isinstance(value, str)
+    ]
+    return {name: start + index for index, name in enumerate(names)}
+
+
+# responses and requests get separate ranges so one byte tells them apart
+MESSAGE_IDS: Dict[str, int] = {
+    **message_ids(Protocols.Response, 1),
+    **message_ids(Protocols.Request, 128),
+}
+MESSAGE_TYPES: Dict[int, str] = {
+    message_id: name for name, message_id in MESSAGE_IDS.items()
+}
+
+# length prefix of a string inside a packed body
+TEXT_LENGTH: struct.Struct = struct.Struct(">H")
+
+
+# a message that does not fit its packed layout goes out as json instead
+class DoesNotFit(Exception):
+    pass
+
+
+def pack_text(text: Any) -> bytes:
+    if not isinstance(text, str):
+        raise DoesNotFit(text)
+    data = text.encode("utf-8")
+    return TEXT_LENGTH.pack(len(data)) + data
+
+
+def unpack_text(body: bytes, offset: int) -> Tuple[str, int]:
+    (size,) = TEXT_LENGTH.unpack_from(body, offset)
+    offset += TEXT_LENGTH.size
+    return body[offset:offset + size].decode("utf-8"), offset + size
+
+
+# struct values must keep their python type through a round trip ('?' would
+# turn 1 into True and 'i' would reject or truncate anything else)
+def check_types(values: Tuple[Any, ...], types: Tuple[type, ...]) -> None:
+    for value, value_type in zip(values, types):
+        if type(value) is not value_type:
+            raise DoesNotFit(value)
+
+
+# a message with a fixed set of number fields
+class FixedLayout:
+    def __init__(
+        self, layout: str, fields: Tuple[str, ...], types: Tuple[type, ...]
+    ) -> None:
+        self.layout: struct.Struct = struct.Struct(layout)
+        self.fields: Tuple[str, ...] = fields
+        self.types: Tuple[type, ...] = types
+
+    def pack(self, data: Dict[str, Any]) -> bytes:
+        if set(data.keys()) != set(self.fields):
+            raise DoesNotFit(data)
+        values = tuple(data[f] for f in self.fields)
+        check_types(values, self.types)
+        return self.layout.pack(*values)
+
+    def unpack(self, body: bytes) -> Dict[str, Any]:
+        return dict(zip(self.fields, self.layout.unpack(body)))
+
+
+# GUESS_RESULT - round, guess count and solved always, the guessed word with
+# its pattern and the words left after a guess, the answer once it is shown
+class GuessResultLayout:
+    HEAD: struct.Struct = struct.Struct(">BIB?")
+    PATTERN: struct.Struct = struct.Struct(">HI")
+    REQUIRED: Tuple[str, ...] = ("round", "guess", "solved")
+    GUESSED: Tuple[str, ...] = ("word", "pattern", "remaining")
+
+    # flags byte
+    HAS_GUESS: int = 1
+    HAS_ANSWER: int = 2
+
+    def pack(self, data: Dict[str, Any]) -> bytes:
+        keys = set(data.keys())
+        flags = 0
+        if keys >= set(self.GUESSED):
+            flags |= self.HAS_GUESS
+            keys -= set(self.GUESSED)
+        if "answer" in keys:
+            flags |= self.HAS_ANSWER
+            keys.discard("answer")
+        if keys != set(self.REQUIRED):
+            raise DoesNotFit(data)
+
+        head = (data["round"], data["guess"], data["solved"])
+        check_types(head, (int, int, bool))
+        body = self.HEAD.pack(flags, *head)
+        if flags & self.HAS_GUESS:
+            pattern = (data["pattern"], data["remaining"])
+            check_types(pattern, (int, int))
+            body += pack_text(data["word"]) + self.PATTERN.pack(*pattern)
+        if flags & self.HAS_ANSWER:
+            body += pack_text(data["answer"])
+        return body
+
+    def unpack(self, body: bytes) -> Dict[str, Any]:
+        flags, round_number, guess, solved = self.HEAD.unpack_from(body)
+        offset = self.HEAD.size
+        data: Dict[str, Any] = {"round": round_number}
+        if flags & self.HAS_GUESS:
+            data["word"], offset = unpack_text(body, offset)
+            data["pattern"], data["remaining"] = (
+                self.PATTERN.unpack_from(body, offset)
+            )
+            offset += self.PATTERN.size
+        data["guess"] = guess
+        data["solved"] = solved
+        if flags & self.HAS_ANSWER:
+            data["answer"], offset = unpack_text(body, offset)
+        return data
+
+
+# STANDINGS - round and whether the table is full, then every changed player
+# (points, rank, name) and the names of the players who left
+class StandingsLayout:
+    HEAD: struct.Struct = struct.Struct(">I?HH")
+    PLAYER: struct.Struct = struct.Struct(">iH")
+    KEYS: Set[str] = {"players", "left", "round", "full"}
+
+    def pack(self, data: Dict[str, Any]) -> bytes:
+        if set(data.keys()) != self.KEYS:
+            raise DoesNotFit(data)
+        players, left = data["players"], data["left"]
+        if not isinstance(players, list) or not isinstance(left, list):
+            raise DoesNotFit(data)
+        check_types((data["round"], data["full"]), (int, bool))
+
+        parts = [
+            self.HEAD.pack(data["round"], data["full"], len(players), len(left))
+        ]
+        for player in players:
+            if not isinstance(player, dict) or (
+                set(player.keys()) != {"name", "points", "rank"}
+            ):
+                raise DoesNotFit(player)
+            check_types((player["points"], player["rank"]), (int, int))
+            parts.append(self.PLAYER.pack(player["points"], player["rank"]))
+            parts.append(pack_text(player["name"]))
+        for name in left:
+            parts.append(pack_text(name))
+        return b"".join(parts)
+
+    def unpack(self, body: bytes) -> Dict[str, Any]:
+        round_number, full, player_count, left_count = (
+            self.HEAD.unpack_from(body)
+        )
+        offset = self.HEAD.size
+        players: List[Dict[str, Any]] = []
+        for _ in range(player_count):
+            points, rank = self.PLAYER.unpack_from(body, offset)
+            name, offset = unpack_text(body, offset + self.PLAYER.size)
+            players.append({"name": name, "points": points, "rank": rank})
+        left: List[str] = []
+        for _ in range(left_count):
+            name, offset = unpack_text(body, offset)
+            left.append(name)
+        return {
+            "players": players, "left": left,
+            "round": round_number, "full": full
+        }
+
+
+# messages that go out packed instead of json, the ones sent most often
+PACKED_LAYOUTS: Dict[str, Any] = {
+    Protocols.Response.SETTINGS: FixedLayout(
+        ">BBH?B?",
+        ("mode", "max_guesses", "rounds", "infinite", "players", "hard_mode"),
+        (int, int, int, bool, int, bool)
+    ),
+    Protocols.Response.ROUND_START: FixedLayout(
+        ">II", ("round", "remaining"), (int, int)
+    ),
+    Protocols.Response.GUESS_RESULT: GuessResultLayout(),
+    Protocols.Response.STANDINGS: StandingsLayout(),
+}
+
+
+# the newline delimited json every client speaks by default
+class JsonCodec:
+    name: str = JSON
+
+    def encode(self, r_type: str, data: Any) -> bytes:
+        message = {"type": r_type, "data": data}
+        return (json.dumps(message) + "\n").encode("ascii")
+
+    def decode(self, frame: bytes) -> Dict[str, Any]:
+        return json.loads(frame.decode("ascii"))
+
+
+# compact length prefixed frames, switched on by the WIRE_FORMAT handshake
+class BinaryCodec:
+    name: str = BINARY
+
+    def encode(self, r_type: str, data: Any) -> bytes:
+        message_id: Optional[int] = MESSAGE_IDS.get(r_type)
+        if message_id is None:
+            raise ValueError(f"Unknown message type: {r_type}")
+
+        kind, body = self.encode_body(r_type, data)
+        return (
+            LENGTH_PREFIX.pack(TYPE_AND_KIND.size + len(body))
+            + TYPE_AND_KIND.pack(message_id, kind)
+            + body
+        )
+
+    # picks the smallest body encoding that keeps the data intact
+    def encode_body(self, r_type: str, data: Any) -> Tuple[int, bytes]:
+        if data is None:
+            return KIND_NONE, b""
+
+        layout = PACKED_LAYOUTS.get(r_type)
+        if layout is not None and isinstance(data, dict):
+            try:
+                return KIND_PACKED, layout.pack(data)
+            except (DoesNotFit, struct.error):
+                pass  # out of range for the layout, send it as json
+
+        if isinstance(data, str):
+            return KIND_TEXT, data.encode("utf-8")
+
+        return KIND_JSON, json.dumps(data).encode("ascii")
+
+    # takes a frame without its length header (see FrameBuffer)
+    def decode(self, frame: bytes) -> Dict[str, Any]:
+        message_id, kind = TYPE_AND_KIND.unpack_from(frame)
+        r_type = MESSAGE_TYPES.get(message_id)
+        if r_type is None:
+            raise ValueError(f"Unknown message id: {message_id}")
+
+        body = frame[TYPE_AND_KIND.size:]
+        return {"type": r_type, "data": self.decode_body(r_type, kind, body)}
+
+    def decode_body(self, r_type: str, kind: int, body: bytes) -> Any:
+        if kind == KIND_NONE:
+            return None
+        if kind == KIND_PACKED:
+            return PACKED_LAYOUTS[r_type].unpack(body)
+        if kind == KIND_TEXT:
+            return body.decode("utf-8")
+        if kind == KIND_JSON:
+            return json.loads(body.decode("ascii"))
+        raise ValueError(f"Unknown body kind: {kind}")
+
+
+CODECS: Dict[str, Any] = {
+    JSON: JsonCodec(),
+    BINARY: BinaryCodec(),
+}
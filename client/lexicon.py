@@ -0,0 +1,97 @@
+import os
+import sys
+import threading
+from pathlib import Path
+from typing import Collection, Dict, List, Optional
+from packed_lexicon import PackedLexicon, SOURCE_FILES, open_lexicon
+
+# the word lists next to the executable when compiled, next to this file
+# when run as a script
+def word_lists_dir() -> Path:
+    candidates: List[Path] = []
+    if getattr(sys, 'frozen', False):
+        base_dir: Path = Path(os.path.dirname(sys.executable))
+        candidates += [base_dir / "word lists", base_dir / ".." / "word lists"]
+    candidates.append(Path(__file__).resolve().parent / "word lists")
+
+    for directory in candidates:
+        if directory.exists():
+            return directory
+    return candidates[-1]
+
+
+# guess lists of the client - memory mapped from the compiled lexicon file
+# when it is built (see packed_lexicon.py), otherwise each length is read
+# once per process as a frozenset on a background thread so the network
+# thread never waits on the disk
+class ClientLexicon:
+    def __init__(self, directory: Optional[Path] = None) -> None:
+        self.directory: Path = directory or word_lists_dir()
+        self.lock: threading.Lock = threading.Lock()
+        # opened with the first length asked for, None without the file
+        self.packed: Optional[PackedLexicon] = None
+        self.packed_checked: bool = False
+        self.words: Dict[int, Collection[str]] = {}
+        # set once a length's list is in self.words (or failed to load)
+        self.loaded: Dict[int, threading.Event] = {}
+
+    # starts loading a length's list unless it is loaded or loading already,
+    # returns at once
+    def preload(self, mode: int) -> threading.Event:
+        with self.lock:
+            loaded = self.loaded.get(mode)
+            if loaded is None:
+                loaded = self.loaded[mode] = threading.Event()
+                if not self.packed_checked:
+                    self.packed = open_lexicon(self.directory)
+                    self.packed_checked = True
+                if self.packed is not None:
+                    # a single mmap call, nothing left to wait for
+                    self.words[mode] = self.packed.guesses.get(mode, ())
+                    loaded.set()
+                    return loaded
+                threading.Thread(
+                    target=self.load, args=(mode, loaded), daemon=True
+                ).start()
+            return loaded
+
+    # the accepted guesses and the answers, as the server takes them
+    def load(self, mode: int, loaded: threading.Event) -> None:
+        try:
+            file_names = SOURCE_FILES.get(mode)
+            if file_names is not None:
+                words: List[str] = []
+                for file_name in file_names:
+                    with open(
+                        self.directory / file_name, 'r', encoding='utf-8'
+                    ) as file:
+                        words += file.read().splitlines()
+                self.words[mode] = frozenset(words)
+        finally:
+            loaded.set()
+
+    # a length's words, waits for a load still running
+    def guess_list(self, mode: int) -> Collection[str]:
+        words = self.words.get(mode)
+        if words is not None:
+            return words
+        self.preload(mode).wait()
+        return self.words.get(mode, ())
+
+    # whether the word (upper case) may be guessed in this mode
+    def is_guess(self, mode: int, word: str) -> bool:
+        return word in self.guess_list(mode)
+
+
+lexicon_lock: threading.Lock = threading.Lock()
+shared_lexicon: Optional[ClientLexicon] = None
+
+
+# the process wide lexicon, lists are loaded the first time a length is used
+def get_lexicon() -> ClientLexicon:
+    global shared_lexicon
+    if shared_lexicon is None:
+        with lexicon_lock:
+            if shared_lexicon is None:
+                shared_lexicon = ClientLexicon()
+    return shared_lexicon
@@ -4,6 +4,7 @@ from typing import Any, Dict, List, Optional, Tuple, Union
 import pygame
 from client_s import Client
 from protocols import Protocols
+from constraints import Constraints
 
 
 class CellColors(Enum):
@@ -125,13 +126,15 @@ class Wordle:
         )
 
         self.round_active: bool = False
+        # a guess was sent and the server has not coloured it yet
+        self.awaiting_result: bool = False
+        # round the board shows, results of an older one are dropped
+        self.board_round: int = 0
         self.mode: int = 5
         self.amount_of_guesses: int = 6
 
         self.board: List[List[Cell]] = []
 
-        self.round_start_time: float = time.time()
-
         self.guess_list: List[List[str]] = [[] for _ in range(self.amount_of_guesses)]
         self.word_number: int = 0
         self.letter_number: int = 0
@@ -140,6 +143,8 @@ class Wordle:
             getattr(pygame, f"K_{chr(i)}") for i in range(ord('a'), ord('z') + 1)
         ]
 
+        self.hint_button: Optional[Button] = None
+
         self.startup_buttons: List[Button] = []
         self.create_buttons: Dict[str, Button] = {}
         self.create_input_boxes: Dict[str, InputBox] = {}
@@ -154,6 +159,11 @@ class Wordle:
         self.warning_text: str = ""
 
         self.infinite_mode: bool = False
+        self.hard_mode: bool = False
+        # hard mode rules from the rows coloured this round
+        self.constraints: Constraints = Constraints(self.mode)
+        # bot difficulty the free seats are filled with, None for people
+        self.bot_level: Optional[str] = None
 
         self.keyboard_letters: Dict[str, CellColors] = {
             'A': CellColors.WHITE, 'B': CellColors.WHITE, 'C': CellColors.WHITE,
@@ -339,6 +349,8 @@ class Wordle:
                                    text='5',max_length=3),
                 "room_code": InputBox((box_x, start_y + 4 * step, 100, 40), self.font,
                                       text='ABCD',max_length=4),
+                "players": InputBox((box_x + 220, start_y + 4 * step, 50, 40), self.font,
+                                    text='2',max_length=2),
             }
             self.create_buttons = {
                 "infinite": Button(
@@ -347,12 +359,30 @@ class Wordle:
                     self.font,
                     bg_color=(250, 150, 150)
                 ),
+                "hard": Button(
+                    (100, start_y + 5 * step, 150, 40),
+                    "Hard: OFF",
+                    self.font,
+                    bg_color=(250, 150, 150)
+                ),
+                "bot": Button(
+                    (440, start_y + 5 * step, 170, 40),
+                    "Bot: OFF",
+                    self.font,
+                    bg_color=(250, 150, 150)
+                ),
                 "start": Button(
                     (270, start_y + 6 * step, 100, 40),
                     "Start",
                     self.font,
                     bg_color=(180, 180, 180)
                 ),
+                "quick": Button(
+                    (390, start_y + 6 * step, 170, 40),
+                    "Quick Match",
+                    self.font,
+                    bg_color=(150, 200, 250)
+                ),
             }
         labels = [
             ("Nickname:", 140),
@@ -364,6 +394,8 @@ class Wordle:
         for text, y in labels:
             label_surface = self.font.render(text, True, (0, 0, 0))
             screen.blit(label_surface, (120, y))
+        players_label = self.font.render("Players:", True, (0, 0, 0))
+        screen.blit(players_label, (470, 420))
         for box in self.create_input_boxes.values():
             box.draw(screen)
         for btn in self.create_buttons.values():
@@ -375,6 +407,12 @@ class Wordle:
         self.font = pygame.font.SysFont('Arial', 30)
 
         text = "Waiting For Player..."
+        # bigger rooms start once every seat is taken
+        if self.client.room_size > 2 and self.client.standings:
+            text = (
+                f"Waiting For Players "
+                f"{len(self.client.standings)}/{self.client.room_size}"
+            )
 
         text_surface = self.font.render(text, True, (0, 0, 0))
         screen.blit(
@@ -392,7 +430,7 @@ class Wordle:
         score_box_x = 20
         score_box_y = 150
         box_width = 140
-        box_height = 120
+        box_height = 150 if len(self.client.standings) > 2 else 120
 
         # draw score box background
         pygame.draw.rect(
@@ -424,6 +462,15 @@ class Wordle:
             )
             screen.blit(opponent_score, (score_box_x + 20, score_box_y + 80))
 
+        # with more than one opponent only the best placed one is named
+        if len(self.client.standings) > 2:
+            rank_text = score_font.render(
+                f"Rank: {self.client.rank}/{len(self.client.standings)}",
+                True,
+                (0, 0, 0)
+            )
+            screen.blit(rank_text, (score_box_x + 20, score_box_y + 110))
+
     # draws the guessing board
     def draw_game(self, screen: pygame.Surface) -> None:
         cell_size = 50
@@ -448,9 +495,35 @@ class Wordle:
                     screen.blit(cell.letter, (cell.x, cell.y))
 
         self.draw_score(screen)
+        self.draw_remaining(screen)
 
         self.draw_keyboard(screen)
 
+    # answers still possible after this player's guesses (counted on the
+    # server) and the hint button under the score box
+    def draw_remaining(self, screen: pygame.Surface) -> None:
+        info_font = pygame.font.SysFont('Arial', 22)
+        remaining = self.client.remaining
+        lines = [
+            f"{remaining} word{'' if remaining == 1 else 's'}",
+            "remain"
+        ]
+        for index, line in enumerate(lines):
+            text = info_font.render(line, True, (0, 0, 0))
+            screen.blit(text, (30, 320 + index * 26))
+
+        if self.hint_button is None:
+            self.hint_button = Button(
+                (20, 390, 140, 40), "Hint", info_font, bg_color=(250, 220, 120)
+            )
+        self.hint_button.draw(screen)
+
+        if self.client.hint:
+            hint_text = info_font.render(
+                f"Try {self.client.hint}", True, (0, 0, 150)
+            )
+            screen.blit(hint_text, (25, 440))
+
     # resets board state
     def reset_board(self) -> None:
         self.board = [[Cell() for _ in range(self.mode)]
@@ -458,7 +531,9 @@ class Wordle:
         self.guess_list = [[] for _ in range(self.amount_of_guesses)]
         self.word_number = 0
         self.letter_number = 0
-        self.round_start_time = time.time()
+        self.awaiting_result = False
+        self.board_round = self.client.current_round_index
+        self.constraints = Constraints(self.mode)
 
         self.client.warning = ""
         self.warning_text = ""
@@ -503,70 +578,47 @@ class Wordle:
 
         pygame.display.flip()
 
-    # color each cell based on the validity of the guess
-    def guessing(self, row: int, guess_letters: List[str], word: str) -> bool:
-        guess = ''.join(guess_letters).upper()
-        guess_letters = list(guess)
-        letters = list(word.upper())
-
-        # handle keyboard letter statuses
-        letter_status: Dict[str, CellColors] = {}
-
-        for index, letter in enumerate(letters):
-            if letter == guess_letters[index]:
-                letter_status[letter] = CellColors.GREEN
-
-        for index, guess_letter in enumerate(guess_letters):
-            if guess_letter in letters and guess_letter != letters[index]:
-                if guess_letter not in letter_status:
-                    letter_status[guess_letter] = CellColors.YELLOW
-
-        for guess_letter in guess_letters:
-            if guess_letter not in letters:
-                letter_status[guess_letter] = CellColors.BLACK
-
-        for letter, status in letter_status.items():
-            current_status = self.keyboard_letters.get(letter, CellColors.WHITE)
-
-            if status == CellColors.GREEN:
-                self.keyboard_letters[letter] = CellColors.GREEN
-            elif (
-                status == CellColors.YELLOW
-                and current_status not in [CellColors.GREEN]
-            ):
-                self.keyboard_letters[letter] = CellColors.YELLOW
-            elif status == CellColors.BLACK and current_status == CellColors.WHITE:
-                self.keyboard_letters[letter] = CellColors.BLACK
-
-        # logic
-        if guess == word:
-            for cell in self.board[row]:
-                cell.color = CellColors.GREEN
-            return True
-        else:
-            to_be_guessed = list(letters)
-
-            for index, letter in enumerate(letters):
-                if letter == guess_letters[index]:
-                    if guess_letters[index] not in to_be_guessed:
-                        for cell in self.board[row]:
-                            if cell.text == guess_letters[index] and cell.color == CellColors.YELLOW:
-                                setattr(cell, 'color', CellColors.BLACK)
-                        to_be_guessed.append(guess_letters[index])
-
-                    to_be_guessed.remove(guess_letters[index])
-                    color = CellColors.GREEN
-                elif guess_letters[index] in to_be_guessed:
-                    to_be_guessed.remove(guess_letters[index])
-                    color = CellColors.YELLOW
-
-                else:
-                    color = CellColors.BLACK
-
-                self.board[row][index].text = guess_letters[index]
+    # colours a row and the keyboard with the server's result for a guess,
+    # the pattern has one base 3 digit per letter (0 absent, 1 present,
+    # 2 in place)
+    def show_guess_result(self, result: Dict[str, Any]) -> None:
+        self.awaiting_result = False
+        if result.get("round") != self.board_round:
+            return  # the board already moved on to the next round
+
+        word: str = result.get("word", "")
+        if word:
+            # the next guess is checked against this row without going
+            # over the board again
+            self.constraints.update(word, result["pattern"])
+            row = result["guess"] - 1
+            colors = [CellColors.BLACK, CellColors.YELLOW, CellColors.GREEN]
+            code: int = result["pattern"]
+            for index, letter in enumerate(word):
+                code, digit = divmod(code, 3)
+                color = colors[digit]
+                self.board[row][index].text = letter
                 self.board[row][index].color = color
 
-        return False
+                current_status = self.keyboard_letters.get(letter, CellColors.WHITE)
+                if color == CellColors.GREEN:
+                    self.keyboard_letters[letter] = CellColors.GREEN
+                elif color == CellColors.YELLOW and current_status != CellColors.GREEN:
+                    self.keyboard_letters[letter] = CellColors.YELLOW
+                elif color == CellColors.BLACK and current_status == CellColors.WHITE:
+                    self.keyboard_letters[letter] = CellColors.BLACK
+
+        self.letter_number = 0
+        if result.get("solved"):
+            self.warning_text = "You guessed it right!"
+            self.round_active = False
+        elif "answer" in result:
+            self.warning_text = (
+                f"You didn't guess it! The word was {result['answer']}"
+            )
+            self.round_active = False
+        else:
+            self.word_number = result["guess"]
 
     # main handle function that alternates between states
     def handle_event(self, event: pygame.event.Event) -> None:
@@ -617,6 +669,7 @@ class Wordle:
             if not room_code or not nickname:
                 return
 
+            self.client.nickname = nickname
             self.client.send(Protocols.Request.JOIN_GAME, {
                 "room_code": room_code,
                 "nickname": nickname
@@ -651,6 +704,37 @@ class Wordle:
                     btn.bg_color = (250, 150, 150)
                     self.create_input_boxes["rounds"].toggle()
 
+            if self.create_buttons["hard"].is_clicked(event.pos):
+                self.hard_mode = not self.hard_mode
+                btn = self.create_buttons["hard"]
+                if self.hard_mode:
+                    btn.text = "Hard: ON"
+                    btn.bg_color = (150, 250, 150)
+                else:
+                    btn.text = "Hard: OFF"
+                    btn.bg_color = (250, 150, 150)
+
+            # off -> easy -> normal -> hard -> off
+            if self.create_buttons["bot"].is_clicked(event.pos):
+                levels = [None, "easy", "normal", "hard"]
+                self.bot_level = levels[
+                    (levels.index(self.bot_level) + 1) % len(levels)
+                ]
+                btn = self.create_buttons["bot"]
+                if self.bot_level is None:
+                    btn.text = "Bot: OFF"
+                    btn.bg_color = (250, 150, 150)
+                else:
+                    btn.text = f"Bot: {self.bot_level.upper()}"
+                    btn.bg_color = (150, 250, 150)
+
+        # quick match uses the same settings but finds the opponent (and the
+        # room) on the server, so no room code is needed
+        send_match = (
+            event.type == pygame.MOUSEBUTTONDOWN
+            and self.create_buttons["quick"].is_clicked(event.pos)
+        )
+
         if event.type == pygame.MOUSEBUTTONDOWN:
             if self.create_buttons["start"].is_clicked(event.pos):
                 send_create = True
@@ -661,12 +745,13 @@ class Wordle:
         else:
             send_create = False
 
-        if send_create:
+        if send_create or send_match:
             nickname = self.create_input_boxes["nickname"].text.strip()[:15]
             c_mode = self.create_input_boxes["mode"].text
             c_attempts = self.create_input_boxes["attempts"].text
             c_rounds = self.create_input_boxes["rounds"].text
             c_room_code = self.create_input_boxes["room_code"].text.strip()[:4]
+            c_players = self.create_input_boxes["players"].text
 
             is_mode_valid = c_mode.isdigit() and int(c_mode) in range(5, 8)
             is_attempts_valid = (
@@ -674,10 +759,12 @@ class Wordle:
                 and int(c_attempts) in range(2, int(c_mode) + 2)
             )
             is_rounds_valid = c_rounds.isdigit() and int(c_rounds)>0
+            is_players_valid = c_players.isdigit() and int(c_players) in range(2, 65)
 
             are_inputs_invalid = (
-                not nickname or not c_room_code or not is_rounds_valid
+                not nickname or not is_rounds_valid
                 or not is_mode_valid or not is_attempts_valid
+                or (send_create and (not c_room_code or not is_players_valid))
             )
             if are_inputs_invalid:
                 self.warning_text = "Please make sure all fields are valid!"
@@ -695,20 +782,33 @@ class Wordle:
 
             self.mode = payload["mode"]
             self.amount_of_guesses = payload["attempts"]
+            self.client.nickname = nickname
 
-            self.client.send(Protocols.Request.CREATE_GAME, payload)
+            if send_match:
+                # quick matches are always one on one
+                del payload["room_code"]
+                self.client.send(Protocols.Request.FIND_MATCH, payload)
+            else:
+                payload["players"] = int(c_players)
+                payload["hard_mode"] = self.hard_mode
+                if self.bot_level is not None:
+                    # bots take every free seat, the game starts right away
+                    payload["bot"] = self.bot_level
+                self.client.send(Protocols.Request.CREATE_GAME, payload)
             self.game_state = "waiting"
 
     # handles the game scene, which is just a basic wordle gameset
     def handle_wordle_event(self, event: pygame.event.Event) -> None:
         self.font = pygame.font.SysFont('Arial', 30)
 
-        if self.client.current_round_index >= len(self.client.guesses):
-            return
-
-        chosen_word = self.client.guesses[self.client.current_round_index]
+        if (
+            self.round_active and event.type == pygame.MOUSEBUTTONDOWN
+            and self.hint_button is not None
+            and self.hint_button.is_clicked(event.pos)
+        ):
+            self.client.send(Protocols.Request.HINT, {})
 
-        if self.round_active:
+        if self.round_active and not self.awaiting_result:
             if event.type == pygame.KEYDOWN:
                 # delete character
                 if event.key == pygame.K_BACKSPACE:
@@ -733,47 +833,21 @@ class Wordle:
                         self.warning_text = "Invalid word"
                         return
 
-                    self.warning_text = ""
-
-                    if self.guessing(
-                        self.word_number,
-                        self.guess_list[self.word_number],
-                        ''.join(chosen_word)
-                    ):
-                        self.warning_text = "You guessed it right!"
-                        guess_str = ''.join(self.guess_list[self.word_number])
-                        seconds_taken = time.time() - self.round_start_time
-
-                        payload = {
-                            "guess": guess_str,
-                            "guesses_used": self.word_number + 1,
-                            "seconds": seconds_taken,
-                            "success": True
-                        }
-
-                        self.client.send(Protocols.Request.ANSWER, payload)
-
-                    else:
-                        self.word_number += 1
-
-                        if self.word_number == self.amount_of_guesses:
-                            seconds_taken = time.time() - self.round_start_time
-                            guess_str = ''.join(self.guess_list[self.word_number - 1])
-
-                            payload = {
-                                "guess": guess_str,
-                                "guesses_used": self.word_number + 1,
-                                "seconds": seconds_taken,
-                                "success": False
-                            }
+                    if self.client.hard_mode:
+                        violation = self.constraints.violation(
+                            ''.join(self.guess_list[self.word_number]).upper()
+                        )
+                        if violation is not None:
+                            self.warning_text = violation
+                            return
 
-                            self.client.send(Protocols.Request.ANSWER, payload)
-                            self.warning_text = (
-                                f"You didn't guess it! "
-                                f"The word was {''.join(chosen_word)}"
-                            )
+                    self.warning_text = ""
 
-                    self.letter_number = 0
+                    # the server colours the guess, see show_guess_result
+                    self.awaiting_result = True
+                    self.client.send(Protocols.Request.GUESS, {
+                        "word": ''.join(self.guess_list[self.word_number]).upper()
+                    })
 
                 elif (
                     event.key in self.valid_letter_inputs
@@ -806,9 +880,14 @@ class Wordle:
         self.client.winner = None
 
         self.client.current_round_index = 0
-        self.client.guesses = []
+        self.client.guess_results.clear()
+        self.client.remaining = 0
+        self.client.hint = ""
         self.client.points = 0
         self.client.opponent_points = 0
+        self.client.opponent_name = ""
+        self.client.standings = {}
+        self.client.rank = 0
 
     # handles the end state for the game
     def handle_end(self, screen: pygame.Surface) -> None:
@@ -868,6 +947,11 @@ class Wordle:
             if self.client.warning:
                 self.warning_text = self.client.warning
                 self.client.warning = ""
+                # a rejected guess is never coloured, let the player retype
+                self.awaiting_result = False
+
+            while self.client.guess_results:
+                self.show_guess_result(self.client.guess_results.popleft())
 
             self.draw(screen)
 
@@ -881,7 +965,9 @@ class Wordle:
                         for _ in range(self.amount_of_guesses)
                     ]
                     self.round_active = True
-                    self.round_start_time = time.time()
+                    self.awaiting_result = False
+                    self.board_round = self.client.current_round_index
+                    self.constraints = Constraints(self.mode)
 
             if self.client.new_round:
                 time.sleep(1)
@@ -0,0 +1,102 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Optional, Tuple
+
+# tasks one mailbox runs before giving its worker back to other rooms
+MAX_TASKS_PER_TURN: int = 32
+
+Task = Callable[[], Any]
+
+
+# serial executor owned by one room - tasks run one at a time in the order
+# they were submitted, different rooms' mailboxes run in parallel on the
+# shared worker pool so no lock is needed around a room's state
+class Mailbox:
+    def __init__(
+        self,
+        pool: ThreadPoolExecutor,
+        after_task: Optional[Callable[[], None]] = None,
+        after_drain: Optional[Callable[[], None]] = None
+    ) -> None:
+        self.pool: ThreadPoolExecutor = pool
+        self.after_task: Optional[Callable[[], None]] = after_task
+        # runs once the worker is done with this mailbox for now, work
+        # batched over the tasks of one turn goes out here
+        self.after_drain: Optional[Callable[[], None]] = after_drain
+        self.lock: threading.Lock = threading.Lock()
+        self.tasks: Deque[Tuple[Task, Future]] = deque()
+        # True while a worker owns this mailbox
+        self.scheduled: bool = False
+
+    def submit(self, task: Task) -> Future:
+        future: Future = Future()
+        with self.lock:
+            self.tasks.append((task, future))
+            if self.scheduled:
+                return future
+            self.scheduled = True
+        self.schedule()
+        return future
+
+    # hands the mailbox to a worker - once the pool is shut down (the server
+    # is stopping) the caller drains it itself, so nothing waits forever on
+    # a task no worker will run
+    def schedule(self) -> None:
+        try:
+            self.pool.submit(self.drain)
+        except RuntimeError:
+            self.drain()
+
+    def drain(self) -> None:
+        for _ in range(MAX_TASKS_PER_TURN):
+            with self.lock:
+                if not self.tasks:
+                    break
+                task, future = self.tasks.popleft()
+
+            try:
+                future.set_result(task())
+            except BaseException as error:
+                future.set_exception(error)
+            finally:
+                if self.after_task is not None:
+                    self.after_task()
+
+        # still owned here, so after_drain sees the room's state alone
+        if self.after_drain is not None:
+            self.after_drain()
+
+        with self.lock:
+            if not self.tasks:
+                self.scheduled = False
+                return
+        # let other rooms have the worker, keep the order by rescheduling
+        self.schedule()
+
+    def pending(self) -> int:
+        with self.lock:
+            return len(self.tasks)
+
+
+# worker threads shared by every room's mailbox
+class ActorPool:
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        after_task: Optional[Callable[[], None]] = None,
+        after_drain: Optional[Callable[[], None]] = None
+    ) -> None:
+        self.pool: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=workers or min(32, (os.cpu_count() or 1) + 4),
+            thread_name_prefix="room"
+        )
+        self.after_task: Optional[Callable[[], None]] = after_task
+        self.after_drain: Optional[Callable[[], None]] = after_drain
+
+    def mailbox(self) -> Mailbox:
+        return Mailbox(self.pool, self.after_task, self.after_drain)
+
+    def shutdown(self) -> None:
+        self.pool.shutdown(wait=True)
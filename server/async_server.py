@@ -0,0 +1,114 @@
+import asyncio
+from typing import Any, Dict, List, Optional
+from framing import FrameBuffer
+from connection import MAX_BACKLOG
+from codec import CODECS, JSON
+from matchmaking import MATCH_TICK_SECONDS
+
+
+# wraps an asyncio transport so the server can treat it like a Connection -
+# messages are queued with send and written together on flush
+class AsyncConnection:
+    def __init__(self, transport: asyncio.Transport) -> None:
+        self.transport: asyncio.Transport = transport
+        self.pending: List[bytes] = []
+
+        # wire format, switched by the WIRE_FORMAT handshake
+        self.codec: Any = CODECS[JSON]
+        self.framer: FrameBuffer = FrameBuffer()
+
+    def send(self, data: bytes) -> int:
+        if self.transport.is_closing():
+            raise BrokenPipeError("transport is closing")
+        self.pending.append(data)
+        return len(data)
+
+    def flush(self) -> None:
+        if not self.pending or self.transport.is_closing():
+            self.pending.clear()
+            return
+        self.transport.writelines(self.pending)
+        self.pending.clear()
+        # the transport buffers for slow readers, drop the ones that never read
+        if self.transport.get_write_buffer_size() > MAX_BACKLOG:
+            self.transport.abort()
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+# standings changed by everything the loop read in one pass go out together
+# once those callbacks ran - the loop's version of a drained room mailbox
+class StandingsBatch:
+    def __init__(self, server: Any) -> None:
+        self.server: Any = server
+        self.scheduled: bool = False
+
+    def schedule(self) -> None:
+        if self.scheduled or not self.server.changed_rooms():
+            return
+        self.scheduled = True
+        asyncio.get_running_loop().call_soon(self.publish)
+
+    def publish(self) -> None:
+        self.scheduled = False
+        self.server.publish_standings()
+
+
+# one protocol instance per connected client, all driven by the same loop
+class ServerProtocol(asyncio.Protocol):
+    def __init__(self, server: Any, batch: StandingsBatch) -> None:
+        self.server: Any = server
+        self.batch: StandingsBatch = batch
+        self.connection: Optional[AsyncConnection] = None
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        print("Client connected.")
+        self.connection = AsyncConnection(
+            transport  # type: ignore[arg-type]
+        )
+        self.server.registry.connect(self.connection)
+
+    # same messages and wire formats as the threaded server
+    def data_received(self, data: bytes) -> None:
+        connection = self.connection
+        if connection is None:
+            return
+        try:
+            connection.framer.feed(data)
+            for frame in connection.framer:
+                message: Dict[str, Any] = connection.codec.decode(frame)
+                self.server.dispatch(message, connection)
+        except Exception:
+            self.connection.close()
+        self.batch.schedule()
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        if self.connection is None:
+            return
+        self.server.disconnect(self.connection)
+
+# runs the server's periodic work (quick match widening) on the loop
+async def tick(server: Any) -> None:
+    while True:
+        await asyncio.sleep(MATCH_TICK_SECONDS)
+        try:
+            server.tick()
+        except Exception:
+            pass  # a player left while being matched
+
+
+# serves the already bound listening socket of the server from one event loop
+async def serve(server: Any) -> None:
+    loop = asyncio.get_running_loop()
+    batch = StandingsBatch(server)
+    listener = await loop.create_server(
+        lambda: ServerProtocol(server, batch),
+        sock=server.server
+    )
+    ticker = asyncio.create_task(tick(server))
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        ticker.cancel()
@@ -0,0 +1,276 @@
+import math
+import random
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from feedback import solved_pattern
+from feedback_matrix import (
+    MATRIX_DIR, FeedbackMatrix, get_matrix, matrix_path, save_matrix
+)
+
+# how hard a bot plays - easy guesses any word that still fits, normal picks
+# the remaining answer that splits the rest best, hard also tries the best
+# openers (words that cannot be the answer but split well)
+DIFFICULTIES: Tuple[str, ...] = ("easy", "normal", "hard")
+
+# seconds a bot takes per guess (before jitter) - the time bonus uses them
+THINK_SECONDS: Dict[str, float] = {"easy": 14.0, "normal": 9.0, "hard": 6.0}
+
+# pool rows scored per numpy pass when ranking guesses
+SCORE_CHUNK: int = 2048
+
+# best openers hard bots keep looking at after the first guess (next to the
+# answers still possible) - scoring every allowed guess again each turn
+# costs a seven letter game seconds and hardly ever finds a better split
+SHORTLIST_SIZE: int = 256
+
+# next guesses remembered per solver, keyed by the patterns seen so far -
+# every game of a difficulty opens the same way, so the first guesses of
+# most games are a dict lookup
+NEXT_GUESS_CACHE_SIZE: int = 50_000
+
+
+# expected information of guesses, ranked through sum(c log c) over each
+# guess's pattern buckets (smaller is better) - rows are sorted so buckets
+# are runs and every element adds r log r - (r-1) log (r-1) for its place r
+# in its run, which sums to c log c per bucket without a bincount per row
+def split_costs(patterns: np.ndarray) -> np.ndarray:
+    rows, size = patterns.shape
+    ordered = np.sort(patterns, axis=1)
+    starts = np.ones(ordered.shape, dtype=bool)
+    starts[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+    positions = np.broadcast_to(np.arange(size), ordered.shape)
+    run_start = np.maximum.accumulate(np.where(starts, positions, 0), axis=1)
+    places = positions - run_start + 1
+
+    counts = np.arange(size + 1, dtype=np.float64)
+    clogc = np.zeros(size + 1)
+    clogc[1:] = counts[1:] * np.log2(counts[1:])
+    steps = np.zeros(size + 1)
+    steps[1:] = clogc[1:] - clogc[:-1]
+    return steps[places].sum(axis=1)
+
+
+# guess picker for one word length, shared by every bot of that length
+class Solver:
+    def __init__(self, matrix: FeedbackMatrix) -> None:
+        self.matrix: FeedbackMatrix = matrix
+        self.length: int = len(matrix.answers[0])
+        self.solved: int = solved_pattern(self.length)
+        # guess row of every answer (answers are allowed guesses too)
+        self.answer_rows: np.ndarray = np.array(
+            [matrix.guess_index[answer] for answer in matrix.answers],
+            dtype=np.int64
+        )
+        self.lock: threading.Lock = threading.Lock()
+        self.next_guesses: Dict[Tuple[Any, ...], str] = {}
+
+        # how well every allowed guess splits all the answers, the first
+        # guess of every game and the hard shortlist come from it
+        self.opening_costs: np.ndarray = self.load_opening_costs()
+        self.shortlist: np.ndarray = np.sort(
+            np.argsort(self.opening_costs, kind="stable")[:SHORTLIST_SIZE]
+        )
+        self.openers: Dict[str, str] = {
+            "normal": self.cheapest(self.answer_rows),
+            "hard": self.cheapest(self.shortlist),
+        }
+
+    # opening costs are the slow part of a solver (seconds for seven
+    # letters), they are saved next to the matrix for the same word lists
+    def load_opening_costs(self) -> np.ndarray:
+        path = matrix_path(
+            self.length, self.matrix.guesses, self.matrix.answers, MATRIX_DIR
+        )
+        path = path.with_name(path.name.replace("feedback_", "openers_"))
+        if path.exists():
+            return np.load(path)
+        every_answer = np.arange(len(self.matrix.answers), dtype=np.int64)
+        costs = self.costs(
+            np.arange(len(self.matrix.guesses), dtype=np.int64), every_answer
+        )
+        save_matrix(path, costs)
+        return costs
+
+    # the guess of the rows that opens best, a possible answer wins ties
+    def cheapest(self, rows: np.ndarray) -> str:
+        costs = self.opening_costs[rows]
+        best = rows[costs == costs.min()]
+        possible = np.intersect1d(best, self.answer_rows)
+        return self.matrix.guesses[possible[0] if len(possible) else best[0]]
+
+    # the guess a difficulty makes after seeing these patterns, candidates
+    # are the answer indexes the patterns left
+    def next_guess(
+        self,
+        difficulty: str,
+        history: Tuple[int, ...],
+        candidates: np.ndarray,
+        rng: random.Random
+    ) -> str:
+        if difficulty == "easy" or len(candidates) <= 2:
+            return self.matrix.answers[candidates[rng.randrange(len(candidates))]]
+        if not history:
+            return self.openers[difficulty]
+
+        key = (difficulty, history)
+        guess = self.next_guesses.get(key)
+        if guess is None:
+            pool = self.answer_rows[candidates]
+            if difficulty == "hard":
+                pool = np.union1d(self.shortlist, pool)
+            guess = self.best_guess(pool, candidates)
+            with self.lock:
+                if len(self.next_guesses) >= NEXT_GUESS_CACHE_SIZE:
+                    self.next_guesses.clear()
+                self.next_guesses[key] = guess
+        return guess
+
+    # the guess of the pool that splits the candidates into the most even
+    # buckets, a possible answer wins ties
+    def best_guess(self, pool: np.ndarray, candidates: np.ndarray) -> str:
+        costs = self.costs(pool, candidates)
+        best = pool[costs == costs.min()]
+        possible = np.intersect1d(best, self.answer_rows[candidates])
+        row = possible[0] if len(possible) else best[0]
+        return self.matrix.guesses[row]
+
+    # split costs of the pool rows over the candidates, a chunk at a time
+    def costs(self, pool: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+        costs = np.empty(len(pool))
+        for start in range(0, len(pool), SCORE_CHUNK):
+            rows = pool[start:start + SCORE_CHUNK]
+            costs[start:start + len(rows)] = split_costs(
+                self.matrix.matrix[np.ix_(rows, candidates)]
+            )
+        return costs
+
+    # plays a whole round against the answer the way a player would, only
+    # from the patterns - returns guesses used and whether it solved it
+    def play(
+        self,
+        answer: str,
+        max_guesses: int,
+        difficulty: str,
+        rng: random.Random
+    ) -> Tuple[int, bool]:
+        answer_column = self.matrix.answer_index[answer]
+        candidates = np.arange(len(self.matrix.answers), dtype=np.int64)
+        history: Tuple[int, ...] = ()
+        for guesses_used in range(1, max_guesses + 1):
+            guess = self.next_guess(difficulty, history, candidates, rng)
+            row = self.matrix.row(guess)
+            pattern = int(row[answer_column])
+            if pattern == self.solved:
+                return guesses_used, True
+            # only the answers that would have shown the same pattern stay
+            candidates = candidates[row[candidates] == pattern]
+            history += (pattern,)
+        return max_guesses, False
+
+
+solver_lock: threading.Lock = threading.Lock()
+shared_solvers: Dict[int, Solver] = {}
+
+
+# the process wide solver of a word length
+def get_solver(mode: int) -> Solver:
+    solver = shared_solvers.get(mode)
+    if solver is None:
+        with solver_lock:
+            solver = shared_solvers.get(mode)
+            if solver is None:
+                solver = shared_solvers[mode] = Solver(get_matrix(mode))
+    return solver
+
+
+# the wire format of a bot - it reads nothing, so a broadcast reaching
+# one encodes nothing for it
+class SilentCodec:
+    name: str = "silent"
+
+    def encode(self, r_type: str, data: Any) -> bytes:
+        return b""
+
+
+SILENT: SilentCodec = SilentCodec()
+
+
+# a server side player - sits in a room like a connection (messages sent
+# to it are dropped) and plays each round when it starts, its answer is
+# handed in once its thinking time has passed
+class Bot:
+    def __init__(self, difficulty: str) -> None:
+        self.difficulty: str = difficulty
+        self.codec: Any = SILENT
+        self.rng: random.Random = random.Random()
+
+        # (monotonic time it answers, guesses used, seconds, solved)
+        self.pending: Optional[Tuple[float, int, float, bool]] = None
+
+    def send(self, data: bytes) -> int:
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    # solves the round's word now, the answer waits for the thinking time -
+    # in hard mode only words that still fit may be guessed, which is how
+    # normal bots play anyway
+    def plan_round(
+        self, answer: str, mode: int, max_guesses: int, hard_mode: bool = False
+    ) -> None:
+        difficulty = self.difficulty
+        if hard_mode and difficulty == "hard":
+            difficulty = "normal"
+        guesses_used, solved = get_solver(mode).play(
+            answer, max_guesses, difficulty, self.rng
+        )
+        seconds = sum(
+            THINK_SECONDS[self.difficulty] * self.rng.uniform(0.6, 1.4)
+            for _ in range(guesses_used)
+        )
+        self.pending = (time.monotonic() + seconds, guesses_used, seconds, solved)
+
+    # the planned answer once it is due
+    def take_answer(self, now: float) -> Optional[Tuple[int, float, bool]]:
+        if self.pending is None or now < self.pending[0]:
+            return None
+        _, guesses_used, seconds, solved = self.pending
+        self.pending = None
+        return guesses_used, seconds, solved
+
+
+# bot games per second one core can plan - python bot.py [mode] [games]
+def benchmark(mode: int = 5, games: int = 1000) -> None:
+    started = time.perf_counter()
+    solver = get_solver(mode)
+    print(f"mode {mode}: solver ready in {time.perf_counter() - started:.2f} s")
+
+    rng = random.Random(mode)
+    answers = solver.matrix.answers
+    for difficulty in DIFFICULTIES:
+        words = [answers[rng.randrange(len(answers))] for _ in range(games)]
+        results: List[Tuple[int, bool]] = []
+        started = time.perf_counter()
+        for word in words:
+            results.append(solver.play(word, mode + 1, difficulty, rng))
+        elapsed = time.perf_counter() - started
+        solved = [used for used, ok in results if ok]
+        average = sum(solved) / len(solved) if solved else math.nan
+        print(
+            f"  {difficulty:6}: {games / elapsed:7.0f} games/s, "
+            f"solved {len(solved) / games:.1%} in {average:.2f} guesses"
+        )
+
+
+if __name__ == "__main__":
+    benchmark(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 5,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    )
@@ -0,0 +1,241 @@
+import select
+import selectors
+import socket
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Union
+from codec import CODECS, JSON
+from framing import FrameBuffer
+
+# unsent bytes a client may fall behind by before it is dropped
+MAX_BACKLOG: int = 1024 * 1024
+# most buffers handed to one sendmsg call (IOV_MAX on linux)
+MAX_IOV: int = 1024
+
+# sendmsg + MSG_DONTWAIT lets a flush try the socket without blocking on a
+# slow reader, windows has neither so there the socket itself is put in non
+# blocking mode and flushes use plain send
+NON_BLOCKING_SEND: bool = (
+    hasattr(socket.socket, "sendmsg") and hasattr(socket, "MSG_DONTWAIT")
+)
+
+Buffer = Union[bytes, memoryview]
+
+
+# raised by the server once a connection was handed to another process, its
+# reader stops without closing the socket or cleaning up the client again
+class HandedOff(Exception):
+    pass
+
+
+# a client socket with its own outbound queue - messages are collected with
+# send and go out together in one vectored write on flush
+class Connection:
+    def __init__(
+        self,
+        sock: socket.socket,
+        writer: "BacklogWriter",
+        max_backlog: int = MAX_BACKLOG
+    ) -> None:
+        self.sock: socket.socket = sock
+        self.writer: BacklogWriter = writer
+        self.max_backlog: int = max_backlog
+
+        self.lock: threading.Lock = threading.Lock()
+        # messages queued since the last flush
+        self.pending: List[bytes] = []
+        # flushed bytes the socket has not accepted yet
+        self.backlog: Deque[Buffer] = deque()
+        self.backlog_size: int = 0
+        # True while the backlog writer is draining this connection
+        self.waiting: bool = False
+        self.closed: bool = False
+        self.fd: int = sock.fileno()
+        if not NON_BLOCKING_SEND:
+            sock.setblocking(False)
+
+        # wire format, switched by the WIRE_FORMAT handshake
+        self.codec: Any = CODECS[JSON]
+        self.framer: FrameBuffer = FrameBuffer()
+
+    # blocks until something arrives, also on a non blocking socket
+    def recv_into(self, buffer: bytearray) -> int:
+        while True:
+            try:
+                return self.sock.recv_into(buffer)
+            except (BlockingIOError, InterruptedError):
+                select.select([self.sock], [], [])
+
+    # queues a message, nothing is written until flush
+    def send(self, data: bytes) -> int:
+        with self.lock:
+            if self.closed:
+                raise BrokenPipeError("connection closed")
+            self.pending.append(data)
+        return len(data)
+
+    # writes every queued message in one go, whatever the socket does not
+    # take right away is left to the backlog writer so the caller never waits
+    def flush(self) -> None:
+        with self.lock:
+            if self.closed or not self.pending:
+                return
+            for data in self.pending:
+                self.backlog.append(data)
+                self.backlog_size += len(data)
+            self.pending.clear()
+
+            if self.backlog_size > self.max_backlog:
+                self.abort()
+                return
+            # already being drained, keep the order and let the writer send it
+            if self.waiting:
+                return
+
+            try:
+                drained = self.write_backlog()
+            except OSError:
+                self.abort()
+                return
+            if not drained:
+                self.waiting = True
+                self.writer.watch(self)
+
+    # sends as much of the backlog as the socket takes, True once empty
+    # (caller must hold the lock)
+    def write_backlog(self) -> bool:
+        while self.backlog:
+            try:
+                if NON_BLOCKING_SEND:
+                    buffers = [
+                        self.backlog[i]
+                        for i in range(min(len(self.backlog), MAX_IOV))
+                    ]
+                    sent = self.sock.sendmsg(buffers, [], socket.MSG_DONTWAIT)
+                else:
+                    sent = self.sock.send(self.backlog[0])
+            except (BlockingIOError, InterruptedError):
+                return False
+            self.backlog_size -= sent
+
+            # drop what was written, keep a view on a partially sent buffer
+            while sent:
+                front = self.backlog[0]
+                if sent >= len(front):
+                    sent -= len(front)
+                    self.backlog.popleft()
+                else:
+                    self.backlog[0] = memoryview(front)[sent:]
+                    sent = 0
+        return True
+
+    # drops a broken or hopelessly slow client, the reader thread sees the
+    # shutdown and runs the normal disconnect cleanup
+    def abort(self) -> None:
+        self.closed = True
+        self.pending.clear()
+        self.backlog.clear()
+        self.backlog_size = 0
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    # gives the socket up without ending the connection (it moves to another
+    # process), whatever is still queued is written out first
+    def detach(self) -> socket.socket:
+        with self.lock:
+            self.closed = True
+            self.backlog.extend(self.pending)
+            self.pending.clear()
+            if self.backlog:
+                self.sock.setblocking(True)
+                self.sock.sendall(b"".join(self.backlog))
+            self.backlog.clear()
+            self.backlog_size = 0
+        self.writer.unwatch(self)
+        return self.sock
+
+    def close(self) -> None:
+        with self.lock:
+            self.abort()
+        self.writer.unwatch(self)
+        self.sock.close()
+
+
+# one background thread that finishes writes for every connection whose
+# socket buffer was full, so a slow reader only ever fills its own queue
+class BacklogWriter:
+    def __init__(self) -> None:
+        self.selector: selectors.BaseSelector = selectors.DefaultSelector()
+        self.lock: threading.Lock = threading.Lock()
+        self.incoming: List[Connection] = []
+        self.watched: Dict[int, Connection] = {}
+
+        # lets watch wake the selector up from other threads
+        self.wakeup_r, self.wakeup_w = socket.socketpair()
+        self.wakeup_r.setblocking(False)
+        self.wakeup_w.setblocking(False)
+        self.selector.register(self.wakeup_r, selectors.EVENT_READ)
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    # hands a connection with a non empty backlog over to the writer
+    def watch(self, connection: Connection) -> None:
+        with self.lock:
+            self.incoming.append(connection)
+        try:
+            self.wakeup_w.send(b"\0")
+        except BlockingIOError:
+            pass  # a wakeup is already pending
+
+    def run(self) -> None:
+        while True:
+            for key, _ in self.selector.select():
+                if key.fileobj is self.wakeup_r:
+                    self.register_incoming()
+                else:
+                    self.drain(key.data)
+
+    def register_incoming(self) -> None:
+        try:
+            while self.wakeup_r.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+        with self.lock:
+            incoming, self.incoming = self.incoming, []
+            for connection in incoming:
+                if connection.closed or connection.fd in self.watched:
+                    continue
+                self.selector.register(
+                    connection.fd, selectors.EVENT_WRITE, connection
+                )
+                self.watched[connection.fd] = connection
+
+    def drain(self, connection: Connection) -> None:
+        with connection.lock:
+            if connection.closed:
+                drained = True
+            else:
+                try:
+                    drained = connection.write_backlog()
+                except OSError:
+                    connection.abort()
+                    drained = True
+            if drained:
+                connection.waiting = False
+                self.unwatch(connection)
+
+    # stops watching a connection (also called right before its socket closes
+    # so the descriptor can be reused safely)
+    def unwatch(self, connection: Connection) -> None:
+        with self.lock:
+            if self.watched.get(connection.fd) is not connection:
+                return
+            del self.watched[connection.fd]
+            try:
+                self.selector.unregister(connection.fd)
+            except (KeyError, ValueError):
+                pass
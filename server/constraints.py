@@ -0,0 +1,62 @@
+from typing import List, Optional
+
+# hard mode rules for one player and round - every green stays in place,
+# every yellow is used again and letters shown grey (with no coloured copy)
+# are not guessed again. The state is built up one coloured row at a time,
+# so checking a guess never looks at the earlier rows
+# (kept the same in client/ and server/)
+
+ORDINALS: List[str] = ["1st", "2nd", "3rd", "4th", "5th", "6th", "7th"]
+
+
+class Constraints:
+    def __init__(self, length: int) -> None:
+        self.length: int = length
+        # letter every position must have, None while it is not green
+        self.fixed: List[Optional[str]] = [None] * length
+        # fewest copies of every letter (A-Z) a guess needs
+        self.min_counts: List[int] = [0] * 26
+        # letters with a required count, so a check walks only those
+        self.required: List[int] = []
+        # bit i set - letter i is not in the word at all
+        self.excluded: int = 0
+
+    # takes in one coloured row, pattern is the server's code (one base 3
+    # digit per letter, 0 absent, 1 present, 2 in place)
+    def update(self, word: str, pattern: int) -> None:
+        counts = [0] * 26
+        grey = 0
+        for index, letter in enumerate(word):
+            pattern, digit = divmod(pattern, 3)
+            slot = ord(letter) - 65
+            if digit == 2:
+                self.fixed[index] = letter
+            if digit:
+                counts[slot] += 1
+            else:
+                grey |= 1 << slot
+
+        for slot, count in enumerate(counts):
+            if count > self.min_counts[slot]:
+                if not self.min_counts[slot]:
+                    self.required.append(slot)
+                self.min_counts[slot] = count
+            if not count and not self.min_counts[slot] and grey >> slot & 1:
+                self.excluded |= 1 << slot
+
+    # why a guess (upper case) breaks the rules, None if it does not
+    def violation(self, word: str) -> Optional[str]:
+        counts = [0] * 26
+        for index, letter in enumerate(word):
+            slot = ord(letter) - 65
+            fixed = self.fixed[index]
+            if fixed is not None and letter != fixed:
+                return f"{ORDINALS[index]} letter must be {fixed}"
+            if self.excluded >> slot & 1:
+                return f"{letter} is not in the word"
+            counts[slot] += 1
+
+        for slot in self.required:
+            if counts[slot] < self.min_counts[slot]:
+                return f"Guess must contain {chr(slot + 65)}"
+        return None
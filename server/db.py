@@ -1,17 +1,41 @@
 import psycopg2
+import psycopg2.extras
+import psycopg2.pool
 import os
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pool import PostgresPool, SQLitePool
+from ranking import RankingIndex
+
+# errors a retry can get past (connection lost, pool empty, database locked),
+# anything else means the database refused the rows themselves
+TRANSIENT_ERRORS = (
+    psycopg2.OperationalError,
+    psycopg2.InterfaceError,
+    psycopg2.pool.PoolError,
+    sqlite3.OperationalError,
+    OSError,
+)
 
 class DB:
-    def __init__(self):
+    def __init__(self, leaderboard_ttl=None, pool_size=None):
+        # pooled mode (pool_size or DB_POOL_SIZE in .env) gives every thread
+        # its own connection, otherwise all threads share one behind a lock
+        self.db = None
+        self.pool = None
+        self.lock = threading.Lock()
         try:
             check = False
             if os.path.exists(".env"):
                 check = True
             from dotenv import load_dotenv; load_dotenv() if os.path.exists(".env") else None
+            if pool_size is None and os.getenv("DB_POOL_SIZE"):
+                pool_size = int(os.getenv("DB_POOL_SIZE"))
             # if there is a proper env it uses PostgreSQL from .env
             if check:
-                self.db = psycopg2.connect(
+                params = dict(
                     database=os.getenv("DATABASE"),
                     host=os.getenv("HOST"),
                     user=os.getenv("USER"),
@@ -19,17 +43,81 @@ class DB:
                     port=os.getenv("PORT"),
                     connect_timeout=3
                 )
+                if pool_size:
+                    self.pool = PostgresPool(pool_size, **params)
+                else:
+                    self.db = psycopg2.connect(**params)
                 self.db_type = "postgres"
             else:
                 # yes there is a second fallback i could not get it to work otherwise
-                self.db = sqlite3.connect(os.path.join(os.getcwd(), "wordle.db"), check_same_thread=False)
-                self.db_type = "sqlite"
+                self.open_sqlite(pool_size)
         except Exception:
             # but if its in development falls back to SQLite just for testing 
-            self.db = sqlite3.connect(os.path.join(os.getcwd(), "wordle.db"), check_same_thread=False)
-            self.db_type = "sqlite"
-        
+            self.open_sqlite(pool_size)
+
+        # in process copy of the top 10, replaced on every committed win -
+        # other nodes writing to the same database only show up once the
+        # optional ttl (seconds, LEADERBOARD_TTL in .env) runs out
+        if leaderboard_ttl is None and os.getenv("LEADERBOARD_TTL"):
+            leaderboard_ttl = float(os.getenv("LEADERBOARD_TTL"))
+        self.leaderboard_ttl = leaderboard_ttl
+        self.leaderboard_cache = None
+        self.leaderboard_cached_at = 0.0
+        # bumped by every invalidation so a read that raced a win is not cached
+        self.leaderboard_generation = 0
+        self.leaderboard_lock = threading.Lock()
+
+        # optional in memory ranking, see enable_ranking_index
+        self.ranking = None
+
         self.create_table()
+
+    def open_sqlite(self, pool_size):
+        path = os.path.join(os.getcwd(), "wordle.db")
+        if pool_size:
+            self.pool = SQLitePool(path, pool_size)
+        else:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db_type = "sqlite"
+
+    # connection for reads - one from the pool or the shared one
+    @contextmanager
+    def reader(self):
+        if self.pool:
+            with self.pool.reader() as conn:
+                yield conn
+        else:
+            with self.lock:
+                yield self.db
+
+    # connection for writes - the pool's writer or the shared one
+    @contextmanager
+    def writer(self):
+        if self.pool:
+            with self.pool.writer() as conn:
+                yield conn
+        else:
+            with self.lock:
+                yield self.db
+
+    # loads every player into an in memory RankingIndex - from then on the
+    # leaderboard, pages and ranks are answered without sql and every
+    # committed win updates the index
+    def enable_ranking_index(self):
+        ranking = RankingIndex()
+        ranking.load(self.fetch_all("SELECT username, wins FROM wins;"))
+        self.ranking = ranking
+        return ranking
+
+    # checkout counts and wait times of the pool
+    def pool_stats(self):
+        if self.pool:
+            return self.pool.stats()
+        return {}
+
+    # whether a failed write is worth retrying as it is
+    def is_transient(self, error):
+        return isinstance(error, TRANSIENT_ERRORS)
     
     # creates table (works with both)
     def create_table(self):
@@ -37,51 +125,73 @@ class DB:
             username VARCHAR(255) PRIMARY KEY,
             wins INTEGER NOT NULL
         );"""
-        cursor = self.db.cursor()
-        cursor.execute(query)
-        self.db.commit()
+        # leaderboard order, lets ranking and pages walk the index instead of
+        # sorting the whole table
+        index_query = """CREATE INDEX IF NOT EXISTS wins_rank_idx
+            ON wins (wins DESC, username);"""
+        with self.writer() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query)
+            cursor.execute(index_query)
+            conn.commit()
     
     # increase wins (with sepearete queries for both)
     def increase_wins(self, username):
-        try:
-            cursor = self.db.cursor()
-            
-            if self.db_type == "postgres":
-                query = """
-                INSERT INTO wins (username, wins) 
-                VALUES (%s, 1)
-                ON CONFLICT (username) 
-                DO UPDATE SET wins = wins.wins + 1;
-                """
-                cursor.execute(query, (username,))
-            else:  # sqlite
-                query = """
-                INSERT INTO wins (username, wins) 
-                VALUES (?, 1)
-                ON CONFLICT(username) 
-                DO UPDATE SET wins = wins + 1;
-                """
-                cursor.execute(query, (username,))
-            
-            self.db.commit()
-            cursor.close()
-            
-        except Exception as error:
-            print(f"Error increasing wins: {error}")
-            self.db.rollback()
-            raise
+        self.increase_wins_batch({username: 1})
+
+    # adds several players' wins in one transaction (used by the WinRecorder)
+    def increase_wins_batch(self, wins_by_username):
+        if not wins_by_username:
+            return
+        with self.writer() as conn:
+            try:
+                cursor = conn.cursor()
+                rows = list(wins_by_username.items())
+                
+                if self.db_type == "postgres":
+                    # one multi row upsert instead of a round trip per player
+                    query = """
+                    INSERT INTO wins (username, wins) 
+                    VALUES %s
+                    ON CONFLICT (username) 
+                    DO UPDATE SET wins = wins.wins + EXCLUDED.wins;
+                    """
+                    psycopg2.extras.execute_values(cursor, query, rows)
+                else:  # sqlite
+                    query = """
+                    INSERT INTO wins (username, wins) 
+                    VALUES (?, ?)
+                    ON CONFLICT(username) 
+                    DO UPDATE SET wins = wins + excluded.wins;
+                    """
+                    cursor.executemany(query, rows)
+                
+                conn.commit()
+                cursor.close()
+                
+            except Exception as error:
+                print(f"Error increasing wins: {error}")
+                conn.rollback()
+                raise
+
+        if self.ranking:
+            for username, count in wins_by_username.items():
+                self.ranking.add_wins(username, count)
+        self.invalidate_leaderboard()
     
     # gets stats (seperate queries for both)
     def get_user_stats(self, username):
         try:
-            cursor = self.db.cursor()
-            if self.db_type == "postgres":
-                query = "SELECT wins FROM wins WHERE username = %s;"
-                cursor.execute(query, (username,))
-            else:  # sqlite
-                query = "SELECT wins FROM wins WHERE username = ?;"
-                cursor.execute(query, (username,))
-            result = cursor.fetchone()
+            with self.reader() as conn:
+                cursor = conn.cursor()
+                if self.db_type == "postgres":
+                    query = "SELECT wins FROM wins WHERE username = %s;"
+                    cursor.execute(query, (username,))
+                else:  # sqlite
+                    query = "SELECT wins FROM wins WHERE username = ?;"
+                    cursor.execute(query, (username,))
+                result = cursor.fetchone()
+                self.end_read(conn)
             if result is not None:
                 return {'wins': result[0]}
             else:
@@ -89,20 +199,59 @@ class DB:
         except (Exception, psycopg2.DatabaseError) as error:
             print(f"Error getting user stats: {error}")
             return {'wins': 0}
+
+    # postgres opens a transaction for every select, end it so pooled
+    # connections do not sit idle in transaction
+    def end_read(self, conn):
+        if self.db_type == "postgres" and self.pool:
+            conn.rollback()
     
-    # gets leaderboard
+    # gets leaderboard (from memory unless a win changed it)
     def get_leaderboard(self):
         """Get top players by number of wins"""
+        if self.ranking:
+            return self.ranking.top(10)
+        with self.leaderboard_lock:
+            if self.leaderboard_cache is not None and not self.leaderboard_expired():
+                return list(self.leaderboard_cache)
+            generation = self.leaderboard_generation
+
+        leaderboard = self.query_leaderboard()
+        if leaderboard is None:
+            return []
+
+        with self.leaderboard_lock:
+            if self.leaderboard_generation == generation:
+                self.leaderboard_cache = leaderboard
+                self.leaderboard_cached_at = time.monotonic()
+        return list(leaderboard)
+
+    # true once the cached leaderboard is older than the ttl
+    def leaderboard_expired(self):
+        if self.leaderboard_ttl is None:
+            return False
+        return time.monotonic() - self.leaderboard_cached_at > self.leaderboard_ttl
+
+    # drops the cached leaderboard, the next read goes to the database
+    def invalidate_leaderboard(self):
+        with self.leaderboard_lock:
+            self.leaderboard_cache = None
+            self.leaderboard_generation += 1
+
+    # runs the leaderboard query (None if it failed)
+    def query_leaderboard(self):
         query = """
         SELECT username, wins
         FROM wins
-        ORDER BY wins DESC
+        ORDER BY wins DESC, username
         LIMIT 10;
         """
         try:
-            cursor = self.db.cursor()
-            cursor.execute(query)
-            results = cursor.fetchall()
+            with self.reader() as conn:
+                cursor = conn.cursor()
+                cursor.execute(query)
+                results = cursor.fetchall()
+                self.end_read(conn)
                 
             return [
                 {'username': row[0], 'wins': row[1]}
@@ -110,12 +259,136 @@ class DB:
             ]
         except (Exception, psycopg2.DatabaseError) as error:
             print(f"Error fetching leaderboard: {error}")
-            return []
+            return None
     
+    # same query text for both, sqlite placeholders become %s on postgres
+    def sql(self, query):
+        if self.db_type == "postgres":
+            return query.replace("?", "%s")
+        return query
+
+    # runs a read query and returns every row
+    def fetch_all(self, query, params=()):
+        with self.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.sql(query), params)
+            results = cursor.fetchall()
+            self.end_read(conn)
+        return results
+
+    # one page of the leaderboard - keyset pagination when after (the
+    # [wins, username] of the previous page's last row) is given, offset otherwise
+    def get_leaderboard_page(self, limit=10, offset=0, after=None):
+        if self.ranking:
+            return self.ranking.page(limit, offset, after)
+        try:
+            if after is not None:
+                after_wins, after_name = after[0], after[1]
+                rows = self.fetch_all("""
+                SELECT username, wins
+                FROM wins
+                WHERE wins < ? OR (wins = ? AND username > ?)
+                ORDER BY wins DESC, username
+                LIMIT ?;
+                """, (after_wins, after_wins, after_name, limit))
+                if len(after) > 2:
+                    # the cursor carries the rank it ended on, counting the
+                    # rows above it again would be O(rank) per page
+                    first_rank = max(0, after[2]) + 1
+                else:
+                    first_rank = self.rank_of(after_wins, after_name) + 1
+            else:
+                rows = self.fetch_all("""
+                SELECT username, wins
+                FROM wins
+                ORDER BY wins DESC, username
+                LIMIT ? OFFSET ?;
+                """, (limit, offset))
+                first_rank = offset + 1
+        except (Exception, psycopg2.DatabaseError) as error:
+            print(f"Error fetching leaderboard page: {error}")
+            rows = []
+            first_rank = offset + 1
+
+        page = [
+            {'rank': first_rank + i, 'username': row[0], 'wins': row[1]}
+            for i, row in enumerate(rows)
+        ]
+        return {
+            'rows': page,
+            # cursor for the following page - wins, username and rank of the
+            # last row (ranks on later pages shift if wins land meanwhile)
+            'next': [rows[-1][1], rows[-1][0], page[-1]['rank']]
+            if len(rows) == limit else None
+        }
+
+    # rank a (wins, username) pair has, counted along the index - O(rank),
+    # only used where the ranking index is off (see enable_ranking_index)
+    def rank_of(self, wins, username):
+        rows = self.fetch_all("""
+        SELECT COUNT(*)
+        FROM wins
+        WHERE wins > ? OR (wins = ? AND username < ?);
+        """, (wins, wins, username))
+        return rows[0][0] + 1
+
+    # a player's rank with the players right above and below them - the
+    # ranking index answers it in O(log n), without it this costs one count
+    # of the rows above the player and two short index walks
+    def get_rank(self, username, radius=2):
+        if self.ranking:
+            return self.ranking.rank(username, radius)
+        try:
+            found = self.fetch_all(
+                "SELECT wins FROM wins WHERE username = ?;", (username,)
+            )
+            if not found:
+                return {'username': username, 'wins': 0, 'rank': None,
+                        'above': [], 'below': []}
+            wins = found[0][0]
+            rank = self.rank_of(wins, username)
+
+            above = self.fetch_all("""
+            SELECT username, wins
+            FROM wins
+            WHERE wins > ? OR (wins = ? AND username < ?)
+            ORDER BY wins ASC, username DESC
+            LIMIT ?;
+            """, (wins, wins, username, radius))
+            below = self.fetch_all("""
+            SELECT username, wins
+            FROM wins
+            WHERE wins < ? OR (wins = ? AND username > ?)
+            ORDER BY wins DESC, username
+            LIMIT ?;
+            """, (wins, wins, username, radius))
+        except (Exception, psycopg2.DatabaseError) as error:
+            print(f"Error getting rank: {error}")
+            return {'username': username, 'wins': 0, 'rank': None,
+                    'above': [], 'below': []}
+
+        return {
+            'username': username,
+            'wins': wins,
+            'rank': rank,
+            'above': [
+                {'rank': rank - i - 1, 'username': row[0], 'wins': row[1]}
+                for i, row in enumerate(above)
+            ][::-1],
+            'below': [
+                {'rank': rank + i + 1, 'username': row[0], 'wins': row[1]}
+                for i, row in enumerate(below)
+            ],
+        }
+
     # close
     def close(self):
         if self.db:
             self.db.close()
+            self.db = None
+        if self.pool:
+            self.pool.close()
+            self.pool = None
     
     # delete
     def __del__(self):
@@ -0,0 +1,87 @@
+import sys
+import time
+from functools import lru_cache
+from typing import List
+
+# a guess's colours packed into one int, digit i (base 3) is the colour of
+# letter i - 0 absent, 1 present elsewhere, 2 in the right place
+ABSENT: int = 0
+PRESENT: int = 1
+CORRECT: int = 2
+
+# longest word any mode uses
+MAX_LENGTH: int = 7
+POWERS: List[int] = [3 ** i for i in range(MAX_LENGTH)]
+
+# (answer, guess) pairs kept - rooms share answers and players open with the
+# same few words, so most guesses of a busy server are a dict lookup
+FEEDBACK_CACHE_SIZE: int = 1 << 16
+
+
+# pattern code of a guess against the answer (both upper case and of the
+# same length) - greens first, then yellows from a 26 slot count array of the
+# answer letters that were not matched, so repeated letters colour like the
+# game does
+@lru_cache(maxsize=FEEDBACK_CACHE_SIZE)
+def feedback(answer: str, guess: str) -> int:
+    counts = [0] * 26
+    code = 0
+    unmatched: List[int] = []
+    for i in range(len(guess)):
+        letter = answer[i]
+        if letter == guess[i]:
+            code += CORRECT * POWERS[i]
+        else:
+            counts[ord(letter) - 65] += 1
+            unmatched.append(i)
+    for i in unmatched:
+        slot = ord(guess[i]) - 65
+        if counts[slot]:
+            counts[slot] -= 1
+            code += POWERS[i]
+    return code
+
+
+# code of a fully green row
+def solved_pattern(length: int) -> int:
+    return CORRECT * sum(POWERS[:length])
+
+
+# colours of every letter, first letter first
+def pattern_digits(code: int, length: int) -> List[int]:
+    digits: List[int] = []
+    for _ in range(length):
+        code, digit = divmod(code, 3)
+        digits.append(digit)
+    return digits
+
+
+def benchmark(guesses: int = 200_000) -> None:
+    from lexicon import get_lexicon
+
+    answers = get_lexicon().answer_list(5)
+    pairs = [
+        (answers[i % len(answers)], answers[(i * 7919) % len(answers)])
+        for i in range(guesses)
+    ]
+
+    feedback.cache_clear()
+    started = time.perf_counter()
+    for answer, guess in pairs:
+        feedback.__wrapped__(answer, guess)
+    uncached = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for answer, guess in pairs:
+        feedback(answer, guess)
+    for answer, guess in pairs:
+        feedback(answer, guess)
+    cached = (time.perf_counter() - started) / 2
+
+    print(f"{guesses} guesses")
+    print(f"  computed: {uncached / guesses * 1e6:.2f} us per guess")
+    print(f"  cached:   {cached / guesses * 1e6:.2f} us per guess")
+
+
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
@@ -0,0 +1,209 @@
+import os
+import sys
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+import numpy as np
+from feedback import feedback
+from lexicon import Lexicon, get_lexicon
+
+# where built matrices are kept, one .npy file per word length and word
+# lists (the checksum in the name makes edited lists build a new file)
+MATRIX_DIR: Path = Path(__file__).resolve().parent / "matrices"
+
+# guess rows scored per numpy pass - bounds the temporary arrays to a few
+# MB whatever the word length
+BUILD_CHUNK: int = 512
+
+
+# smallest type a length's pattern codes fit in - 3^5 = 243 codes fit a
+# byte, six and seven letter words have 729 and 2187
+def pattern_dtype(length: int) -> np.dtype:
+    return np.dtype(np.uint8 if 3 ** length <= 256 else np.uint16)
+
+
+# words as an (n, length) array of letter numbers 0-25
+def letter_array(words: Sequence[str], length: int) -> np.ndarray:
+    data = np.frombuffer("".join(words).encode("ascii"), dtype=np.uint8)
+    return data.reshape(len(words), length) - ord("A")
+
+
+# every guess x answer pattern code (same codes as feedback.feedback), built
+# BUILD_CHUNK guesses at a time with whole array compares - a letter is
+# yellow when it is not green and fewer of the same letter earlier in the
+# guess were left over than the answer has unmatched copies of it, which is
+# how repeated letters colour in the game
+def build_matrix(guesses: Sequence[str], answers: Sequence[str]) -> np.ndarray:
+    length = len(answers[0])
+    dtype = pattern_dtype(length)
+    guess_letters = letter_array(guesses, length)
+    answer_letters = letter_array(answers, length)
+    matrix = np.empty((len(guesses), len(answers)), dtype=dtype)
+
+    for start in range(0, len(guesses), BUILD_CHUNK):
+        chunk = guess_letters[start:start + BUILD_CHUNK]
+        shape = (len(chunk), len(answers))
+        green = [
+            chunk[:, i, None] == answer_letters[None, :, i]
+            for i in range(length)
+        ]
+        unmatched = [~is_green for is_green in green]
+
+        codes = np.zeros(shape, dtype=dtype)
+        for i in range(length):
+            # unmatched copies of guess letter i in the answer
+            available = np.zeros(shape, dtype=np.uint8)
+            for j in range(length):
+                available += (
+                    chunk[:, i, None] == answer_letters[None, :, j]
+                ) & unmatched[j]
+            # the same letter left over earlier in the guess
+            earlier = np.zeros(shape, dtype=np.uint8)
+            for k in range(i):
+                earlier += (chunk[:, k] == chunk[:, i])[:, None] & unmatched[k]
+            yellow = unmatched[i] & (earlier < available)
+            codes += (green[i].astype(dtype) * 2 + yellow) * dtype.type(3 ** i)
+        matrix[start:start + len(chunk)] = codes
+    return matrix
+
+
+# read only guess x answer feedback for one word length, memory mapped so
+# every process on the machine shares the same pages
+class FeedbackMatrix:
+    def __init__(
+        self,
+        guesses: Tuple[str, ...],
+        answers: Tuple[str, ...],
+        matrix: np.ndarray
+    ) -> None:
+        self.guesses: Tuple[str, ...] = guesses
+        self.answers: Tuple[str, ...] = answers
+        self.matrix: np.ndarray = matrix
+        self.guess_index: Dict[str, int] = {w: i for i, w in enumerate(guesses)}
+        self.answer_index: Dict[str, int] = {w: i for i, w in enumerate(answers)}
+
+    # pattern code of a guess against an answer, one array lookup
+    def pattern(self, answer: str, guess: str) -> int:
+        return int(
+            self.matrix[self.guess_index[guess], self.answer_index[answer]]
+        )
+
+    # a guess's pattern against every answer, in answer list order
+    def row(self, guess: str) -> np.ndarray:
+        return self.matrix[self.guess_index[guess]]
+
+    # answer indexes still possible after a guess showed a pattern, out of
+    # the given ones (all answers when None)
+    def candidates(
+        self, guess: str, pattern: int, within: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        row = self.row(guess)
+        if within is None:
+            return np.flatnonzero(row == pattern)
+        return within[row[within] == pattern]
+
+
+# file a word length's matrix is saved under for these exact word lists
+def matrix_path(
+    mode: int, guesses: Sequence[str], answers: Sequence[str], directory: Path
+) -> Path:
+    checksum = zlib.crc32("\n".join(answers).encode("ascii"))
+    checksum = zlib.crc32("\n".join(guesses).encode("ascii"), checksum)
+    return directory / f"feedback_{mode}_{checksum:08x}.npy"
+
+
+# the matrix of a word length, built and saved first if there is no file
+# for the current word lists
+def load_matrix(
+    mode: int,
+    lexicon: Optional[Lexicon] = None,
+    directory: Path = MATRIX_DIR
+) -> FeedbackMatrix:
+    lexicon = lexicon or get_lexicon()
+    answers = tuple(lexicon.answer_list(mode))
+    guesses = tuple(sorted(lexicon.guesses.get(mode, ())))
+    if not answers or not guesses:
+        raise ValueError(f"No word lists for mode {mode}")
+
+    path = matrix_path(mode, guesses, answers, directory)
+    if not path.exists():
+        save_matrix(path, build_matrix(guesses, answers))
+    return FeedbackMatrix(guesses, answers, np.load(path, mmap_mode="r"))
+
+
+# written next to the target first so a half written file never gets
+# loaded by another process
+def save_matrix(path: Path, matrix: np.ndarray) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # one name per process, workers may build the same file at once
+    partial = path.with_suffix(f".{os.getpid()}.partial")
+    with open(partial, "wb") as file:
+        np.save(file, matrix)
+    partial.replace(path)
+
+
+matrix_lock: threading.Lock = threading.Lock()
+shared_matrices: Dict[int, FeedbackMatrix] = {}
+
+
+# the process wide matrix of a word length, loaded (or built) on first use
+def get_matrix(mode: int) -> FeedbackMatrix:
+    matrix = shared_matrices.get(mode)
+    if matrix is None:
+        with matrix_lock:
+            matrix = shared_matrices.get(mode)
+            if matrix is None:
+                matrix = shared_matrices[mode] = load_matrix(mode)
+    return matrix
+
+
+# build step and benchmark - python feedback_matrix.py [modes...]
+def benchmark(modes: Sequence[int] = (5, 6, 7)) -> None:
+    lexicon = get_lexicon()
+    for mode in modes:
+        answers = tuple(lexicon.answer_list(mode))
+        guesses = tuple(sorted(lexicon.guesses[mode]))
+
+        started = time.perf_counter()
+        built = build_matrix(guesses, answers)
+        build_seconds = time.perf_counter() - started
+
+        # spot check against the scalar function
+        rng = np.random.default_rng(mode)
+        for g, a in rng.integers(
+            (0, 0), (len(guesses), len(answers)), size=(2000, 2)
+        ):
+            assert built[g, a] == feedback(answers[a], guesses[g])
+
+        save_matrix(matrix_path(mode, guesses, answers, MATRIX_DIR), built)
+        started = time.perf_counter()
+        matrix = load_matrix(mode, lexicon)
+        load_seconds = time.perf_counter() - started
+
+        lookups = 100_000
+        picks = rng.integers((0, 0), (len(guesses), len(answers)), size=(lookups, 2))
+        pairs = [(answers[a], guesses[g]) for g, a in picks]
+        started = time.perf_counter()
+        for answer, guess in pairs:
+            matrix.pattern(answer, guess)
+        lookup_seconds = (time.perf_counter() - started) / lookups
+
+        started = time.perf_counter()
+        for guess in guesses[:1000]:
+            matrix.candidates(guess, 0)
+        filter_seconds = (time.perf_counter() - started) / min(1000, len(guesses))
+
+        print(
+            f"mode {mode}: {len(guesses)} x {len(answers)} {built.dtype}, "
+            f"{built.nbytes / 1024 / 1024:.0f} MiB"
+        )
+        print(f"  build:       {build_seconds:.2f} s")
+        print(f"  load (mmap): {load_seconds * 1000:.1f} ms")
+        print(f"  lookup:      {lookup_seconds * 1e6:.2f} us")
+        print(f"  filter row:  {filter_seconds * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    benchmark([int(mode) for mode in sys.argv[1:]] or (5, 6, 7))
@@ -0,0 +1,96 @@
+import struct
+from typing import Iterator, Optional, Union
+
+# biggest single message a client is allowed to send
+MAX_FRAME_SIZE: int = 64 * 1024
+
+# length header of binary frames (see codec.BinaryCodec)
+LENGTH_PREFIX: struct.Struct = struct.Struct(">I")
+
+
+class FrameTooLarge(Exception):
+    pass
+
+
+# incremental framer - keeps partial data between reads and hands out every
+# complete frame that one recv produced, newline delimited json lines by
+# default and length prefixed frames once the binary format is negotiated
+class FrameBuffer:
+    def __init__(self, max_frame_size: int = MAX_FRAME_SIZE) -> None:
+        self.max_frame_size: int = max_frame_size
+        self.buffer: bytearray = bytearray()
+        # offset of the first byte that has not been handed out yet
+        self.start: int = 0
+        self.length_prefixed: bool = False
+
+    # appends freshly received bytes (bytes, bytearray or a memoryview slice)
+    def feed(self, data: Union[bytes, bytearray, memoryview]) -> None:
+        if self.start:
+            # drop consumed frames before growing the buffer again
+            del self.buffer[:self.start]
+            self.start = 0
+        self.buffer += data
+
+    # returns the next complete frame without its newline or length header,
+    # or None if the buffer only holds a partial one - the framing can be
+    # switched between two pops, the rest of the buffer follows the new one
+    def pop(self) -> Optional[bytes]:
+        if self.length_prefixed:
+            return self.pop_length_prefixed()
+
+        while True:
+            end = self.buffer.find(b"\n", self.start)
+            if end == -1:
+                if len(self.buffer) - self.start > self.max_frame_size:
+                    raise FrameTooLarge(
+                        f"frame exceeds {self.max_frame_size} bytes"
+                    )
+                return None
+            if end - self.start > self.max_frame_size:
+                raise FrameTooLarge(
+                    f"frame exceeds {self.max_frame_size} bytes"
+                )
+
+            with memoryview(self.buffer) as view:
+                frame = bytes(view[self.start:end])
+            self.start = end + 1
+
+            # blank lines are keep-alives, skip them
+            if frame.strip():
+                return frame
+
+    def pop_length_prefixed(self) -> Optional[bytes]:
+        if self.pending() < LENGTH_PREFIX.size:
+            return None
+        (size,) = LENGTH_PREFIX.unpack_from(self.buffer, self.start)
+        if size > self.max_frame_size:
+            raise FrameTooLarge(f"frame exceeds {self.max_frame_size} bytes")
+
+        begin = self.start + LENGTH_PREFIX.size
+        end = begin + size
+        if end > len(self.buffer):
+            return None
+
+        with memoryview(self.buffer) as view:
+            frame = bytes(view[begin:end])
+        self.start = end
+        return frame
+
+    # number of buffered bytes that do not form a complete frame yet
+    def pending(self) -> int:
+        return len(self.buffer) - self.start
+
+    # removes and returns everything that has not been handed out yet
+    def take_unread(self) -> bytes:
+        with memoryview(self.buffer) as view:
+            unread = bytes(view[self.start:])
+        self.buffer.clear()
+        self.start = 0
+        return unread
+
+    def __iter__(self) -> Iterator[bytes]:
+        while True:
+            frame = self.pop()
+            if frame is None:
+                return
+            yield frame
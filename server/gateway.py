@@ -0,0 +1,387 @@
+import argparse
+import asyncio
+import bisect
+import hashlib
+import json
+import random
+import signal
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from protocols import Protocols
+from codec import BINARY, CODECS, JSON, MESSAGE_IDS
+from framing import LENGTH_PREFIX, FrameBuffer
+from workers import requested_room
+from matchmaking import bucket_of, route_key
+
+RECV_SIZE: int = 4096
+# points every node gets on the ring, more points spread codes more evenly
+VIRTUAL_NODES: int = 160
+# seconds a node that was left gets to send its last replies
+DRAIN_SECONDS: float = 2.0
+
+Node = Tuple[str, int]
+
+ROOM_REQUESTS: Tuple[str, ...] = (
+    Protocols.Request.CREATE_GAME, Protocols.Request.JOIN_GAME,
+    Protocols.Request.FIND_MATCH, Protocols.Request.SPECTATE
+)
+# requests that open a room, only these put a new code in the directory -
+# a join or spectate of a code nobody opened is routed but not recorded
+OPENING_REQUESTS: Tuple[str, ...] = (
+    Protocols.Request.CREATE_GAME, Protocols.Request.FIND_MATCH
+)
+# the only requests decoded after routing - room requests may move the
+# client, a format switch changes how the frames after it are cut
+WATCHED_REQUESTS: Tuple[str, ...] = ROOM_REQUESTS + (Protocols.Request.WIRE_FORMAT,)
+# type byte of binary watched requests
+WATCHED_IDS: frozenset = frozenset(MESSAGE_IDS[t] for t in WATCHED_REQUESTS)
+# the same types as quoted json strings, a routed json line is only decoded
+# when it contains one of them
+WATCHED_TYPES: Tuple[bytes, ...] = tuple(
+    json.dumps(t).encode("ascii") for t in WATCHED_REQUESTS
+)
+
+
+def parse_node(text: str) -> Node:
+    host, _, port = text.strip().rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+# room code of a create, join or spectate, the bucket of a quick match
+def routing_key(message: Dict[str, Any]) -> Optional[str]:
+    if message.get("type") == Protocols.Request.FIND_MATCH:
+        bucket = bucket_of(message.get("data"))
+        return route_key(bucket) if bucket else None
+    return requested_room(message)
+
+
+def ring_hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+# consistent hash ring - a room code belongs to the first node point after
+# its hash, so adding or removing a node only moves the codes next to that
+# node's points (about 1/n of them) instead of reshuffling every room
+class HashRing:
+    def __init__(
+        self, nodes: Sequence[Node] = (), virtual_nodes: int = VIRTUAL_NODES
+    ) -> None:
+        self.virtual_nodes: int = virtual_nodes
+        self.points: List[int] = []
+        self.owners: Dict[int, Node] = {}
+        for node in nodes:
+            self.add_node(node)
+
+    def add_node(self, node: Node) -> None:
+        for i in range(self.virtual_nodes):
+            point = ring_hash(f"{node[0]}:{node[1]}#{i}")
+            if point in self.owners:
+                continue
+            self.owners[point] = node
+            bisect.insort(self.points, point)
+
+    def remove_node(self, node: Node) -> None:
+        self.points = [p for p in self.points if self.owners[p] != node]
+        self.owners = {p: self.owners[p] for p in self.points}
+
+    def nodes(self) -> List[Node]:
+        return sorted(set(self.owners.values()))
+
+    def node_for(self, key: str) -> Node:
+        if not self.points:
+            raise LookupError("no backend nodes")
+        index = bisect.bisect(self.points, ring_hash(key)) % len(self.points)
+        return self.owners[self.points[index]]
+
+
+# which node holds every open room - a room stays on the node it was created
+# on even after the ring changes, and is forgotten once the last connection
+# routed to it is gone
+class RoomDirectory:
+    def __init__(self) -> None:
+        self.nodes: Dict[str, Node] = {}
+        self.connections: Dict[str, int] = {}
+
+    def lookup(self, room_code: str) -> Optional[Node]:
+        return self.nodes.get(room_code)
+
+    # a connection was routed to the room on node
+    def acquire(self, room_code: str, node: Node) -> None:
+        self.nodes.setdefault(room_code, node)
+        self.connections[room_code] = self.connections.get(room_code, 0) + 1
+
+    def release(self, room_code: str) -> None:
+        left = self.connections.get(room_code, 0) - 1
+        if left > 0:
+            self.connections[room_code] = left
+            return
+        self.connections.pop(room_code, None)
+        self.nodes.pop(room_code, None)
+
+    def rooms_on(self, node: Node) -> List[str]:
+        return [code for code, owner in self.nodes.items() if owner == node]
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+
+# one client connection - frames are read until the client creates or joins
+# a room, after that the connection is piped to the room's node: bytes from
+# the node are never parsed and client frames are only cut apart and given
+# a cheap type check (the type byte of binary frames, a search for the room
+# request types in json lines), so a later create or join can move the
+# client to another node
+class GatewaySession:
+    def __init__(
+        self,
+        gateway: "Gateway",
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter
+    ) -> None:
+        self.gateway: Gateway = gateway
+        self.client_reader: asyncio.StreamReader = reader
+        self.client_writer: asyncio.StreamWriter = writer
+
+        self.framer: FrameBuffer = FrameBuffer()
+        self.wire_format: str = JSON
+        self.room_code: Optional[str] = None
+
+        self.node: Optional[Node] = None
+        self.backend_writer: Optional[asyncio.StreamWriter] = None
+        self.pump: Optional[asyncio.Task] = None
+
+    async def run(self) -> None:
+        peer = self.client_writer.get_extra_info("peername")
+        try:
+            await self.connect(self.gateway.lobby_node(str(peer)))
+            while True:
+                data = await self.client_reader.read(RECV_SIZE)
+                if not data:
+                    break
+                await self.client_data(data)
+        except Exception:
+            pass  # bad frame, unreachable node or the client went away
+        finally:
+            if self.room_code is not None:
+                self.gateway.directory.release(self.room_code)
+            await self.close_backend()
+            self.client_writer.close()
+
+    async def client_data(self, data: bytes) -> None:
+        assert self.backend_writer is not None
+        self.framer.feed(data)
+        for frame in self.framer:
+            await self.forward(frame)
+        await self.backend_writer.drain()
+
+    async def forward(self, frame: bytes) -> None:
+        codec = CODECS[self.wire_format]
+        if self.wire_format == BINARY:
+            raw = LENGTH_PREFIX.pack(len(frame)) + frame
+            read = self.room_code is None or (
+                len(frame) > 0 and frame[0] in WATCHED_IDS
+            )
+        else:
+            raw = frame + b"\n"
+            read = self.room_code is None or any(
+                r_type in frame for r_type in WATCHED_TYPES
+            )
+
+        message = codec.decode(frame) if read else None
+        r_type = message.get("type") if message else None
+        if message and r_type in ROOM_REQUESTS:
+            room_code = routing_key(message)
+            if room_code is not None:
+                await self.route(room_code, r_type in OPENING_REQUESTS)
+
+        assert self.backend_writer is not None
+        self.backend_writer.write(raw)
+
+        if message and r_type == Protocols.Request.WIRE_FORMAT:
+            # same rule as the server - frames after this one use the format
+            data = message.get("data")
+            wire_format = data.get("format") if isinstance(data, dict) else None
+            self.wire_format = wire_format if wire_format in CODECS else JSON
+            self.framer.length_prefixed = self.wire_format == BINARY
+
+    # moves the connection to the node holding room_code, opening says the
+    # request creates the room there
+    async def route(self, room_code: str, opening: bool) -> None:
+        directory = self.gateway.directory
+        node = self.gateway.route(room_code)
+        if self.room_code is not None:
+            directory.release(self.room_code)
+        self.room_code = None
+        if opening or directory.lookup(room_code) is not None:
+            self.room_code = room_code
+            directory.acquire(room_code, node)
+        if node != self.node:
+            await self.connect(node)
+
+    async def connect(self, node: Node) -> None:
+        reader, writer = await asyncio.open_connection(*node)
+        if self.wire_format == BINARY:
+            # a fresh node speaks json, switch it like the client switched
+            # the last one and drop its answer (the client already has one)
+            writer.write(CODECS[JSON].encode(
+                Protocols.Request.WIRE_FORMAT, {"format": BINARY}
+            ))
+            await reader.readline()
+
+        previous = self.pump
+        if self.backend_writer is not None:
+            # the old node sees the client leave and sends its last replies
+            self.backend_writer.write_eof()
+        self.node = node
+        self.backend_writer = writer
+        self.pump = asyncio.create_task(self.splice(reader, writer, previous))
+
+    # copies a node's bytes to the client untouched - waits for the node that
+    # was left first so replies from both never interleave mid frame
+    async def splice(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        previous: Optional[asyncio.Task]
+    ) -> None:
+        if previous is not None:
+            try:
+                await asyncio.wait_for(previous, DRAIN_SECONDS)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                pass
+        try:
+            while True:
+                data = await reader.read(RECV_SIZE)
+                if not data:
+                    break
+                self.client_writer.write(data)
+                await self.client_writer.drain()
+        except OSError:
+            pass
+        finally:
+            writer.close()
+        # the node the client is on went away, so does the client
+        if writer is self.backend_writer:
+            self.client_writer.close()
+
+    async def close_backend(self) -> None:
+        if self.pump is not None:
+            self.pump.cancel()
+        if self.backend_writer is not None:
+            self.backend_writer.close()
+
+
+# front process for several Server nodes - clients connect here and are
+# piped to the node owning their room (see GatewaySession)
+class Gateway:
+    def __init__(
+        self,
+        nodes: Sequence[Node],
+        host: str = "0.0.0.0",
+        port: int = 55555,
+        nodes_file: Optional[str] = None
+    ) -> None:
+        self.host: str = host
+        self.port: int = port
+        self.nodes_file: Optional[str] = nodes_file
+        self.ring: HashRing = HashRing(nodes)
+        self.directory: RoomDirectory = RoomDirectory()
+
+    # open rooms stay where they are, only new codes use the new ring
+    def add_node(self, node: Node) -> None:
+        self.ring.add_node(node)
+
+    def remove_node(self, node: Node) -> None:
+        self.ring.remove_node(node)
+
+    def route(self, room_code: str) -> Node:
+        return self.directory.lookup(room_code) or self.ring.node_for(room_code)
+
+    # node that answers a client's lobby requests before it is in a room
+    def lobby_node(self, peer: str) -> Node:
+        return self.ring.node_for(peer)
+
+    # syncs the ring with the nodes file (sent SIGHUP)
+    def reload_nodes(self) -> None:
+        if self.nodes_file is None:
+            return
+        with open(self.nodes_file, "r") as file:
+            wanted = {parse_node(line) for line in file if line.strip()}
+        current = set(self.ring.nodes())
+        for node in wanted - current:
+            self.add_node(node)
+        for node in current - wanted:
+            self.remove_node(node)
+        print(
+            f"Gateway nodes: {len(wanted)} "
+            f"(+{len(wanted - current)} -{len(current - wanted)}), "
+            f"{len(self.directory)} open rooms"
+        )
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        await GatewaySession(self, reader, writer).run()
+
+    async def serve(self) -> None:
+        if self.nodes_file is not None:
+            asyncio.get_running_loop().add_signal_handler(
+                signal.SIGHUP, self.reload_nodes
+            )
+        listener = await asyncio.start_server(self.handle, self.host, self.port)
+        print(
+            f"Gateway on {self.host}:{self.port} for "
+            f"{len(self.ring.nodes())} nodes"
+        )
+        async with listener:
+            await listener.serve_forever()
+
+
+# share of room codes that change node when one node is added
+def ring_movement(nodes: Sequence[Node], codes: int = 100000) -> float:
+    ring = HashRing(nodes)
+    sample = [f"{random.randint(0, 999999):06d}" for _ in range(codes)]
+    before = [ring.node_for(code) for code in sample]
+    ring.add_node(("127.0.0.1", 65535))
+    moved = sum(
+        1 for code, node in zip(sample, before) if ring.node_for(code) != node
+    )
+    return moved / codes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PVP Wordle gateway")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=55555)
+    parser.add_argument(
+        "--node", action="append", default=[],
+        help="host:port of a server node, repeat for every node"
+    )
+    parser.add_argument(
+        "--nodes-file",
+        help="file with one host:port per line, re-read on SIGHUP"
+    )
+    parser.add_argument(
+        "--ring-report", action="store_true",
+        help="print how many room codes move when a node is added and exit"
+    )
+    args = parser.parse_args()
+
+    nodes = [parse_node(text) for text in args.node]
+    if args.nodes_file:
+        with open(args.nodes_file, "r") as file:
+            nodes += [parse_node(line) for line in file if line.strip()]
+    if not nodes:
+        parser.error("give at least one --node or a --nodes-file")
+
+    if args.ring_report:
+        moved = ring_movement(nodes)
+        print(
+            f"{len(nodes)} -> {len(nodes) + 1} nodes moves {moved:.1%} of "
+            f"room codes (ideal {1 / (len(nodes) + 1):.1%})"
+        )
+    else:
+        gateway = Gateway(nodes, args.host, args.port, args.nodes_file)
+        try:
+            asyncio.run(gateway.serve())
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,103 @@
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Collection, Dict, Optional, Sequence
+from packed_lexicon import PackedLexicon, open_lexicon
+
+# answer list for every supported word length
+ANSWER_FILES: Dict[int, str] = {
+    5: "fiveletterwords.txt",
+    6: "sixletterwords.txt",
+    7: "sevenletterwords.txt",
+}
+
+# every word a player may guess for a word length (answers are added too)
+GUESS_FILES: Dict[int, str] = {
+    5: "longerfiveletterwords.txt",
+    6: "longersixletterwords.txt",
+    7: "longersevenletterwords.txt",
+}
+
+
+def word_lists_dir() -> Path:
+    #change to the following when compiling
+    # base_dir: Path = Path(__file__).resolve().parent
+    # return base_dir / "word lists"
+    base_dir: Path = Path(__file__).resolve().parent.parent
+    return base_dir / "client" / "word lists"
+
+
+# word lists shared by every room of the process - memory mapped from the
+# compiled lexicon file when it is built (see packed_lexicon.py), otherwise
+# read from the text files once and kept as immutable tuples and sets
+class Lexicon:
+    def __init__(self, directory: Optional[Path] = None) -> None:
+        self.directory: Path = directory or word_lists_dir()
+        self.answers: Dict[int, Sequence[str]] = {}
+        self.guesses: Dict[int, Collection[str]] = {}
+
+        started = time.perf_counter()
+        self.packed: Optional[PackedLexicon] = open_lexicon(self.directory)
+        if self.packed is not None:
+            self.answers.update(self.packed.answers)
+            self.guesses.update(self.packed.guesses)
+        else:
+            self.read_text_files()
+        self.load_seconds: float = time.perf_counter() - started
+
+    def read_text_files(self) -> None:
+        for mode, file_name in ANSWER_FILES.items():
+            with open(
+                self.directory / file_name, 'r', encoding='utf-8'
+            ) as file:
+                self.answers[mode] = tuple(file.read().splitlines())
+        for mode, file_name in GUESS_FILES.items():
+            with open(
+                self.directory / file_name, 'r', encoding='utf-8'
+            ) as file:
+                self.guesses[mode] = frozenset(
+                    file.read().splitlines()
+                ).union(self.answers.get(mode, ()))
+
+    # answer words for a word length, empty for unsupported lengths
+    def answer_list(self, mode: int) -> Sequence[str]:
+        return self.answers.get(mode, ())
+
+    # whether a player may guess the word (upper case) in this mode
+    def is_guess(self, mode: int, word: str) -> bool:
+        return word in self.guesses.get(mode, ())
+
+    # bytes held by the tuples and sets and the word strings themselves,
+    # mapped words are in the page cache, shared by every process
+    def memory_bytes(self) -> int:
+        if self.packed is not None:
+            return 0
+        total = 0
+        for words in (*self.answers.values(), *self.guesses.values()):
+            total += sys.getsizeof(words)
+            total += sum(sys.getsizeof(word) for word in words)
+        return total
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "words": {mode: len(words) for mode, words in self.answers.items()},
+            "guesses": {mode: len(words) for mode, words in self.guesses.items()},
+            "memory_bytes": self.memory_bytes(),
+            "mapped_bytes": self.packed.size() if self.packed else 0,
+            "load_seconds": self.load_seconds,
+        }
+
+
+lexicon_lock: threading.Lock = threading.Lock()
+shared_lexicon: Optional[Lexicon] = None
+
+
+# the process wide lexicon, loaded on first use
+def get_lexicon() -> Lexicon:
+    global shared_lexicon
+    if shared_lexicon is None:
+        with lexicon_lock:
+            if shared_lexicon is None:
+                shared_lexicon = Lexicon()
+    return shared_lexicon
@@ -1,107 +1,567 @@
-import random
+import argparse
+import asyncio
+import itertools
+import signal
 import socket
 import threading
-import json
-from typing import Any, Dict, Optional, Union, cast
+import time
+from typing import Any, Dict, Iterable, Optional, Set, Union
 from protocols import Protocols
-from room import Room
+from room import MAX_PLAYERS, MIN_PLAYERS, Room
+from registry import RoomRegistry
+from actor import ActorPool
+from matchmaking import (
+    MATCH_TICK_SECONDS, Matchmaker, Ticket, bucket_of, route_key
+)
+from lexicon import get_lexicon
+from bot import DIFFICULTIES, Bot, get_solver
+from word_index import get_index
 from db import DB
+from recorder import WinRecorder
+from async_server import serve
+from connection import BacklogWriter, Connection, HandedOff
+from codec import BINARY, CODECS, JSON
+from workers import (
+    WORKER_LEADERBOARD_TTL, Shard, requested_room, run_workers, supported
+)
+
+RECV_SIZE: int = 4096
+# longest nickname a player may take, the wins table keeps usernames as
+# VARCHAR(255)
+MAX_NICKNAME: int = 255
+# most leaderboard rows one page or rank request may ask for
+MAX_PAGE_SIZE: int = 100
+# seconds between two stats lines of the background writers (only printed
+# when something changed)
+STATS_SECONDS: float = 60.0
 
 
 class Server:
-    def __init__(self, host: str = "0.0.0.0", port: int = 55555) -> None:
+    def __init__(
+        self,
+        host: str = "0.0.0.0",
+        port: int = 55555,
+        db_pool_size: Optional[int] = None,
+        ranking_index: bool = True,
+        leaderboard_ttl: Optional[float] = None,
+        shard: Optional[Shard] = None
+    ) -> None:
         self.host = host
         self.port = port
+        # set in workers mode, rooms whose code this process does not own
+        # are handed to the worker that does (see workers.py)
+        self.shard = shard
         self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        if shard is not None:
+            # every worker listens on the same port, the kernel spreads
+            # new connections over them
+            self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
         self.server.bind((self.host, self.port))
         self.server.listen()
 
-        self.client_names: Dict[socket.socket, str] = {}
-        self.opponent: Dict[socket.socket, socket.socket] = {}
-        self.rooms_by_code: Dict[str, Room] = {}
-        self.client_to_room: Dict[socket.socket, Room] = {}
-
-        self.db = DB()
+        # rooms and nicknames of every connected client
+        self.registry = RoomRegistry()
+
+        # finishes writes to clients that are not reading fast enough
+        self.writer = BacklogWriter()
+        # connections that were sent something by the current handler thread
+        self.batch = threading.local()
+        # every room's messages run on that room's mailbox, rooms in parallel,
+        # standings changed by a mailbox's tasks go out once it is drained
+        self.actors: Optional[ActorPool] = ActorPool(
+            after_task=self.flush, after_drain=self.publish_standings
+        )
+
+        # quick match queues, matched players get a room under a code no
+        # client can type
+        self.matchmaker = Matchmaker()
+        self.match_ids = itertools.count(1)
+
+        # rooms with bots in them, the tick hands in their answers
+        self.bot_rooms: Set[Room] = set()
+        self.bot_lock = threading.Lock()
+
+        self.db = DB(leaderboard_ttl=leaderboard_ttl, pool_size=db_pool_size)
+        if ranking_index:
+            ranking = self.db.enable_ranking_index()
+            print(
+                f"Loaded {len(ranking)} players into the ranking index in "
+                f"{ranking.load_seconds * 1000:.1f} ms"
+            )
+        # wins are committed in the background, see recorder.py
+        self.recorder = WinRecorder(self.db)
+        self.stats_logged = time.monotonic()
+        self.last_stats: Optional[Dict[str, Any]] = None
+
+        # load the shared word lists before the first room needs them
+        self.lexicon = get_lexicon()
+        stats = self.lexicon.stats()
+        print(
+            f"Loaded word lists {stats['words']} in "
+            f"{stats['load_seconds'] * 1000:.1f} ms, "
+            f"{stats['memory_bytes'] / 1024:.0f} KiB"
+            + (f" ({stats['mapped_bytes'] / 1024:.0f} KiB mapped)"
+               if stats['mapped_bytes'] else "")
+        )
+        # and the answer bitsets every room narrows guesses with
+        started = time.perf_counter()
+        for mode in self.lexicon.answers:
+            get_index(mode)
+        print(
+            f"Indexed answers in {(time.perf_counter() - started) * 1000:.1f} ms"
+        )
+        # bots need every word length's feedback matrix and opening costs,
+        # a cold build takes a while so it runs in the background and bot
+        # rooms are refused until it is done - no mailbox or event loop ever
+        # waits on it
+        self.bots_ready = threading.Event()
+        threading.Thread(target=self.prepare_bots, daemon=True).start()
+
+    def prepare_bots(self) -> None:
+        started = time.perf_counter()
+        try:
+            for mode in self.lexicon.answers:
+                get_solver(mode)
+        except Exception as error:
+            print(f"Bots unavailable: {error}")
+            return
+        self.bots_ready.set()
+        print(f"Bots ready in {time.perf_counter() - started:.1f} s")
 
-    # main handle function
-    def handle(self, client: socket.socket) -> None:
+    # main handle function, a connection handed over from another worker
+    # comes with the request it was handed over for
+    def handle(
+        self, client: Connection, message: Optional[Dict[str, Any]] = None
+    ) -> None:
         print("Client connected.")
-        while True:
-            try:
-                data = client.recv(1024).decode("ascii")
-                if not data:
+        self.registry.connect(client)
+        framer = client.framer
+        chunk = bytearray(RECV_SIZE)
+        chunk_view = memoryview(chunk)
+        try:
+            if message is not None:
+                self.dispatch(message, client)
+            while True:
+                # one recv can carry several pipelined messages
+                for frame in framer:
+                    self.dispatch(client.codec.decode(frame), client)
+                size = client.recv_into(chunk)
+                if not size:
                     break
-                message = json.loads(data)
-                self.handle_receive(message, client)
-            except Exception:
-                break
+                framer.feed(chunk_view[:size])
+        except HandedOff:
+            return
+        except Exception:
+            pass
+        self.disconnect(client)
+        client.close()
+
+    # drops everything the server knows about a client that went away and
+    # tells whoever was playing with it
+    def disconnect(self, client: Any) -> None:
+        self.matchmaker.cancel(client)
         try:
-            self.send_to_opponent(
-                Protocols.Response.OPPONENT_LEFT,
-                None,
-                client
-            )
+            room = self.registry.room_of(client)
+            if room is None:
+                self.registry.disconnect(client)
+            else:
+                self.run_in_room(
+                    room, lambda: self.leave_room(client, disconnected=True)
+                )
         except Exception:
             pass  # opponent already disconnected
+        self.flush()
+        stats = self.registry.stats()
+        print(
+            f"Client disconnected ({stats['rooms']} rooms, "
+            f"{stats['sessions']} sessions)"
+        )
+
+    # takes a client out of its room (or the room it watches) and lets the
+    # other players and the spectators know - a game keeps going while at
+    # least two players are left in it
+    def leave_room(self, client: Any, disconnected: bool = False) -> None:
+        if disconnected:
+            room, remaining = self.registry.disconnect(client)
+        else:
+            self.registry.stop_spectating(client)
+            room, remaining = self.registry.leave_room(client)
+        if room is None:
+            return
+        if room.started and len(room.round_indexes) < 2:
+            # nobody left to play against, the game ends without a winner -
+            # a lone player could otherwise give up every round and still
+            # be recorded as the winner
+            room.over = True
+            self.broadcast(Protocols.Response.OPPONENT_LEFT, None, room.audience())
+        elif room.started:
+            # the player who left may have been the last one still guessing
+            self.start_new_round_for_room(room)
+        self.send_standings(room)
+        if not remaining:
+            self.registry.drop_spectators(room)
+            with self.bot_lock:
+                self.bot_rooms.discard(room)
+
+    # routes a request to the room it changes - room requests run on that
+    # room's mailbox, the handler waits for them so one client's requests
+    # still happen in the order they were sent
+    def dispatch(self, message: Dict[str, Any], client: Connection) -> None:
+        r_type = message.get("type")
+        data = message.get("data")
 
-    # begins new round
-    def start_new_round_for_room(self, room: Room) -> None:
-        if len(room.finished_players) < 2:
+        room: Optional[Room] = None
+        if r_type in (
+            Protocols.Request.CREATE_GAME, Protocols.Request.JOIN_GAME,
+            Protocols.Request.FIND_MATCH, Protocols.Request.SPECTATE
+        ):
+            if r_type == Protocols.Request.FIND_MATCH:
+                # one process holds every queue a widened search can reach
+                bucket = bucket_of(data)
+                room_code = route_key(bucket) if bucket else None
+            else:
+                room_code = requested_room(message)
+            # a player entering a room (or queueing again) is no longer
+            # waiting for a match, also when the request moves it to
+            # another worker
+            self.matchmaker.cancel(client)
+            if (
+                self.shard is not None and room_code is not None
+                and not self.shard.owns(room_code)
+            ):
+                self.hand_off(client, room_code, message)
+
+            # creating or joining a room while still in another one leaves
+            # the old one first (on the old room's mailbox)
+            old_room = self.registry.room_of(client)
+            if old_room is not None:
+                self.run_in_room(old_room, lambda: self.leave_room(client))
+            self.registry.stop_spectating(client)
+            if r_type in (
+                Protocols.Request.JOIN_GAME, Protocols.Request.SPECTATE
+            ) and isinstance(data, dict):
+                room_code = data.get("room_code")
+                if isinstance(room_code, str):
+                    room = self.registry.room_by_code(room_code)
+        elif r_type in (
+            Protocols.Request.GUESS, Protocols.Request.ANSWER,
+            Protocols.Request.HINT, Protocols.Request.LEAVE
+        ):
+            room = self.registry.room_of(client)
+
+        # creates and quick matches have no room yet, they run here and set
+        # up the new room on its own mailbox (see open_room, start_match)
+        if room is None:
+            self.process(message, client)
+        else:
+            self.run_in_room(room, lambda: self.process(message, client))
+
+    # handles one request, then writes everything it produced with a single
+    # write per connection instead of one per message
+    def process(self, message: Dict[str, Any], client: Connection) -> None:
+        try:
+            self.handle_receive(message, client)
+        finally:
+            self.flush()
+
+    # moves a connection to the worker owning room_code, the request runs
+    # there - raises HandedOff so the reader here stops
+    def hand_off(
+        self, client: Connection, room_code: str, message: Dict[str, Any]
+    ) -> None:
+        assert self.shard is not None
+        old_room = self.registry.room_of(client)
+        if old_room is not None:
+            self.run_in_room(old_room, lambda: self.leave_room(client))
+        self.registry.disconnect(client)
+        self.flush()
+
+        wire_format = BINARY if client.framer.length_prefixed else JSON
+        unread = client.framer.take_unread()
+        self.shard.hand_off(
+            client.detach(), room_code, wire_format, message, unread
+        )
+        raise HandedOff(room_code)
+
+    # serves connections other workers handed to this one
+    def receive_handoffs(self) -> None:
+        assert self.shard is not None
+        while True:
+            try:
+                sock, wire_format, message, unread = self.shard.receive()
+            except (EOFError, OSError):
+                # the parent is gone, stop the way a kill from it would (sent
+                # to the main thread so its blocking accept is interrupted)
+                signal.pthread_kill(threading.main_thread().ident, signal.SIGTERM)
+                return
+            connection = Connection(sock, self.writer)
+            connection.codec = CODECS[wire_format]
+            connection.framer.length_prefixed = wire_format == BINARY
+            connection.framer.feed(unread)
+            thread = threading.Thread(
+                target=self.handle, args=(connection, message)
+            )
+            thread.start()
+
+    # runs a task on the room's mailbox and waits for it
+    def run_in_room(self, room: Room, task: Any) -> None:
+        if room.mailbox is None:
+            task()
+            return
+        room.mailbox.submit(task).result()
+
+    # pairs players that waited too long with nearby buckets and hands in
+    # the bot answers that are due
+    def tick(self) -> None:
+        for host, guest in self.matchmaker.widen():
+            self.start_match(host, guest)
+        with self.bot_lock:
+            rooms = list(self.bot_rooms)
+        for room in rooms:
+            self.run_in_room(room, lambda room=room: self.advance_bots(room))
+        self.publish_standings()
+        if time.monotonic() - self.stats_logged >= STATS_SECONDS:
+            self.log_stats()
+
+    # how the win recorder and the database pool are keeping up, printed
+    # when something changed
+    def log_stats(self) -> None:
+        self.stats_logged = time.monotonic()
+        stats = self.recorder.stats()
+        pools = self.db.pool_stats()
+        if {"wins": stats, "pools": pools} == self.last_stats:
             return
+        self.last_stats = {"wins": stats, "pools": pools}
+        print(
+            f"Wins: {stats['recorded']} recorded, {stats['committed']} "
+            f"committed in {stats['commits']} commits "
+            f"(avg {stats['avg_commit_ms']:.1f} ms, "
+            f"max {stats['max_commit_ms']:.1f} ms), "
+            f"{stats['queue_depth']} queued, "
+            f"{stats['failed_commits']} failed, {stats['dropped']} dropped"
+        )
+        for name, pool in pools.items():
+            print(
+                f"DB pool {name}: {pool['in_use']}/{pool['size']} in use, "
+                f"{pool['checkouts']} checkouts "
+                f"(avg wait {pool['avg_wait_ms']:.1f} ms, "
+                f"max {pool['max_wait_ms']:.1f} ms)"
+            )
 
-        if room.is_infinite and len(room.failed_players) == 2:
-            if room.points:
-                
-                winner_client = max(room.points.keys(), key=lambda k: room.points.get(k, 0))
-                winner_name = self.client_names[winner_client]
+    def tick_forever(self) -> None:
+        while True:
+            time.sleep(MATCH_TICK_SECONDS)
+            try:
+                self.tick()
+            except Exception:
+                pass  # a player left while being matched
+
+    # connections with queued messages from this thread
+    def touched(self) -> Set[Connection]:
+        touched = getattr(self.batch, "connections", None)
+        if touched is None:
+            touched = set()
+            self.batch.connections = touched
+        return touched
+
+    # flushes the outbound queue of every connection this thread sent to
+    def flush(self) -> None:
+        touched = self.touched()
+        for connection in touched:
+            connection.flush()
+        touched.clear()
+
+    # rooms whose standings changed on this thread since they were last sent
+    def changed_rooms(self) -> Set[Room]:
+        rooms = getattr(self.batch, "rooms", None)
+        if rooms is None:
+            rooms = set()
+            self.batch.rooms = rooms
+        return rooms
+
+    # sends every changed room one diff with all the answers, joins and
+    # leaves since the last one, however many there were
+    def publish_standings(self) -> None:
+        rooms = self.changed_rooms()
+        try:
+            for room in rooms:
+                self.send_standings(room)
+        except Exception:
+            pass  # the room closed meanwhile
+        finally:
+            rooms.clear()
+            self.flush()
+
+    # the standings diff of one room to its players and spectators, nothing
+    # if it has not changed - a full table replaces the client's copy
+    def send_standings(self, room: Room, full: bool = False) -> None:
+        standings = room.standings
+        if full:
+            standings.take_diff()
+            data: Dict[str, Any] = {"players": standings.table(), "left": []}
+        elif standings.dirty():
+            data = standings.take_diff()
+        else:
+            return
+        data["round"] = room.round
+        data["full"] = full
+        self.broadcast(Protocols.Response.STANDINGS, data, room.audience())
+
+    # makes a room with its mailbox, settings as sent by CREATE_GAME - no
+    # client can reach it until it is opened, which runs on that mailbox
+    def new_room(self, settings: Dict[str, Any]) -> Room:
+        room = Room(settings)
+        if self.actors is not None:
+            room.mailbox = self.actors.mailbox()
+        return room
+
+    # registers a new room under its code with the host, bots take the
+    # free seats and start the game right away (runs on the room's mailbox)
+    def open_room(
+        self,
+        room: Room,
+        room_code: str,
+        client: Any,
+        nickname: str,
+        bot: Optional[str] = None
+    ) -> None:
+        self.registry.create_room(room_code, room, client, nickname)
+
+        # bots take the free seats, nobody else needs to join (start_game
+        # sends the settings to everyone)
+        if bot is not None:
+            self.add_bots(room, bot)
+            self.start_game(room)
+        else:
+            self.send(Protocols.Response.SETTINGS, room.settings(), client)
+
+    # fills the free seats of a room with bots of one difficulty
+    def add_bots(self, room: Room, difficulty: str) -> None:
+        number = 1
+        while not room.full():
+            nickname = "Bot" if number == 1 else f"Bot {number}"
+            number += 1
+            if nickname not in room.nicknames:
+                room.add_bot(Bot(difficulty), nickname)
+
+    # every bot of the room works out the round that just started
+    def plan_bots(self, room: Room) -> None:
+        for bot in room.bots:
+            bot.plan_round(
+                room.word, room.mode, room.max_guesses, room.hard_mode
+            )
 
-                self.db.increase_wins(winner_name)
+    # finishes the bots whose thinking time is up, through the same path a
+    # player's last guess takes
+    def advance_bots(self, room: Room) -> None:
+        if room.over or not room.humans():
+            with self.bot_lock:
+                self.bot_rooms.discard(room)
+            return
+        now = time.monotonic()
+        for bot in room.bots:
+            if bot in room.finished_players:
+                continue
+            answer = bot.take_answer(now)
+            if answer is None:
+                continue
+            guesses_used, seconds, solved = answer
+            room.guesses_made[bot] = guesses_used
+            room.client_finished(bot, guesses_used, seconds, solved)
+            self.changed_rooms().add(room)
+        self.start_new_round_for_room(room)
+
+    # room is full - tells every player the settings, the standings and
+    # the first round's word
+    def start_game(self, room: Room) -> None:
+        room.start()
+        self.plan_bots(room)
+        if room.bots:
+            # the tick hands in their answers from now on
+            with self.bot_lock:
+                self.bot_rooms.add(room)
+        players = list(room.round_indexes)
+        self.broadcast(Protocols.Response.SETTINGS, room.settings(), players)
+        self.send_standings(room, full=True)
+        self.broadcast(Protocols.Response.ROUND_START, room.round_start(), players)
+        self.broadcast(Protocols.Response.START, None, players)
+
+    # puts two matched players into a fresh room with the host's settings,
+    # seated and started on the room's mailbox
+    def start_match(self, host: Ticket, guest: Ticket) -> None:
+        mode, attempts, rounds, infinite = host.bucket
+        room = self.new_room({
+            "mode": mode,
+            "rounds": rounds,
+            "infinite": infinite,
+            "max_guesses": attempts
+        })
+        self.run_in_room(room, lambda: self.seat_match(room, host, guest))
+
+    def seat_match(self, room: Room, host: Ticket, guest: Ticket) -> None:
+        self.registry.create_room(
+            f"match-{next(self.match_ids)}", room, host.client, host.nickname
+        )
+        self.registry.join_room(room, guest.client, guest.nickname)
+        print(f"Matched {host.nickname} with {guest.nickname} {host.bucket}")
+        self.start_game(room)
+
+    # announces the room's leader - games with bots are not recorded, a win
+    # over them is not a win over players
+    def end_game(self, room: Room) -> None:
+        room.over = True
+        winner_name = room.standings.leader()
+        if winner_name is not None:
+            if not room.bots:
+                self.recorder.record(winner_name)
+
+            self.broadcast(
+                Protocols.Response.WINNER, winner_name, room.audience()
+            )
+
+    # begins new round once every player has answered, the round's scores
+    # go out before the next word or the winner
+    def start_new_round_for_room(self, room: Room) -> None:
+        if room.over or not room.round_over():
+            return
+        self.send_standings(room)
 
-                for c in room.round_indexes.keys():
-                    self.send(Protocols.Response.WINNER, winner_name, c)
+        if room.is_infinite and len(room.failed_players) >= len(room.round_indexes):
+            self.end_game(room)
             return
 
         if not room.is_infinite:
             room.rounds -= 1
 
         if room.rounds <= 0 and not room.is_infinite:
-            if room.points:
-                winner_client = max(room.points.keys(), key=lambda k: room.points.get(k, 0))
-                winner_name = self.client_names[winner_client]
-
-                self.db.increase_wins(winner_name)
-
-                for c in room.round_indexes.keys():
-                    self.send(Protocols.Response.WINNER, winner_name, c)
+            self.end_game(room)
             return
 
-        if room.is_infinite:
-            random_word = room.chosen_list[
-                random.randint(0, len(room.chosen_list) - 1)
-            ]
-            letters = list(random_word)
-            room.guesses.append(letters)
-            for c in room.round_indexes.keys():
-                self.send(Protocols.Response.GUESSES, room.guesses, c)
-
-        for client_socket in room.round_indexes.keys():
-            opponent_client = self.opponent.get(client_socket)
-            if opponent_client:
-                opponent_name = self.client_names[opponent_client]
-                opponent_points = room.points.get(opponent_client, 0)
-                self.send(Protocols.Response.OPPONENT, {
-                    "name": opponent_name,
-                    "points": opponent_points
-                }, client_socket)
-            if not room.is_infinite:
-                room.round_indexes[client_socket] += 1
-            self.send(Protocols.Response.NEW_ROUND, None, client_socket)
+        # one word per round whatever the mode, never the whole game
+        room.next_word()
+        self.plan_bots(room)
 
-        room.finished_players.clear()
-        room.failed_players.clear()
+        if not room.is_infinite:
+            for client_socket in room.round_indexes:
+                room.round_indexes[client_socket] += 1
+        self.broadcast(
+            Protocols.Response.ROUND_START, room.round_start(),
+            list(room.round_indexes)
+        )
+
+    # refuses a nickname the database could not store as a username
+    def nickname_too_long(self, nickname: str, client: Connection) -> bool:
+        if len(nickname) <= MAX_NICKNAME:
+            return False
+        self.send(
+            Protocols.Response.INVALID_REQUEST,
+            f"Nicknames are at most {MAX_NICKNAME} characters",
+            client
+        )
+        return True
 
     # handles client requests and sends responses
-    def handle_receive(self, message: Dict[str, Any], client: socket.socket) -> None:
+    def handle_receive(self, message: Dict[str, Any], client: Connection) -> None:
         r_type = message.get("type")
         data = message.get("data")
 
@@ -114,103 +574,241 @@ class Server:
             attempts = data.get("attempts", mode + 1)
             rounds = data.get("rounds", 5)
             infinite = data.get("infinite", False)
+            players = data.get("players", MIN_PLAYERS)
+            hard_mode = data.get("hard_mode", False)
+            bot = data.get("bot")
 
             if not isinstance(room_code, str) or not isinstance(nickname, str):
                 return
+            if self.nickname_too_long(nickname, client):
+                return
+            if not isinstance(hard_mode, bool):
+                return
+            if bot is not None and bot not in DIFFICULTIES:
+                self.send(
+                    Protocols.Response.INVALID_REQUEST,
+                    f"Bots play {', '.join(DIFFICULTIES)}",
+                    client
+                )
+                return
+            if bot is not None and not self.bots_ready.is_set():
+                self.send(
+                    Protocols.Response.INVALID_REQUEST,
+                    "Bots are still starting up, try again shortly",
+                    client
+                )
+                return
+            if not isinstance(players, int) or not (
+                MIN_PLAYERS <= players <= MAX_PLAYERS
+            ):
+                self.send(
+                    Protocols.Response.INVALID_REQUEST,
+                    f"Rooms hold {MIN_PLAYERS}-{MAX_PLAYERS} players",
+                    client
+                )
+                return
 
             settings = {
                 "mode": mode,
                 "rounds": rounds,
                 "infinite": infinite,
-                "max_guesses": attempts
+                "max_guesses": attempts,
+                "players": players,
+                "hard_mode": hard_mode
             }
-            room = Room(client, settings)
-            room.mode = mode
-            room.rounds = rounds
-            room.max_guesses = attempts
-            room.is_infinite = infinite
-            room.nicknames.append(nickname)
+            room = self.new_room(settings)
+            self.run_in_room(
+                room,
+                lambda: self.open_room(room, room_code, client, nickname, bot)
+            )
 
-            self.rooms_by_code[room_code] = room
-            self.client_to_room[client] = room
-            self.client_names[client] = nickname
+        elif r_type == Protocols.Request.GUESS:
+            room = self.registry.room_of(client)
+            if not room or not room.started or room.over:
+                return
+            word = data.get("word") if isinstance(data, dict) else None
+            if client in room.finished_players:
+                self.send(
+                    Protocols.Response.INVALID_REQUEST,
+                    "Round already finished",
+                    client
+                )
+                return
+            if (
+                not isinstance(word, str) or len(word) != room.mode
+                or not self.lexicon.is_guess(room.mode, word.upper())
+            ):
+                self.send(
+                    Protocols.Response.INVALID_REQUEST, "Invalid word", client
+                )
+                return
 
-            room.round_indexes = {client: 0}
-            room.points = {client: 0}
+            word = word.upper()
+            violation = room.hard_mode_violation(client, word)
+            if violation is not None:
+                self.send(Protocols.Response.INVALID_REQUEST, violation, client)
+                return
 
-            self.send(Protocols.Response.SETTINGS, {
-                "mode": mode,
-                "max_guesses": attempts,
-                "rounds": rounds,
-                "infinite": infinite
+            pattern, guesses_used, solved = room.guess(client, word)
+            result: Dict[str, Any] = {
+                "round": room.round,
+                "word": word,
+                "pattern": pattern,
+                "guess": guesses_used,
+                "solved": solved,
+                "remaining": room.remaining(client)
+            }
+            finished = client in room.finished_players
+            if finished:
+                # the player is done with the word, it can be shown now
+                result["answer"] = room.word
+            self.send(Protocols.Response.GUESS_RESULT, result, client)
+
+            if finished:
+                # O(log n) standings update, the room hears about it in the
+                # next batched diff
+                self.changed_rooms().add(room)
+                self.start_new_round_for_room(room)
+
+        elif r_type == Protocols.Request.HINT:
+            # an answer the player's guesses still allow, and how many do
+            room = self.registry.room_of(client)
+            if not room or not room.started or room.over:
+                return
+            if client in room.finished_players:
+                self.send(
+                    Protocols.Response.INVALID_REQUEST,
+                    "Round already finished",
+                    client
+                )
+                return
+            self.send(Protocols.Response.HINT, {
+                "round": room.round,
+                "remaining": room.remaining(client),
+                "hint": room.hint(client)
             }, client)
 
         elif r_type == Protocols.Request.ANSWER:
-            room = self.client_to_room.get(client)
-            if not room or not isinstance(data, dict):
+            # gives up the round, scores come from the server's own guesses
+            # and clock so nothing in the request is trusted
+            room = self.registry.room_of(client)
+            if not room or not room.started or room.over:
                 return
-            room.client_finished(client, cast(Dict[str, Any], data))
+            if client in room.finished_players:
+                return
+            room.client_finished(
+                client, room.max_guesses,
+                time.monotonic() - room.round_started, False
+            )
+            self.changed_rooms().add(room)
+            self.send(
+                Protocols.Response.GUESS_RESULT, {
+                    "round": room.round,
+                    "guess": room.guesses_made.get(client, 0),
+                    "solved": False,
+                    "answer": room.word
+                }, client
+            )
+            self.start_new_round_for_room(room)
 
-            opponent = self.opponent.get(client)
-            self.send(Protocols.Response.POINTS_UPDATE, {
-                "your_points": room.points.get(client, 0),
-                "opponent_points": room.points.get(opponent, 0)
-                if opponent else 0
+        elif r_type == Protocols.Request.SPECTATE:
+            if not isinstance(data, dict):
+                return
+            room_code = data.get("room_code")
+            if not isinstance(room_code, str):
+                return
+            room = self.registry.room_by_code(room_code)
+            if not room:
+                self.send(
+                    Protocols.Response.INVALID_REQUEST,
+                    "Room not found",
+                    client
+                )
+                return
+            self.registry.spectate(room, client)
+            self.send(Protocols.Response.SETTINGS, room.settings(), client)
+            # the full table to start from, diffs follow with everyone else's
+            self.send(Protocols.Response.STANDINGS, {
+                "players": room.standings.table(),
+                "left": [],
+                "round": room.round,
+                "full": True
             }, client)
 
-            if opponent:
-                self.send(Protocols.Response.POINTS_UPDATE, {
-                    "your_points": room.points.get(opponent, 0),
-                    "opponent_points": room.points.get(client, 0)
-                }, opponent)
-
-            self.start_new_round_for_room(room)
-
         elif r_type == Protocols.Request.LEAVE:
-            room = self.client_to_room.get(client)
-            if not room:
+            # leaving the waiting screen of a quick match
+            self.matchmaker.cancel(client)
+            self.leave_room(client)
+
+        elif r_type == Protocols.Request.FIND_MATCH:
+            bucket = bucket_of(data)
+            nickname = data.get("nickname") if isinstance(data, dict) else None
+            if bucket is None or not isinstance(nickname, str):
+                self.send(
+                    Protocols.Response.INVALID_REQUEST,
+                    "Invalid match settings",
+                    client
+                )
+                return
+            if self.nickname_too_long(nickname, client):
                 return
+            pair = self.matchmaker.find(client, nickname, bucket)
+            if pair is not None:
+                self.start_match(*pair)
 
-            room_code: Optional[str] = None
-            for code, r in self.rooms_by_code.items():
-                if r == room:
-                    room_code = code
-                    break
+        elif r_type == Protocols.Request.GET_MATCH_STATS:
+            self.send(
+                Protocols.Response.MATCH_STATS, self.matchmaker.stats(), client
+            )
 
-            opponent = self.opponent.get(client)
-            if opponent:
-                self.send(Protocols.Response.OPPONENT_LEFT, None, opponent)
-
-                if opponent in self.opponent and self.opponent[opponent] == client:
-                    del self.opponent[opponent]
-                del self.opponent[client]
-
-            if client in self.client_to_room:
-                del self.client_to_room[client]
-            if client in self.client_names:
-                del self.client_names[client]
-
-            if client in room.round_indexes:
-                del room.round_indexes[client]
-            if client in room.points:
-                del room.points[client]
-
-            if room.host == client and room.guest:
-                room.host = room.guest
-                room.guest = None
-            elif room.guest == client:
-                room.guest = None
-
-            if len(room.round_indexes) == 0:
-                if room_code and room_code in self.rooms_by_code:
-                    del self.rooms_by_code[room_code]
-            else:
-                remaining_client = list(room.round_indexes.keys())[0]
-                self.send(Protocols.Response.OPPONENT_LEFT, None, remaining_client)
+        elif r_type == Protocols.Request.WIRE_FORMAT:
+            wire_format = data.get("format") if isinstance(data, dict) else None
+            if wire_format not in CODECS:
+                wire_format = JSON
+
+            # the answer still goes out in the old format, every frame after
+            # it (both ways) uses the new one
+            self.send(Protocols.Response.WIRE_FORMAT, {
+                "format": wire_format
+            }, client)
+            client.codec = CODECS[wire_format]
+            client.framer.length_prefixed = wire_format == BINARY
 
         elif r_type == Protocols.Request.GET_LEADERBOARD:
             leaderboard_data = self.db.get_leaderboard()
             self.send(Protocols.Response.LEADERBOARD, leaderboard_data, client)
+        elif r_type == Protocols.Request.GET_LEADERBOARD_PAGE:
+            if not isinstance(data, dict):
+                data = {}
+            limit = data.get("limit", 10)
+            offset = data.get("offset", 0)
+            after = data.get("after")
+            if not isinstance(limit, int) or not isinstance(offset, int):
+                return
+            # the next cursor of the previous page: wins, username and rank
+            # (older clients leave the rank out)
+            if after is not None and (
+                not isinstance(after, list) or len(after) not in (2, 3)
+                or not isinstance(after[0], int) or not isinstance(after[1], str)
+                or (len(after) == 3 and not isinstance(after[2], int))
+            ):
+                return
+            page = self.db.get_leaderboard_page(
+                max(1, min(limit, MAX_PAGE_SIZE)), max(0, offset), after
+            )
+            self.send(Protocols.Response.LEADERBOARD_PAGE, page, client)
+
+        elif r_type == Protocols.Request.GET_RANK:
+            if not isinstance(data, dict):
+                data = {}
+            # defaults to the nickname the client plays under
+            username = data.get("username", self.registry.name_of(client))
+            radius = data.get("radius", 2)
+            if not isinstance(username, str) or not isinstance(radius, int):
+                return
+            rank = self.db.get_rank(username, max(0, min(radius, MAX_PAGE_SIZE)))
+            self.send(Protocols.Response.RANK, rank, client)
+
         elif r_type == Protocols.Request.JOIN_GAME:
             if not isinstance(data, dict):
                 return
@@ -219,8 +817,10 @@ class Server:
             
             if not isinstance(room_code, str) or not isinstance(nickname, str):
                 return
+            if self.nickname_too_long(nickname, client):
+                return
                 
-            room = self.rooms_by_code.get(room_code)
+            room = self.registry.room_by_code(room_code)
 
             if not room:
                 self.send(
@@ -238,84 +838,153 @@ class Server:
                 )
                 return
 
-            if len(room.round_indexes) >= 2:
+            if room.started:
                 self.send(
                     Protocols.Response.INVALID_REQUEST,
-                    "Room full",
+                    "Game already started",
                     client
                 )
                 return
 
-            second_client = client
-            room.round_indexes[second_client] = 0
-            room.points[second_client] = 0
-            self.client_names[second_client] = nickname
-
-            first_client = [
-                c for c in room.round_indexes.keys() if c != second_client
-            ][0]
-            self.opponent[first_client] = second_client
-            self.opponent[second_client] = first_client
-
-            self.client_to_room[second_client] = room
-            self.client_to_room[first_client] = room
+            if not self.registry.join_room(room, client, nickname):
+                self.send(
+                    Protocols.Response.INVALID_REQUEST,
+                    "Room full",
+                    client
+                )
+                return
 
             print(f"Client {nickname} joining room {room_code}")
 
-            if len(room.round_indexes) == 2:
-                for c in room.round_indexes.keys():
-                    self.send(Protocols.Response.GUESSES, room.guesses, c)
-                    self.send(Protocols.Response.SETTINGS, {
-                        "mode": room.mode,
-                        "max_guesses": room.max_guesses,
-                        "rounds": room.rounds,
-                        "infinite": room.is_infinite
-                    }, c)
-                    opponent_client = self.opponent.get(c)
-                    if opponent_client:
-                        opponent_name = self.client_names[opponent_client]
-                        opponent_points = room.points.get(opponent_client, 0)
-                        self.send(Protocols.Response.OPPONENT, {
-                            "name": opponent_name,
-                            "points": opponent_points
-                        }, c)
-                    self.send(Protocols.Response.START, None, c)
+            if room.full():
+                self.start_game(room)
+            else:
+                # the players waiting see the room fill up
+                self.changed_rooms().add(room)
 
     # send function
     def send(
         self,
         r_type: Union[Protocols.Response, str],
         data: Any,
-        client: socket.socket
+        client: Connection
     ) -> None:
-        message = {"type": r_type, "data": data}
-        message_str = json.dumps(message) + "\n"
         try:
-            client.send(message_str.encode("ascii"))
+            client.send(client.codec.encode(r_type, data))
         except (ConnectionResetError, BrokenPipeError):
-            pass
+            return
+        self.touched().add(client)
 
-    # sends to opponent
-    def send_to_opponent(
+    # sends the same message to many clients - it is encoded once per wire
+    # format in use, every client's queue gets the same bytes
+    def broadcast(
         self,
         r_type: Union[Protocols.Response, str],
         data: Any,
-        client: socket.socket
+        clients: Iterable[Connection]
     ) -> None:
-        opponent = self.opponent.get(client)
-        if not opponent:
-            return
-        self.send(r_type, data, opponent)
+        frames: Dict[str, bytes] = {}
+        for client in clients:
+            codec = client.codec
+            frame = frames.get(codec.name)
+            if frame is None:
+                frame = frames[codec.name] = codec.encode(r_type, data)
+            try:
+                client.send(frame)
+            except (ConnectionResetError, BrokenPipeError):
+                continue
+            self.touched().add(client)
 
     # recieves
     def receive(self) -> None:
+        threading.Thread(target=self.tick_forever, daemon=True).start()
+        if self.shard is not None:
+            threading.Thread(target=self.receive_handoffs, daemon=True).start()
         while True:
             client, address = self.server.accept()
             print(f"Connected on the address")
-            thread = threading.Thread(target=self.handle, args=(client,))
+            connection = Connection(client, self.writer)
+            thread = threading.Thread(target=self.handle, args=(connection,))
             thread.start()
 
+    # recieves on a single asyncio event loop instead of a thread per client
+    # (the loop already runs one request at a time, so rooms need no mailbox)
+    def receive_async(self) -> None:
+        if self.actors is not None:
+            self.actors.shutdown()
+            self.actors = None
+        asyncio.run(serve(self))
+
+    # commits the wins still queued and closes the database
+    def shutdown(self) -> None:
+        if self.actors is not None:
+            self.actors.shutdown()
+        self.recorder.close()
+        self.log_stats()
+        self.db.close()
+
 
 if __name__ == "__main__":
-    server = Server()
-    server.receive()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="PVP Wordle server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=55555)
+    parser.add_argument(
+        "--asyncio", action="store_true",
+        help="serve every client from one event loop instead of one thread each"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=0,
+        help="fork this many worker processes, rooms are split between them "
+             "by room code (linux only)"
+    )
+    parser.add_argument(
+        "--db-pool-size", type=int, default=None,
+        help="database connections per process (default: one shared connection)"
+    )
+    parser.add_argument(
+        "--no-ranking-index", action="store_true",
+        help="answer leaderboard and rank requests from the database"
+    )
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        if args.asyncio:
+            parser.error("--workers runs threaded workers, drop --asyncio")
+        if not supported():
+            parser.error("--workers needs SO_REUSEPORT and fd passing (linux)")
+
+        # every worker is a full server for the rooms it owns, leaderboards
+        # come from the shared database since no worker sees every win
+        def run_worker(index: int, shard: Shard) -> None:
+            server = Server(
+                args.host, args.port, args.db_pool_size, False,
+                WORKER_LEADERBOARD_TTL, shard
+            )
+            try:
+                server.receive()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                # ctrl+c reaches the whole process group and the parent stops
+                # the workers as well, let the first signal finish the job
+                signal.signal(signal.SIGINT, signal.SIG_IGN)
+                signal.signal(signal.SIGTERM, signal.SIG_IGN)
+                server.shutdown()
+
+        try:
+            run_workers(args.workers, run_worker)
+        except KeyboardInterrupt:
+            pass
+    else:
+        server = Server(
+            args.host, args.port, args.db_pool_size, not args.no_ranking_index
+        )
+        try:
+            if args.asyncio:
+                server.receive_async()
+            else:
+                server.receive()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.shutdown()
\ No newline at end of file
@@ -0,0 +1,227 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+# (mode, attempts, rounds, infinite) - players only meet players asking for
+# the same game until they have waited WIDEN_SECONDS
+Bucket = Tuple[int, int, int, bool]
+
+# seconds before a waiting player also accepts games from nearby buckets
+WIDEN_SECONDS: float = 10.0
+# how often waiting players are checked for a wider search
+MATCH_TICK_SECONDS: float = 1.0
+# how far a widened search looks from the asked for settings
+WIDEN_ATTEMPTS: int = 1
+WIDEN_ROUNDS: int = 2
+# waits kept for the percentiles
+WAIT_SAMPLES: int = 10000
+
+
+# a player waiting in a queue
+class Ticket:
+    __slots__ = ("client", "nickname", "bucket", "queued_at")
+
+    def __init__(self, client: Any, nickname: str, bucket: Bucket) -> None:
+        self.client: Any = client
+        self.nickname: str = nickname
+        self.bucket: Bucket = bucket
+        self.queued_at: float = time.monotonic()
+
+
+# checks FIND_MATCH settings the same way the create screen does, returns
+# the bucket or None
+def bucket_of(data: Any) -> Optional[Bucket]:
+    if not isinstance(data, dict):
+        return None
+    mode = data.get("mode", 5)
+    attempts = data.get("attempts", mode + 1 if isinstance(mode, int) else 0)
+    rounds = data.get("rounds", 5)
+    infinite = data.get("infinite", False)
+    if not all(isinstance(v, int) for v in (mode, attempts, rounds)):
+        return None
+    if mode not in range(5, 8) or attempts not in range(2, mode + 2):
+        return None
+    if not isinstance(infinite, bool) or rounds <= 0:
+        return None
+    # rounds do not matter for infinite games
+    return mode, attempts, 1 if infinite else rounds, infinite
+
+
+# name of a bucket in the stats
+def bucket_key(bucket: Bucket) -> str:
+    mode, attempts, rounds, infinite = bucket
+    return f"match:{mode}/{attempts}/{rounds}/{int(infinite)}"
+
+
+# name a bucket is routed by in workers or gateway mode - only the word
+# length and infinite setting, which a widened search never changes, so
+# every bucket nearby_buckets can reach is queued in the same process
+def route_key(bucket: Bucket) -> str:
+    mode, _, _, infinite = bucket
+    return f"match:{mode}/{int(infinite)}"
+
+
+# buckets a widened search also takes a partner from, same word length and
+# infinite setting, attempts and rounds close to the asked for ones
+def nearby_buckets(bucket: Bucket) -> List[Bucket]:
+    mode, attempts, rounds, infinite = bucket
+    nearby: List[Bucket] = []
+    for d_attempts in range(-WIDEN_ATTEMPTS, WIDEN_ATTEMPTS + 1):
+        other_attempts = attempts + d_attempts
+        if other_attempts not in range(2, mode + 2):
+            continue
+        round_steps = [0] if infinite else range(-WIDEN_ROUNDS, WIDEN_ROUNDS + 1)
+        for d_rounds in round_steps:
+            other_rounds = rounds + d_rounds
+            if other_rounds <= 0 or (d_attempts, d_rounds) == (0, 0):
+                continue
+            nearby.append((mode, other_attempts, other_rounds, infinite))
+    # closest settings first
+    nearby.sort(key=lambda b: (abs(b[1] - attempts), abs(b[2] - rounds)))
+    return nearby
+
+
+# quick match queues - one fifo per bucket, pairing is a pop from the
+# player's own bucket, players who waited too long also take the oldest
+# player of a nearby bucket (and get that player's settings). Two players
+# under the same nickname are never paired, rooms key standings by name
+class Matchmaker:
+    def __init__(self, widen_seconds: float = WIDEN_SECONDS) -> None:
+        self.widen_seconds: float = widen_seconds
+        self.lock: threading.Lock = threading.Lock()
+        self.queues: Dict[Bucket, "OrderedDict[Any, Ticket]"] = {}
+        self.tickets: Dict[Any, Ticket] = {}
+        self.waits: Deque[float] = deque(maxlen=WAIT_SAMPLES)
+        self.matches: int = 0
+
+    # queues a player, or returns the pair it is matched into - the first
+    # ticket hosts and its bucket is the game that gets played
+    def find(
+        self, client: Any, nickname: str, bucket: Bucket
+    ) -> Optional[Tuple[Ticket, Ticket]]:
+        ticket = Ticket(client, nickname, bucket)
+        with self.lock:
+            self.remove(client)
+            partner = self.pop_oldest(bucket, nickname)
+            if partner is not None:
+                self.record(partner, ticket)
+                return partner, ticket
+
+            # someone nearby who stopped caring about the exact settings
+            # plays this player's game
+            partner = self.pop_widened(bucket, ticket.queued_at, nickname)
+            if partner is not None:
+                self.record(partner, ticket)
+                return ticket, partner
+
+            self.enqueue(ticket)
+            return None
+
+    # takes a player out of the queue (leave or disconnect), True if queued
+    def cancel(self, client: Any) -> bool:
+        with self.lock:
+            return self.remove(client)
+
+    # pairs players that waited past the widen timeout with players of
+    # nearby buckets, called every MATCH_TICK_SECONDS
+    def widen(self) -> List[Tuple[Ticket, Ticket]]:
+        now = time.monotonic()
+        pairs: List[Tuple[Ticket, Ticket]] = []
+        with self.lock:
+            overdue = [
+                t for t in self.tickets.values()
+                if now - t.queued_at >= self.widen_seconds
+            ]
+            for ticket in overdue:
+                if self.tickets.get(ticket.client) is not ticket:
+                    continue  # already paired this tick
+                for bucket in nearby_buckets(ticket.bucket):
+                    partner = self.pop_oldest(bucket, ticket.nickname)
+                    if partner is None:
+                        continue
+                    self.remove(ticket.client)
+                    # the player that was found keeps its settings
+                    self.record(partner, ticket)
+                    pairs.append((partner, ticket))
+                    break
+        return pairs
+
+    def queued(self, client: Any) -> bool:
+        return client in self.tickets
+
+    # caller holds the lock
+    def enqueue(self, ticket: Ticket) -> None:
+        self.queues.setdefault(ticket.bucket, OrderedDict())[ticket.client] = ticket
+        self.tickets[ticket.client] = ticket
+
+    # oldest player of a bucket not playing under nickname (caller holds
+    # the lock) - the players skipped over are almost always none
+    def oldest(self, bucket: Bucket, nickname: str) -> Optional[Ticket]:
+        for ticket in self.queues.get(bucket, {}).values():
+            if ticket.nickname != nickname:
+                return ticket
+        return None
+
+    # caller holds the lock
+    def pop_oldest(self, bucket: Bucket, nickname: str) -> Optional[Ticket]:
+        ticket = self.oldest(bucket, nickname)
+        if ticket is not None:
+            self.remove(ticket.client)
+        return ticket
+
+    # oldest overdue player of a nearby bucket (caller holds the lock)
+    def pop_widened(
+        self, bucket: Bucket, now: float, nickname: str
+    ) -> Optional[Ticket]:
+        for other in nearby_buckets(bucket):
+            oldest = self.oldest(other, nickname)
+            if oldest is not None and now - oldest.queued_at >= self.widen_seconds:
+                return self.pop_oldest(other, nickname)
+        return None
+
+    # caller holds the lock
+    def remove(self, client: Any) -> bool:
+        ticket = self.tickets.pop(client, None)
+        if ticket is None:
+            return False
+        queue = self.queues.get(ticket.bucket)
+        if queue is not None:
+            queue.pop(client, None)
+            if not queue:
+                del self.queues[ticket.bucket]
+        return True
+
+    # both players' queue waits (caller holds the lock)
+    def record(self, *tickets: Ticket) -> None:
+        now = time.monotonic()
+        for ticket in tickets:
+            self.waits.append(now - ticket.queued_at)
+        self.matches += 1
+
+    # queue wait percentiles in seconds over the last WAIT_SAMPLES waits,
+    # plus what is waiting right now
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            waits = sorted(self.waits)
+            queued = len(self.tickets)
+            buckets = {
+                bucket_key(bucket): len(queue)
+                for bucket, queue in self.queues.items()
+            }
+            matches = self.matches
+
+        def percentile(p: float) -> float:
+            if not waits:
+                return 0.0
+            return waits[min(len(waits) - 1, int(p / 100 * len(waits)))]
+
+        return {
+            "matches": matches,
+            "queued": queued,
+            "buckets": buckets,
+            "wait_p50": percentile(50),
+            "wait_p90": percentile(90),
+            "wait_p99": percentile(99),
+            "wait_max": waits[-1] if waits else 0.0,
+        }
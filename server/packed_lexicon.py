@@ -0,0 +1,320 @@
+import mmap
+import os
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union, overload
+
+# compiled form of the word lists - one read only file both the server and
+# the client memory map, so no process keeps a str per word on its heap
+# (kept the same in client/ and server/)
+#
+#   header   magic, number of sections
+#   section  word length, word count, answer count and the offsets of:
+#     words    every accepted word of the length, upper case ascii, sorted,
+#              fixed width (no separators, word i is at i * length)
+#     prefixes 26 * 26 + 1 u32 word numbers, where the words starting with
+#              each two letter prefix begin - a lookup only searches those
+#     flags    one byte per word - FLAG_ANSWER, FLAG_GUESS
+#     answers  u32 word numbers of the answer list, in the list's own order
+#              (rooms and the feedback matrices index answers by it)
+MAGIC: bytes = b"PVPLEX\x00\x01"
+HEADER: struct.Struct = struct.Struct("<8sI")
+SECTION: struct.Struct = struct.Struct("<B3xIIIIII")
+WORD_NUMBER: struct.Struct = struct.Struct("<I")
+# first word of a prefix and of the next one
+PREFIX_RANGE: struct.Struct = struct.Struct("<II")
+PREFIXES: int = 26 * 26
+
+FLAG_ANSWER: int = 1
+# in the longer list of accepted guesses
+FLAG_GUESS: int = 2
+
+LEXICON_FILE: str = "lexicon.bin"
+
+# (answer list, accepted guesses) of every word length
+SOURCE_FILES: Dict[int, Tuple[str, str]] = {
+    5: ("fiveletterwords.txt", "longerfiveletterwords.txt"),
+    6: ("sixletterwords.txt", "longersixletterwords.txt"),
+    7: ("sevenletterwords.txt", "longersevenletterwords.txt"),
+}
+
+
+# the sorted words of one length, read straight from the mapping - lookups
+# are a binary search over fixed width slices, nothing is decoded but the
+# words that are asked for
+class WordBlock(Sequence[str]):
+    def __init__(
+        self, view: memoryview, prefixes: memoryview, length: int, count: int
+    ) -> None:
+        self.view: memoryview = view
+        self.prefixes: memoryview = prefixes
+        self.length: int = length
+        self.count: int = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    @overload
+    def __getitem__(self, index: int) -> str: ...
+    @overload
+    def __getitem__(self, index: slice) -> List[str]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.count))]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        start = index * self.length
+        return str(self.view[start:start + self.length], "ascii")
+
+    # word number of an upper case word, -1 if it is not in the block
+    def find(self, word: str) -> int:
+        if len(word) != self.length or not word.isascii():
+            return -1
+        key = word.encode("ascii")
+        prefix = (key[0] - 65) * 26 + key[1] - 65
+        if not 0 <= prefix < PREFIXES:
+            return -1
+        view, length = self.view, self.length
+        low, end = PREFIX_RANGE.unpack_from(
+            self.prefixes, prefix * WORD_NUMBER.size
+        )
+        high = end
+        while low < high:
+            middle = (low + high) // 2
+            start = middle * length
+            if view[start:start + length].tobytes() < key:
+                low = middle + 1
+            else:
+                high = middle
+        start = low * length
+        if low < end and view[start:start + length] == key:
+            return low
+        return -1
+
+    def __contains__(self, word: object) -> bool:
+        return isinstance(word, str) and self.find(word) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        for index in range(self.count):
+            yield self[index]
+
+
+# a length's answer list in its original order, as word numbers into the
+# block
+class AnswerList(Sequence[str]):
+    def __init__(self, block: WordBlock, numbers: memoryview, count: int) -> None:
+        self.block: WordBlock = block
+        self.numbers: memoryview = numbers
+        self.count: int = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    @overload
+    def __getitem__(self, index: int) -> str: ...
+    @overload
+    def __getitem__(self, index: slice) -> List[str]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.count))]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        (number,) = WORD_NUMBER.unpack_from(
+            self.numbers, index * WORD_NUMBER.size
+        )
+        return self.block[number]
+
+    def __iter__(self) -> Iterator[str]:
+        for index in range(self.count):
+            yield self[index]
+
+
+# an opened lexicon file - one mmap call, the sections are views into it
+class PackedLexicon:
+    def __init__(self, path: Path) -> None:
+        self.path: Path = path
+        with open(path, "rb") as file:
+            self.mapping: mmap.mmap = mmap.mmap(
+                file.fileno(), 0, access=mmap.ACCESS_READ
+            )
+        view = memoryview(self.mapping)
+        magic, sections = HEADER.unpack_from(view, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a lexicon file")
+
+        self.guesses: Dict[int, WordBlock] = {}
+        self.answers: Dict[int, AnswerList] = {}
+        self.flags: Dict[int, memoryview] = {}
+        for section in range(sections):
+            (
+                length, words, answers, words_offset, prefixes_offset,
+                flags_offset, answers_offset
+            ) = SECTION.unpack_from(view, HEADER.size + section * SECTION.size)
+            block = WordBlock(
+                view[words_offset:words_offset + words * length],
+                view[prefixes_offset:
+                     prefixes_offset + (PREFIXES + 1) * WORD_NUMBER.size],
+                length, words
+            )
+            self.guesses[length] = block
+            self.flags[length] = view[flags_offset:flags_offset + words]
+            self.answers[length] = AnswerList(
+                block,
+                view[answers_offset:answers_offset + answers * WORD_NUMBER.size],
+                answers
+            )
+
+    def size(self) -> int:
+        return len(self.mapping)
+
+
+# the compiled file of a word lists directory, None if it was not built or
+# a list changed since (callers then read the text files)
+def open_lexicon(directory: Path) -> Optional[PackedLexicon]:
+    path = directory / LEXICON_FILE
+    try:
+        built = path.stat().st_mtime
+        for file_names in SOURCE_FILES.values():
+            for file_name in file_names:
+                if (directory / file_name).stat().st_mtime > built:
+                    return None
+        return PackedLexicon(path)
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def read_words(path: Path) -> List[str]:
+    with open(path, "r", encoding="utf-8") as file:
+        return [
+            word.strip().upper() for word in file.read().splitlines()
+            if word.strip()
+        ]
+
+
+# build step - compiles the text lists of a directory into LEXICON_FILE,
+# written next to it first so a running process never maps half a file
+def compile_lexicon(directory: Path) -> Path:
+    sections: List[Tuple[int, bytes, bytes, bytes, bytes, int, int]] = []
+    for length, (answer_file, guess_file) in sorted(SOURCE_FILES.items()):
+        answers = list(dict.fromkeys(read_words(directory / answer_file)))
+        accepted = set(read_words(directory / guess_file))
+        words = sorted(accepted.union(answers))
+        for word in words:
+            if len(word) != length or not word.isascii() or not word.isalpha():
+                raise ValueError(f"{word!r} is not a {length} letter word")
+
+        number = {word: index for index, word in enumerate(words)}
+        answer_set = set(answers)
+        flags = bytes(
+            (FLAG_ANSWER if word in answer_set else 0)
+            | (FLAG_GUESS if word in accepted else 0)
+            for word in words
+        )
+        numbers = b"".join(WORD_NUMBER.pack(number[word]) for word in answers)
+
+        # words are sorted, so a prefix's words start where the first word
+        # at or after it is
+        starts: List[int] = []
+        index = 0
+        for prefix in range(PREFIXES + 1):
+            while index < len(words) and (
+                (ord(words[index][0]) - 65) * 26 + ord(words[index][1]) - 65
+                < prefix
+            ):
+                index += 1
+            starts.append(index)
+        prefixes = b"".join(WORD_NUMBER.pack(start) for start in starts)
+
+        sections.append((
+            length, "".join(words).encode("ascii"), prefixes, flags, numbers,
+            len(words), len(answers)
+        ))
+
+    offset = HEADER.size + SECTION.size * len(sections)
+    table: List[bytes] = []
+    blocks: List[bytes] = []
+    for (
+        length, words, prefixes, flags, numbers, word_count, answer_count
+    ) in sections:
+        words_offset = offset
+        prefixes_offset = words_offset + len(words)
+        flags_offset = prefixes_offset + len(prefixes)
+        answers_offset = flags_offset + len(flags)
+        offset = answers_offset + len(numbers)
+        table.append(SECTION.pack(
+            length, word_count, answer_count, words_offset, prefixes_offset,
+            flags_offset, answers_offset
+        ))
+        blocks += [words, prefixes, flags, numbers]
+
+    path = directory / LEXICON_FILE
+    partial = path.with_suffix(".partial")
+    with open(partial, "wb") as file:
+        file.write(HEADER.pack(MAGIC, len(sections)))
+        file.write(b"".join(table))
+        file.write(b"".join(blocks))
+    os.replace(partial, path)
+    return path
+
+
+# the client's word lists, from either copy of this file
+def default_directory() -> Path:
+    here = Path(__file__).resolve().parent
+    for directory in (here / "word lists", here.parent / "client" / "word lists"):
+        if directory.exists():
+            return directory
+    return here / "word lists"
+
+
+# builds the file and compares it with the text lists -
+# python packed_lexicon.py [word lists directory]
+def main(directory: Path) -> None:
+    started = time.perf_counter()
+    path = compile_lexicon(directory)
+    print(f"wrote {path} ({path.stat().st_size / 1024:.0f} KiB) in "
+          f"{(time.perf_counter() - started) * 1000:.1f} ms")
+
+    started = time.perf_counter()
+    lexicon = PackedLexicon(path)
+    print(f"  open (mmap): {(time.perf_counter() - started) * 1e6:.0f} us")
+
+    for length, (answer_file, guess_file) in sorted(SOURCE_FILES.items()):
+        started = time.perf_counter()
+        answers = read_words(directory / answer_file)
+        accepted = frozenset(read_words(directory / guess_file)).union(answers)
+        text_seconds = time.perf_counter() - started
+        text_bytes = sys.getsizeof(accepted) + sum(
+            sys.getsizeof(word) for word in accepted
+        )
+
+        block = lexicon.guesses[length]
+        assert list(lexicon.answers[length]) == answers
+        assert list(block) == sorted(accepted)
+        assert all(word in block for word in accepted)
+        assert not any(
+            word[::-1] in block for word in answers
+            if word[::-1] not in accepted
+        )
+
+        probes = [answers[i % len(answers)] for i in range(20_000)]
+        started = time.perf_counter()
+        for word in probes:
+            word in block
+        lookup = (time.perf_counter() - started) / len(probes)
+        print(
+            f"  {length} letters: {len(block)} words, text parse "
+            f"{text_seconds * 1000:.1f} ms / {text_bytes / 1024:.0f} KiB heap, "
+            f"lookup {lookup * 1e6:.2f} us"
+        )
+
+
+if __name__ == "__main__":
+    main(Path(sys.argv[1]) if len(sys.argv) > 1 else default_directory())
@@ -0,0 +1,155 @@
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+
+import psycopg2.pool
+
+# seconds a request waits for a free connection before giving up
+CHECKOUT_TIMEOUT: float = 5.0
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+# how long requests waited for a connection
+class PoolMetrics:
+    def __init__(self, size: int) -> None:
+        self.size: int = size
+        self.lock: threading.Lock = threading.Lock()
+        self.checkouts: int = 0
+        self.in_use: int = 0
+        self.total_wait: float = 0.0
+        self.max_wait: float = 0.0
+
+    def checked_out(self, waited: float) -> None:
+        with self.lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+
+    def checked_in(self) -> None:
+        with self.lock:
+            self.in_use -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "size": self.size,
+                "in_use": self.in_use,
+                "checkouts": self.checkouts,
+                "avg_wait_ms": (
+                    self.total_wait / self.checkouts * 1000
+                    if self.checkouts else 0.0
+                ),
+                "max_wait_ms": self.max_wait * 1000,
+            }
+
+
+# postgres - every thread checks a connection out of a ThreadedConnectionPool,
+# the semaphore makes callers wait for a free one instead of failing
+class PostgresPool:
+    def __init__(self, size: int, **params: Any) -> None:
+        self.pool = psycopg2.pool.ThreadedConnectionPool(1, size, **params)
+        self.available: threading.BoundedSemaphore = threading.BoundedSemaphore(size)
+        self.metrics: PoolMetrics = PoolMetrics(size)
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        started = time.perf_counter()
+        if not self.available.acquire(timeout=CHECKOUT_TIMEOUT):
+            raise PoolTimeout("no free database connection")
+        try:
+            conn = self.pool.getconn()
+        except Exception:
+            self.available.release()
+            raise
+        self.metrics.checked_out(time.perf_counter() - started)
+        try:
+            yield conn
+        finally:
+            # broken connections are replaced instead of handed out again
+            self.pool.putconn(conn, close=bool(conn.closed))
+            self.metrics.checked_in()
+            self.available.release()
+
+    # reads and writes share the pool
+    def reader(self) -> Any:
+        return self.connection()
+
+    def writer(self) -> Any:
+        return self.connection()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"connections": self.metrics.stats()}
+
+    def close(self) -> None:
+        self.pool.closeall()
+
+
+# sqlite - one writer connection (sqlite only ever has one writer) and a pool
+# of read connections, the database is switched to WAL so reads never wait
+# for a commit
+class SQLitePool:
+    def __init__(self, path: str, size: int) -> None:
+        self.path: str = path
+
+        self.write_conn: sqlite3.Connection = self.connect()
+        self.write_conn.execute("PRAGMA journal_mode=WAL;")
+        self.write_lock: threading.Lock = threading.Lock()
+        self.write_metrics: PoolMetrics = PoolMetrics(1)
+
+        self.read_conns: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        self.all_read_conns: List[sqlite3.Connection] = []
+        for _ in range(size):
+            conn = self.connect()
+            conn.execute("PRAGMA query_only=ON;")
+            self.read_conns.put(conn)
+            self.all_read_conns.append(conn)
+        self.read_metrics: PoolMetrics = PoolMetrics(size)
+
+    def connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(
+            self.path, check_same_thread=False, timeout=CHECKOUT_TIMEOUT
+        )
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        started = time.perf_counter()
+        try:
+            conn = self.read_conns.get(timeout=CHECKOUT_TIMEOUT)
+        except queue.Empty:
+            raise PoolTimeout("no free database connection")
+        self.read_metrics.checked_out(time.perf_counter() - started)
+        try:
+            yield conn
+        finally:
+            self.read_metrics.checked_in()
+            self.read_conns.put(conn)
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        started = time.perf_counter()
+        if not self.write_lock.acquire(timeout=CHECKOUT_TIMEOUT):
+            raise PoolTimeout("database writer is busy")
+        self.write_metrics.checked_out(time.perf_counter() - started)
+        try:
+            yield self.write_conn
+        finally:
+            self.write_metrics.checked_in()
+            self.write_lock.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "readers": self.read_metrics.stats(),
+            "writer": self.write_metrics.stats(),
+        }
+
+    def close(self) -> None:
+        for conn in self.all_read_conns:
+            conn.close()
+        self.write_conn.close()
@@ -1,25 +1,35 @@
 from typing import ClassVar
 
+# the binary wire format numbers message types in declaration order, the
+# client and server copies of this file must list the same types
 class Protocols:
     class Response:
-        NICKNAME: ClassVar[str] = "protocol.request_nickname"
-        GUESSES: ClassVar[str] = "protocol.guesses"
         START: ClassVar[str] = "protocol.start"
-        OPPONENT: ClassVar[str] = "protocol.opponent"
-        OPPONENT_ADVANCE: ClassVar[str] = "protocol.opponent_advance"
-        ANSWER_VALID: ClassVar[str] = "protocol.answer_valid"
         INVALID_REQUEST: ClassVar[str] = "protocol.invalid_request"
         WINNER: ClassVar[str] = "protocol.winner"
         OPPONENT_LEFT: ClassVar[str] = "protocol.opponent_left"
-        NEW_ROUND: ClassVar[str] = "protocol.new_round"
         SETTINGS: ClassVar[str] = "protocol.settings"
-        POINTS_UPDATE: ClassVar[str] = "protocol.points_update"
         LEADERBOARD: ClassVar[str] = "protocol.leaderboard"
+        WIRE_FORMAT: ClassVar[str] = "protocol.wire_format"
+        LEADERBOARD_PAGE: ClassVar[str] = "protocol.leaderboard_page"
+        RANK: ClassVar[str] = "protocol.rank"
+        MATCH_STATS: ClassVar[str] = "protocol.match_stats"
+        ROUND_START: ClassVar[str] = "protocol.round_start"
+        STANDINGS: ClassVar[str] = "protocol.standings"
+        GUESS_RESULT: ClassVar[str] = "protocol.guess_result"
+        HINT: ClassVar[str] = "protocol.hint"
 
     class Request:
         ANSWER: ClassVar[str] = "protocol.answer"
-        NICKNAME: ClassVar[str] = "protocol.send_nickname"
         LEAVE: ClassVar[str] = "protocol.leave"
         JOIN_GAME: ClassVar[str] = "protocol.join_game"
         CREATE_GAME: ClassVar[str] = "protocol.create_game"
         GET_LEADERBOARD: ClassVar[str] = "protocol.get_leaderboard"
+        WIRE_FORMAT: ClassVar[str] = "protocol.set_wire_format"
+        GET_LEADERBOARD_PAGE: ClassVar[str] = "protocol.get_leaderboard_page"
+        GET_RANK: ClassVar[str] = "protocol.get_rank"
+        FIND_MATCH: ClassVar[str] = "protocol.find_match"
+        GET_MATCH_STATS: ClassVar[str] = "protocol.get_match_stats"
+        SPECTATE: ClassVar[str] = "protocol.spectate"
+        GUESS: ClassVar[str] = "protocol.guess"
+        HINT: ClassVar[str] = "protocol.get_hint"
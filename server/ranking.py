@@ -0,0 +1,294 @@
+import random
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# players are ordered by most wins first, then by name (like the database)
+Key = Tuple[int, str]
+
+MAX_LEVEL: int = 32
+
+
+class SkipNode:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key: Optional[Key], level: int) -> None:
+        self.key: Optional[Key] = key
+        self.next: List[Optional["SkipNode"]] = [None] * level
+        # how many nodes each forward link skips (rank arithmetic)
+        self.width: List[int] = [1] * level
+
+
+# indexable skip list - O(log n) insert, remove, rank of a key and key at a
+# rank, sorted by (-wins, username)
+class RankedSkipList:
+    def __init__(self) -> None:
+        self.head: SkipNode = SkipNode(None, MAX_LEVEL)
+        self.level: int = 1
+        self.size: int = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    @staticmethod
+    def random_level() -> int:
+        level = 1
+        while level < MAX_LEVEL and random.random() < 0.5:
+            level += 1
+        return level
+
+    def insert(self, key: Key) -> None:
+        update: List[SkipNode] = [self.head] * MAX_LEVEL
+        passed: List[int] = [0] * MAX_LEVEL
+        node = self.head
+        position = 0
+        for i in range(self.level - 1, -1, -1):
+            nxt = node.next[i]
+            while nxt is not None and nxt.key < key:  # type: ignore[operator]
+                position += node.width[i]
+                node = nxt
+                nxt = node.next[i]
+            update[i] = node
+            passed[i] = position
+
+        level = self.random_level()
+        if level > self.level:
+            for i in range(self.level, level):
+                update[i] = self.head
+                passed[i] = 0
+                self.head.width[i] = self.size + 1
+            self.level = level
+
+        new = SkipNode(key, level)
+        rank = position + 1
+        for i in range(level):
+            prev = update[i]
+            new.next[i] = prev.next[i]
+            prev.next[i] = new
+            # split the old link's width between the two new links
+            new.width[i] = prev.width[i] - (rank - passed[i]) + 1
+            prev.width[i] = rank - passed[i]
+        for i in range(level, self.level):
+            update[i].width[i] += 1
+        self.size += 1
+
+    def remove(self, key: Key) -> bool:
+        update: List[SkipNode] = [self.head] * MAX_LEVEL
+        node = self.head
+        for i in range(self.level - 1, -1, -1):
+            nxt = node.next[i]
+            while nxt is not None and nxt.key < key:  # type: ignore[operator]
+                node = nxt
+                nxt = node.next[i]
+            update[i] = node
+
+        target = node.next[0]
+        if target is None or target.key != key:
+            return False
+
+        for i in range(self.level):
+            prev = update[i]
+            if prev.next[i] is target:
+                prev.width[i] += target.width[i] - 1
+                prev.next[i] = target.next[i]
+            else:
+                prev.width[i] -= 1
+        while self.level > 1 and self.head.next[self.level - 1] is None:
+            self.level -= 1
+        self.size -= 1
+        return True
+
+    # 1 based rank of a key, None if it is not in the list
+    def rank(self, key: Key) -> Optional[int]:
+        node = self.head
+        position = 0
+        for i in range(self.level - 1, -1, -1):
+            nxt = node.next[i]
+            while nxt is not None and nxt.key <= key:  # type: ignore[operator]
+                position += node.width[i]
+                node = nxt
+                nxt = node.next[i]
+        if node is not self.head and node.key == key:
+            return position
+        return None
+
+    # how many keys sort before key (or before and equal to it)
+    def count_before(self, key: Key, inclusive: bool = False) -> int:
+        node = self.head
+        position = 0
+        for i in range(self.level - 1, -1, -1):
+            nxt = node.next[i]
+            while nxt is not None and (
+                nxt.key <= key if inclusive else nxt.key < key  # type: ignore[operator]
+            ):
+                position += node.width[i]
+                node = nxt
+                nxt = node.next[i]
+        return position
+
+    # node holding the given 1 based rank
+    def node_at(self, rank: int) -> Optional[SkipNode]:
+        if rank < 1 or rank > self.size:
+            return None
+        node = self.head
+        position = 0
+        for i in range(self.level - 1, -1, -1):
+            while node.next[i] is not None and position + node.width[i] <= rank:
+                position += node.width[i]
+                node = node.next[i]  # type: ignore[assignment]
+        return node
+
+    # up to count keys starting at the given 1 based rank
+    def range(self, rank: int, count: int) -> List[Key]:
+        keys: List[Key] = []
+        node = self.node_at(max(1, rank))
+        while node is not None and len(keys) < count:
+            keys.append(node.key)  # type: ignore[arg-type]
+            node = node.next[0]
+        return keys
+
+    # builds the list from already sorted keys in O(n) (startup load)
+    @classmethod
+    def from_sorted(cls, keys: List[Key]) -> "RankedSkipList":
+        skip_list = cls()
+        last: List[SkipNode] = [skip_list.head] * MAX_LEVEL
+        last_rank: List[int] = [0] * MAX_LEVEL
+        for rank, key in enumerate(keys, start=1):
+            level = cls.random_level()
+            skip_list.level = max(skip_list.level, level)
+            node = SkipNode(key, level)
+            for i in range(level):
+                last[i].next[i] = node
+                last[i].width[i] = rank - last_rank[i]
+                last[i] = node
+                last_rank[i] = rank
+        skip_list.size = len(keys)
+        # the final node of every level links past the end of the list
+        for i in range(MAX_LEVEL):
+            last[i].width[i] = skip_list.size + 1 - last_rank[i]
+        return skip_list
+
+
+# live ranking of every player kept in memory next to the DB - loaded once
+# at startup and updated on every win so leaderboard and rank requests never
+# touch SQL, the database stays the durable store
+class RankingIndex:
+    def __init__(self) -> None:
+        self.lock: threading.Lock = threading.Lock()
+        self.ranks: RankedSkipList = RankedSkipList()
+        self.wins: Dict[str, int] = {}
+        self.load_seconds: float = 0.0
+
+    # replaces the index with (username, wins) rows
+    def load(self, rows: List[Tuple[str, int]]) -> None:
+        started = time.perf_counter()
+        wins = {username: count for username, count in rows}
+        keys = sorted((-count, username) for username, count in wins.items())
+        ranks = RankedSkipList.from_sorted(keys)
+        with self.lock:
+            self.wins = wins
+            self.ranks = ranks
+        self.load_seconds = time.perf_counter() - started
+
+    def add_wins(self, username: str, count: int = 1) -> None:
+        with self.lock:
+            old = self.wins.get(username)
+            if old is not None:
+                self.ranks.remove((-old, username))
+            new = (old or 0) + count
+            self.wins[username] = new
+            self.ranks.insert((-new, username))
+
+    def __len__(self) -> int:
+        return len(self.ranks)
+
+    @staticmethod
+    def row(rank: int, key: Key) -> Dict[str, Any]:
+        return {'rank': rank, 'username': key[1], 'wins': -key[0]}
+
+    # top players, same rows as DB.get_leaderboard
+    def top(self, count: int = 10) -> List[Dict[str, Any]]:
+        with self.lock:
+            keys = self.ranks.range(1, count)
+        return [{'username': k[1], 'wins': -k[0]} for k in keys]
+
+    # players from a 1 based rank on
+    def around_rank(self, rank: int, count: int) -> List[Dict[str, Any]]:
+        rank = max(1, rank)
+        with self.lock:
+            keys = self.ranks.range(rank, count)
+        return [self.row(rank + i, key) for i, key in enumerate(keys)]
+
+    # same page layout as DB.get_leaderboard_page
+    def page(
+        self, limit: int = 10, offset: int = 0, after: Optional[List[Any]] = None
+    ) -> Dict[str, Any]:
+        with self.lock:
+            if after is not None:
+                # first key behind the cursor, the cursor itself may be gone
+                # (a count is O(log n) here, so its rank is not needed)
+                first = self.rank_of_key((-after[0], after[1])) + 1
+            else:
+                first = offset + 1
+            keys = self.ranks.range(first, limit)
+        rows = [self.row(first + i, key) for i, key in enumerate(keys)]
+        return {
+            'rows': rows,
+            'next': [rows[-1]['wins'], rows[-1]['username'], rows[-1]['rank']]
+            if len(rows) == limit else None
+        }
+
+    # number of keys sorting before or equal to key (caller holds the lock)
+    def rank_of_key(self, key: Key) -> int:
+        return self.ranks.count_before(key, inclusive=True)
+
+    # same layout as DB.get_rank
+    def rank(self, username: str, radius: int = 2) -> Dict[str, Any]:
+        with self.lock:
+            wins = self.wins.get(username)
+            if wins is None:
+                return {'username': username, 'wins': 0, 'rank': None,
+                        'above': [], 'below': []}
+            rank = self.ranks.rank((-wins, username)) or 1
+            first = max(1, rank - radius)
+            keys = self.ranks.range(first, rank - first + 1 + radius)
+        rows = [self.row(first + i, key) for i, key in enumerate(keys)]
+        return {
+            'username': username,
+            'wins': wins,
+            'rank': rank,
+            'above': [row for row in rows if row['rank'] < rank],
+            'below': [row for row in rows if row['rank'] > rank],
+        }
+
+
+# warm up benchmark - python ranking.py [players]
+def benchmark(players: int = 1_000_000) -> None:
+    rows = [(f"player{i}", random.randint(0, 5000)) for i in range(players)]
+
+    index = RankingIndex()
+    index.load(rows)
+    print(f"loaded {players} players in {index.load_seconds:.2f} s")
+
+    queries = 10000
+    names = [random.choice(rows)[0] for _ in range(queries)]
+
+    def timed(label: str, run: Any) -> None:
+        started = time.perf_counter()
+        for name in names:
+            run(name)
+        per_query = (time.perf_counter() - started) / queries
+        print(f"{label}: {per_query * 1e6:.1f} us/query")
+
+    timed("rank of player", lambda name: index.rank(name, 0))
+    timed("rank + 2 neighbours", lambda name: index.rank(name, 2))
+    timed("top 10", lambda name: index.top(10))
+    timed("players around rank", lambda name: index.around_rank(
+        random.randint(1, players), 10
+    ))
+    timed("add win", lambda name: index.add_wins(name))
+
+
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
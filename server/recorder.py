@@ -0,0 +1,178 @@
+import queue
+import threading
+import time
+from typing import Any, Dict, Optional
+
+# wins that may wait for the writer, record drops any win past that
+MAX_QUEUED_WINS: int = 10000
+# most queued wins merged into one commit
+MAX_BATCH: int = 500
+# pause before retrying a batch that failed on a transient error
+RETRY_SECONDS: float = 1.0
+# how long close waits for the database before the wins still queued are
+# given up (and printed, so they can be added by hand)
+CLOSE_SECONDS: float = 10.0
+
+
+# write behind recorder for wins - the game handler only queues the winner,
+# a background thread merges everything pending per username and commits it
+# as one batched upsert, so a slow database never delays the WINNER message
+class WinRecorder:
+    def __init__(
+        self,
+        db: Any,
+        max_queued: int = MAX_QUEUED_WINS,
+        max_batch: int = MAX_BATCH
+    ) -> None:
+        self.db: Any = db
+        self.max_batch: int = max_batch
+        self.queue: "queue.Queue[Optional[str]]" = queue.Queue(max_queued)
+        # set by close, failed commits are not retried past it
+        self.deadline: Optional[float] = None
+        # the batch being committed right now
+        self.in_flight: Dict[str, int] = {}
+
+        self.stats_lock: threading.Lock = threading.Lock()
+        self.recorded: int = 0
+        self.committed: int = 0
+        self.commits: int = 0
+        self.failed_commits: int = 0
+        self.dropped: int = 0
+        self.last_commit_seconds: float = 0.0
+        self.max_commit_seconds: float = 0.0
+        self.total_commit_seconds: float = 0.0
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    # queues a win without ever blocking the game, once the database is
+    # MAX_QUEUED_WINS behind the win is dropped (and printed) instead
+    def record(self, username: str) -> None:
+        try:
+            self.queue.put_nowait(username)
+        except queue.Full:
+            self.drop({username: 1}, "queue full")
+            return
+        with self.stats_lock:
+            self.recorded += 1
+
+    def run(self) -> None:
+        while True:
+            first = self.queue.get()
+            if first is None:
+                self.queue.task_done()
+                return
+
+            # merge whatever else is already waiting into the same commit
+            batch: Dict[str, int] = {first: 1}
+            taken = 1
+            stop = False
+            while taken < self.max_batch:
+                try:
+                    username = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                taken += 1
+                if username is None:
+                    stop = True
+                    break
+                batch[username] = batch.get(username, 0) + 1
+
+            self.in_flight = batch
+            self.commit(batch)
+            self.in_flight = {}
+            for _ in range(taken):
+                self.queue.task_done()
+            if stop:
+                return
+
+    # commits one merged batch, retrying until the database takes it so no
+    # win is lost while the link is down - once close gave up waiting the
+    # batch is dropped instead. A batch the database refuses outright is
+    # split until the rows it refuses are found and dropped
+    def commit(self, batch: Dict[str, int]) -> None:
+        while True:
+            started = time.perf_counter()
+            try:
+                self.db.increase_wins_batch(batch)
+            except Exception as error:
+                with self.stats_lock:
+                    self.failed_commits += 1
+                if not self.db.is_transient(error):
+                    self.split(batch, error)
+                    return
+                if self.deadline is not None and time.monotonic() >= self.deadline:
+                    self.drop(batch, error)
+                    return
+                print(f"Error recording wins, retrying: {error}")
+                time.sleep(RETRY_SECONDS)
+                continue
+
+            elapsed = time.perf_counter() - started
+            with self.stats_lock:
+                self.committed += sum(batch.values())
+                self.commits += 1
+                self.last_commit_seconds = elapsed
+                self.max_commit_seconds = max(self.max_commit_seconds, elapsed)
+                self.total_commit_seconds += elapsed
+            return
+
+    # commits both halves of a refused batch on their own, a single refused
+    # row is dropped
+    def split(self, batch: Dict[str, int], error: Exception) -> None:
+        if len(batch) == 1:
+            self.drop(batch, f"refused: {error}")
+            return
+        rows = list(batch.items())
+        half = len(rows) // 2
+        self.commit(dict(rows[:half]))
+        self.commit(dict(rows[half:]))
+
+    def drop(self, batch: Dict[str, int], reason: Any) -> None:
+        with self.stats_lock:
+            self.dropped += sum(batch.values())
+        print(f"Dropped wins {batch} ({reason})")
+
+    # blocks until every win queued so far is committed
+    def flush(self) -> None:
+        self.queue.join()
+
+    # shutdown hook - commits what is left and stops the writer, waiting at
+    # most timeout seconds for the database
+    def close(self, timeout: float = CLOSE_SECONDS) -> None:
+        if not self.thread.is_alive():
+            return
+        self.deadline = time.monotonic() + timeout
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        # one more retry pause, so a commit failing at the deadline drops
+        # its batch before this gives up on it
+        self.thread.join(max(0.0, self.deadline - time.monotonic()) + RETRY_SECONDS)
+        if self.thread.is_alive():
+            # the writer is stuck in a commit, the daemon thread dies with
+            # the process
+            left: Dict[str, int] = dict(self.in_flight)
+            for username in list(self.queue.queue):
+                if username is not None:
+                    left[username] = left.get(username, 0) + 1
+            if left:
+                self.drop(left, "database did not answer before shutdown")
+
+    def stats(self) -> Dict[str, Any]:
+        with self.stats_lock:
+            return {
+                "queue_depth": self.queue.qsize(),
+                "recorded": self.recorded,
+                "committed": self.committed,
+                "commits": self.commits,
+                "failed_commits": self.failed_commits,
+                "dropped": self.dropped,
+                "last_commit_ms": self.last_commit_seconds * 1000,
+                "max_commit_ms": self.max_commit_seconds * 1000,
+                "avg_commit_ms": (
+                    self.total_commit_seconds / self.commits * 1000
+                    if self.commits else 0.0
+                ),
+            }
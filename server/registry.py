@@ -0,0 +1,119 @@
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+from room import Room
+
+
+# owns who is connected, which room every client is in and nicknames -
+# every lookup goes through a forward or reverse index so join,
+# leave and disconnect cleanup are O(1) and nothing outlives its client
+class RoomRegistry:
+    def __init__(self) -> None:
+        self.lock: threading.RLock = threading.RLock()
+
+        self.sessions: Set[Any] = set()
+        self.client_names: Dict[Any, str] = {}
+        self.rooms_by_code: Dict[str, Room] = {}
+        self.code_by_room: Dict[Room, str] = {}
+        self.client_to_room: Dict[Any, Room] = {}
+        self.spectating: Dict[Any, Room] = {}
+
+    # a client connected
+    def connect(self, client: Any) -> None:
+        with self.lock:
+            self.sessions.add(client)
+
+    # registers a freshly created room with its host
+    def create_room(
+        self, room_code: str, room: Room, client: Any, nickname: str
+    ) -> None:
+        with self.lock:
+            # a new room under a taken code replaces the old one
+            old = self.rooms_by_code.get(room_code)
+            if old is not None:
+                del self.code_by_room[old]
+
+            self.rooms_by_code[room_code] = room
+            self.code_by_room[room] = room_code
+            self.client_to_room[client] = room
+            self.client_names[client] = nickname
+            room.add_player(client, nickname)
+
+    # adds a player to a room that still has a free seat for the nickname
+    def join_room(self, room: Room, client: Any, nickname: str) -> bool:
+        with self.lock:
+            if not room.add_player(client, nickname):
+                return False
+            self.client_names[client] = nickname
+            self.client_to_room[client] = room
+            return True
+
+    # takes a client out of its room, returns the room and the players
+    # still in it (the room is dropped once no human is left, bots do not
+    # keep it open)
+    def leave_room(self, client: Any) -> Tuple[Optional[Room], List[Any]]:
+        with self.lock:
+            room = self.client_to_room.pop(client, None)
+            self.client_names.pop(client, None)
+            if room is None:
+                return None, []
+
+            room.remove_player(client)
+
+            remaining = room.humans()
+            if not remaining:
+                room_code = self.code_by_room.pop(room, None)
+                if room_code is not None and self.rooms_by_code.get(room_code) is room:
+                    del self.rooms_by_code[room_code]
+            return room, remaining
+
+    # the client's socket is gone, forget everything about it
+    def disconnect(self, client: Any) -> Tuple[Optional[Room], List[Any]]:
+        with self.lock:
+            left = self.leave_room(client)
+            self.stop_spectating(client)
+            self.sessions.discard(client)
+            return left
+
+    # adds a watcher to a room (leaving the one it watched before)
+    def spectate(self, room: Room, client: Any) -> None:
+        with self.lock:
+            self.stop_spectating(client)
+            room.spectators.add(client)
+            self.spectating[client] = room
+
+    def stop_spectating(self, client: Any) -> Optional[Room]:
+        with self.lock:
+            room = self.spectating.pop(client, None)
+            if room is not None:
+                room.spectators.discard(client)
+            return room
+
+    # the room closed, its watchers are done with it
+    def drop_spectators(self, room: Room) -> None:
+        with self.lock:
+            for client in room.spectators:
+                self.spectating.pop(client, None)
+            room.spectators.clear()
+
+    def room_by_code(self, room_code: str) -> Optional[Room]:
+        return self.rooms_by_code.get(room_code)
+
+    def room_of(self, client: Any) -> Optional[Room]:
+        return self.client_to_room.get(client)
+
+    def code_of(self, room: Room) -> Optional[str]:
+        return self.code_by_room.get(room)
+
+    def name_of(self, client: Any) -> Optional[str]:
+        return self.client_names.get(client)
+
+    # live counts, these should stay flat on a long running server
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                "rooms": len(self.rooms_by_code),
+                "sessions": len(self.sessions),
+                "players": len(self.client_to_room),
+                "named_clients": len(self.client_names),
+                "spectators": len(self.spectating),
+            }
@@ -1,80 +1,162 @@
-from pathlib import Path
 import random
-from typing import List, Dict, Set, Any, Optional
+import time
+from typing import List, Dict, Set, Any, Optional, Sequence, Tuple
+from lexicon import get_lexicon
+from feedback import feedback, solved_pattern
+from standings import Standings
+from word_index import WordIndex, get_index
+from constraints import Constraints
+
+# players one room can hold, the game starts once it is full
+MIN_PLAYERS: int = 2
+MAX_PLAYERS: int = 64
 
 class Room:
-    def __init__(self, host: Any, settings: Dict[str, Any]) -> None:
-        self.host: Any = host
-        self.guest: Optional[Any] = None
-
+    def __init__(self, settings: Dict[str, Any]) -> None:
         self.mode: int = settings["mode"]
         self.rounds: int = settings["rounds"]
         self.is_infinite: bool = settings["infinite"]
         self.max_guesses: int = settings["max_guesses"]
-
-        self.chosen_list: List[str] = self.mode_choice()
-        self.guesses: List[List[str]] = self.generate_guesses(
-            self.chosen_list
-        )
-
-        self.round_indexes: Dict[Any, int] = {host: 0}
-        self.points: Dict[Any, int] = {host: 0}
-
-        self.nicknames : List[str] = []
+        self.capacity: int = settings.get("players", MIN_PLAYERS)
+        # guesses must reuse every green and yellow (see constraints.py)
+        self.hard_mode: bool = settings.get("hard_mode", False)
+        self.started: bool = False
+        # a winner was announced, nothing changes the game after that
+        self.over: bool = False
+
+        self.chosen_list: Sequence[str] = self.mode_choice()
+        # bitsets over the answer list, every player's answers still
+        # possible are narrowed with each guess
+        self.index: WordIndex = get_index(self.mode)
+        # only the word of the round being played exists, the next one is
+        # drawn when its round starts
+        self.round: int = 0
+        self.word: str = self.random_word()
+        # guesses are timed from when the round's word went out
+        self.round_started: float = time.monotonic()
+
+        # players in the order they joined
+        self.round_indexes: Dict[Any, int] = {}
+        self.points: Dict[Any, int] = {}
+        self.names: Dict[Any, str] = {}
+
+        self.nicknames : Set[str] = set()
+        self.standings: Standings = Standings()
         self.finished_players: Set[Any] = set()
         self.failed_players: Set[Any] = set()
-
-    # adds player to room unless full
-    def add_player(self, client: Any) -> bool:
-        if self.guest is not None:
+        # guesses every player made this round, scored here not by clients
+        self.guesses_made: Dict[Any, int] = {}
+        # answers still consistent with a player's guesses (a bitset, see
+        # word_index.py) and the last hint it got, with the guess it came at
+        self.candidates: Dict[Any, int] = {}
+        self.hints: Dict[Any, Tuple[int, str]] = {}
+        # hard mode rules every player's coloured rows added up to
+        self.constraints: Dict[Any, Constraints] = {}
+
+        # watchers following the scores, they never play
+        self.spectators: Set[Any] = set()
+        # server side players (see bot.py) and the names they play under
+        self.bots: Dict[Any, str] = {}
+
+        # serial executor that owns this room's state (see actor.py),
+        # None when the server runs everything on one thread anyway
+        self.mailbox: Optional[Any] = None
+
+    # adds player to room unless full or the nickname is taken (standings
+    # are kept by name)
+    def add_player(self, client: Any, nickname: str) -> bool:
+        if self.full() or nickname in self.nicknames:
             return False
 
-        self.guest = client
         self.round_indexes[client] = 0
         self.points[client] = 0
+        self.names[client] = nickname
+        self.nicknames.add(nickname)
+        self.standings.add(nickname)
+        return True
+
+    # seats a bot like any other player
+    def add_bot(self, bot: Any, nickname: str) -> bool:
+        if not self.add_player(bot, nickname):
+            return False
+        self.bots[bot] = nickname
         return True
 
-    # generates random words to be guessed based on the amount of rounds
-    def generate_guesses(self, chosen_list: List[str]) -> List[List[str]]:
-        return [
-            list(chosen_list[random.randint(0, len(chosen_list) - 1)])
-            for _ in range(self.rounds)
-        ]
-
-    # loads a set of words based on the chosen mode for the random word
-    # generation
-    def mode_choice(self) -> List[str]:
-        #change to the following when compiling
-        # base_dir: Path = Path(__file__).resolve().parent
-        # word_lists_dir = base_dir / "word lists"
-        base_dir: Path = Path(__file__).resolve().parent.parent
-        word_lists_dir = base_dir / "client" / "word lists"
-
-        with open(
-            word_lists_dir / "fiveletterwords.txt", 'r', encoding='utf-8'
-            ) as file:
-            five_letter_words: List[str] = file.read().splitlines()
-        with open(
-            word_lists_dir / "sixletterwords.txt", 'r', encoding='utf-8'
-            ) as file:
-            six_letter_words: List[str] = file.read().splitlines()
-        with open(
-            word_lists_dir / "sevenletterwords.txt", 'r', encoding='utf-8'
-            ) as file:
-            seven_letter_words: List[str] = file.read().splitlines()
-
-        chosen_list: List[str] = []
-        match self.mode:
-            case 5:
-                chosen_list = five_letter_words
-            case 6:
-                chosen_list = six_letter_words
-            case 7:
-                chosen_list = seven_letter_words
-            case _:
-                pass
-
-        return chosen_list
+    # removes a player, the others keep playing
+    def remove_player(self, client: Any) -> None:
+        self.round_indexes.pop(client, None)
+        self.points.pop(client, None)
+        self.finished_players.discard(client)
+        self.failed_players.discard(client)
+        self.guesses_made.pop(client, None)
+        self.candidates.pop(client, None)
+        self.hints.pop(client, None)
+        self.constraints.pop(client, None)
+
+        nickname = self.names.pop(client, None)
+        if nickname is not None:
+            self.nicknames.discard(nickname)
+            self.standings.remove(nickname)
+
+    # players that are not bots, the room closes once none are left
+    def humans(self) -> List[Any]:
+        return [client for client in self.round_indexes if client not in self.bots]
+
+    def full(self) -> bool:
+        return len(self.round_indexes) >= self.capacity
+
+    # every player still in the room has answered this round
+    def round_over(self) -> bool:
+        return bool(self.round_indexes) and (
+            len(self.finished_players) >= len(self.round_indexes)
+        )
+
+    # picks a random word to be guessed
+    def random_word(self) -> str:
+        return self.chosen_list[random.randint(0, len(self.chosen_list) - 1)]
+
+    # the game begins, the first round's clock starts
+    def start(self) -> None:
+        self.started = True
+        self.round_started = time.monotonic()
+
+    # moves the room to the next round and draws its word
+    def next_word(self) -> str:
+        self.round += 1
+        self.word = self.random_word()
+        self.round_started = time.monotonic()
+        self.finished_players.clear()
+        self.failed_players.clear()
+        self.guesses_made.clear()
+        self.candidates.clear()
+        self.hints.clear()
+        self.constraints.clear()
+        return self.word
+
+    # settings as sent to players and spectators
+    def settings(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "max_guesses": self.max_guesses,
+            "rounds": self.rounds,
+            "infinite": self.is_infinite,
+            "players": self.capacity,
+            "hard_mode": self.hard_mode
+        }
+
+    # everyone who gets the room's shared events (players and spectators)
+    def audience(self) -> List[Any]:
+        return list(self.round_indexes) + list(self.spectators)
+
+    # the only game data a round needs, the same size however long it runs -
+    # the word itself stays on the server until the player is done with it
+    def round_start(self) -> Dict[str, Any]:
+        return {"round": self.round, "remaining": len(self.chosen_list)}
+
+    # picks the shared answer list for the chosen mode for the random word
+    # generation (no file reads, see lexicon.py)
+    def mode_choice(self) -> Sequence[str]:
+        return get_lexicon().answer_list(self.mode)
 
     # calculates points based on the amount of guesses and time taken
     # max guesses - player guesses)*10 + extra points (50 for 30 seconds,
@@ -90,14 +172,62 @@ class Room:
 
         return guess_score + time_bonus
 
-    # handles a finished player based on whether the mode is infinite or not
-    def client_finished(self, client: Any, data: Dict[str, Any]) -> None:
-        guesses_used: int = data.get("guesses_used", self.max_guesses)
-        seconds_taken: float = data.get("seconds", 999)
-        success: bool = data.get("success", False)
+    # scores a guess (upper case, already checked against the lexicon) with
+    # the round's word, returns the pattern code, the guesses used and
+    # whether it solved the word - the player finishes on a solve or on the
+    # last attempt
+    def guess(self, client: Any, word: str) -> Tuple[int, int, bool]:
+        guesses_used: int = self.guesses_made.get(client, 0) + 1
+        self.guesses_made[client] = guesses_used
+
+        pattern: int = feedback(self.word, word)
+        solved: bool = pattern == solved_pattern(self.mode)
+        self.candidates[client] = self.index.narrow(
+            self.candidates.get(client, self.index.all), word, pattern
+        )
+        if self.hard_mode:
+            self.constraints.setdefault(
+                client, Constraints(self.mode)
+            ).update(word, pattern)
+        if solved or guesses_used >= self.max_guesses:
+            self.client_finished(
+                client, guesses_used,
+                time.monotonic() - self.round_started, solved
+            )
+        return pattern, guesses_used, solved
+
+    # why a guess breaks the hard mode rules, None if it does not (or the
+    # room is not in hard mode) - O(word length) whatever was guessed before
+    def hard_mode_violation(self, client: Any, word: str) -> Optional[str]:
+        constraints = self.constraints.get(client)
+        if not self.hard_mode or constraints is None:
+            return None
+        return constraints.violation(word)
+
+    # how many answers the player's guesses still allow
+    def remaining(self, client: Any) -> int:
+        return self.index.count(self.candidates.get(client, self.index.all))
+
+    # one answer still consistent with the player's guesses - asking again
+    # gives the same word until the player guessed again, so hints cannot
+    # be used to list the candidates
+    def hint(self, client: Any) -> Optional[str]:
+        guesses_used = self.guesses_made.get(client, 0)
+        last = self.hints.get(client)
+        if last is not None and last[0] == guesses_used:
+            return last[1]
+        word = self.index.pick(self.candidates.get(client, self.index.all))
+        if word is not None:
+            self.hints[client] = (guesses_used, word)
+        return word
 
+    # handles a finished player based on whether the mode is infinite or not
+    def client_finished(
+        self, client: Any, guesses_used: int, seconds_taken: float, success: bool
+    ) -> None:
         points: int = self.calculate_points(guesses_used, seconds_taken)
         self.points[client] += points
+        self.standings.set_points(self.names[client], self.points[client])
 
         if success:
             self.round_indexes[client] += 1
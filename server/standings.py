@@ -0,0 +1,88 @@
+from typing import Any, Dict, List, Optional, Set
+from ranking import Key, RankedSkipList
+
+
+# live points table of one room - kept sorted in a skip list (most points
+# first, then by name) so a score change is O(log n) whatever the room size,
+# changes are collected and sent to the room as one diff per batch
+class Standings:
+    def __init__(self) -> None:
+        self.order: RankedSkipList = RankedSkipList()
+        self.points: Dict[str, int] = {}
+
+        # names whose points changed and names that left since the last diff
+        self.changed: Set[str] = set()
+        self.left: Set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    @staticmethod
+    def key(name: str, points: int) -> Key:
+        return -points, name
+
+    def add(self, name: str) -> None:
+        if name in self.points:
+            return
+        self.points[name] = 0
+        self.order.insert(self.key(name, 0))
+        self.left.discard(name)
+        self.changed.add(name)
+
+    def remove(self, name: str) -> None:
+        points = self.points.pop(name, None)
+        if points is None:
+            return
+        self.order.remove(self.key(name, points))
+        self.changed.discard(name)
+        self.left.add(name)
+
+    # moves a player to its new total, O(log n)
+    def set_points(self, name: str, points: int) -> None:
+        old = self.points.get(name)
+        if old is None or old == points:
+            return
+        self.order.remove(self.key(name, old))
+        self.order.insert(self.key(name, points))
+        self.points[name] = points
+        self.changed.add(name)
+
+    # 1 based rank, None if the player is not in the room
+    def rank(self, name: str) -> Optional[int]:
+        points = self.points.get(name)
+        if points is None:
+            return None
+        return self.order.rank(self.key(name, points))
+
+    def leader(self) -> Optional[str]:
+        node = self.order.node_at(1)
+        if node is None or node.key is None:
+            return None
+        return node.key[1]
+
+    def row(self, name: str) -> Dict[str, Any]:
+        return {"name": name, "points": self.points[name], "rank": self.rank(name)}
+
+    # every player in rank order
+    def table(self) -> List[Dict[str, Any]]:
+        return [
+            {"name": name, "points": -negative, "rank": rank}
+            for rank, (negative, name) in enumerate(
+                self.order.range(1, len(self.order)), start=1
+            )
+        ]
+
+    def dirty(self) -> bool:
+        return bool(self.changed or self.left)
+
+    # what changed since the last diff, cost grows with the changes only -
+    # ranks of players not in it may have shifted, clients re-sort their
+    # copy of the table by points
+    def take_diff(self) -> Dict[str, Any]:
+        diff = {
+            "players": [self.row(name) for name in sorted(self.changed)],
+            "left": sorted(self.left),
+        }
+        self.changed.clear()
+        self.left.clear()
+        return diff
@@ -0,0 +1,161 @@
+import random
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from feedback import ABSENT, CORRECT, feedback, pattern_digits
+from lexicon import get_lexicon
+
+
+# one bit per word (bit i is words[i]) - python ints, so and-ing two sets
+# is a single C loop over n / 64 machine words however they were built
+def bitset(flags: np.ndarray) -> int:
+    return int.from_bytes(
+        np.packbits(flags, bitorder="little").tobytes(), "little"
+    )
+
+
+# bitsets over one word list: which words have letter l at position p, and
+# which have at least (or at most) c copies of letter l - the words still consistent
+# with a guess's colours are an and of a few of them, no word is looked at
+class WordIndex:
+    def __init__(self, words: Sequence[str]) -> None:
+        self.words: Sequence[str] = words
+        self.length: int = len(words[0])
+        self.all: int = (1 << len(words)) - 1
+
+        data = np.frombuffer("".join(words).encode("ascii"), dtype=np.uint8)
+        letters = data.reshape(len(words), self.length) - ord("A")
+
+        # at[position][letter] and its complement (negative ints make every
+        # and slower, so "not" sets are kept positive)
+        self.at: List[List[int]] = []
+        self.not_at: List[List[int]] = []
+        for position in range(self.length):
+            column = letters[:, position]
+            self.at.append([bitset(column == letter) for letter in range(26)])
+            self.not_at.append([bitset(column != letter) for letter in range(26)])
+
+        # at_least[letter][count] (count 0 is every word) and the words with
+        # fewer copies, at_most[letter][count]
+        self.at_least: List[List[int]] = []
+        self.at_most: List[List[int]] = []
+        for letter in range(26):
+            counts = (letters == letter).sum(axis=1)
+            self.at_least.append([
+                bitset(counts >= count) for count in range(self.length + 1)
+            ])
+            self.at_most.append([
+                bitset(counts <= count) for count in range(self.length + 1)
+            ])
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    # the words of a set still consistent with a guess that showed this
+    # pattern - a green fixes its position, any other colour rules the
+    # letter out there, greens and yellows of a letter are a minimum count
+    # and a grey copy of it makes that count exact
+    def narrow(self, candidates: int, guess: str, pattern: int) -> int:
+        shown: Dict[int, int] = {}
+        capped: Dict[int, bool] = {}
+        for position, digit in enumerate(pattern_digits(pattern, self.length)):
+            letter = ord(guess[position]) - 65
+            if digit == CORRECT:
+                candidates &= self.at[position][letter]
+            else:
+                candidates &= self.not_at[position][letter]
+            if digit == ABSENT:
+                capped[letter] = True
+                shown.setdefault(letter, 0)
+            else:
+                shown[letter] = shown.get(letter, 0) + 1
+
+        for letter, count in shown.items():
+            candidates &= self.at_least[letter][count]
+            if capped.get(letter):
+                candidates &= self.at_most[letter][count]
+        return candidates
+
+    @staticmethod
+    def count(candidates: int) -> int:
+        return candidates.bit_count()
+
+    # word indexes in a set, in list order
+    def members(self, candidates: int) -> np.ndarray:
+        size = (len(self.words) + 7) // 8
+        flags = np.unpackbits(
+            np.frombuffer(candidates.to_bytes(size, "little"), dtype=np.uint8),
+            bitorder="little"
+        )
+        return np.flatnonzero(flags[:len(self.words)])
+
+    # any word of the set, None if it is empty
+    def pick(self, candidates: int) -> Optional[str]:
+        indexes = self.members(candidates)
+        if not len(indexes):
+            return None
+        return self.words[indexes[random.randrange(len(indexes))]]
+
+
+index_lock: threading.Lock = threading.Lock()
+shared_indexes: Dict[int, WordIndex] = {}
+
+
+# the process wide index of a word length's answers, built on first use
+def get_index(mode: int) -> WordIndex:
+    index = shared_indexes.get(mode)
+    if index is None:
+        with index_lock:
+            index = shared_indexes.get(mode)
+            if index is None:
+                index = shared_indexes[mode] = WordIndex(
+                    get_lexicon().answer_list(mode)
+                )
+    return index
+
+
+# build time and narrowing cost on the answer and the guess lists of every
+# word length - python word_index.py [narrows]
+def benchmark(narrows: int = 10_000) -> None:
+    lexicon = get_lexicon()
+    rng = random.Random(0)
+    for mode in sorted(lexicon.answers):
+        answers = lexicon.answer_list(mode)
+        for name, words in (
+            ("answers", answers), ("guesses", tuple(sorted(lexicon.guesses[mode])))
+        ):
+            started = time.perf_counter()
+            index = WordIndex(words)
+            build_seconds = time.perf_counter() - started
+
+            turns = []
+            for _ in range(narrows):
+                answer = answers[rng.randrange(len(answers))]
+                guess = words[rng.randrange(len(words))]
+                turns.append((guess, feedback(answer, guess)))
+
+            started = time.perf_counter()
+            for guess, pattern in turns:
+                index.narrow(index.all, guess, pattern)
+            narrow_seconds = (time.perf_counter() - started) / narrows
+
+            # spot check against scoring every word
+            for guess, pattern in turns[:20]:
+                expected = [
+                    i for i, word in enumerate(words)
+                    if feedback(word, guess) == pattern
+                ]
+                found = index.members(index.narrow(index.all, guess, pattern))
+                assert list(found) == expected, guess
+
+            print(
+                f"mode {mode} {name:7}: {len(words):6} words, "
+                f"build {build_seconds * 1000:6.1f} ms, "
+                f"narrow {narrow_seconds * 1e6:5.1f} us"
+            )
+
+
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
@@ -0,0 +1,170 @@
+import json
+import multiprocessing
+import os
+import selectors
+import signal
+import socket
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# biggest handoff message - the header plus at most one frame and one recv
+# worth of bytes the old owner had already read
+HANDOFF_SIZE: int = 256 * 1024
+
+# seconds a worker's cached leaderboard lives - the other workers write to
+# the same database, so it cannot rely on its own invalidations alone
+WORKER_LEADERBOARD_TTL: float = 1.0
+
+
+# workers mode needs the kernel to balance accepts over several listening
+# sockets and file descriptor passing between processes (linux)
+def supported() -> bool:
+    return (
+        hasattr(socket, "SO_REUSEPORT")
+        and hasattr(socket, "send_fds")
+        and hasattr(socket, "AF_UNIX")
+        and "fork" in multiprocessing.get_all_start_methods()
+    )
+
+
+# index of the worker that owns a room code (crc32 is the same in every
+# process, python's own string hash is not)
+def owner_of(room_code: str, workers: int) -> int:
+    return zlib.crc32(room_code.encode("utf-8")) % workers
+
+
+# one worker's end of the handoff channel - the parent passes connections
+# between workers, a worker only ever talks to the parent
+class Shard:
+    def __init__(self, index: int, workers: int, channel: socket.socket) -> None:
+        self.index: int = index
+        self.workers: int = workers
+        self.channel: socket.socket = channel
+
+    def owns(self, room_code: str) -> bool:
+        return owner_of(room_code, self.workers) == self.index
+
+    # sends a connection to the worker owning room_code, message is the
+    # request that has to run there first, unread the bytes behind it
+    def hand_off(
+        self,
+        sock: socket.socket,
+        room_code: str,
+        wire_format: str,
+        message: Dict[str, Any],
+        unread: bytes
+    ) -> None:
+        header = json.dumps({
+            "worker": owner_of(room_code, self.workers),
+            "format": wire_format,
+            "message": message,
+        }).encode("utf-8")
+        try:
+            socket.send_fds(
+                self.channel, [header + b"\n" + unread], [sock.fileno()]
+            )
+        finally:
+            # the receiving process holds its own descriptor now
+            sock.close()
+
+    # waits for the next connection handed to this worker
+    def receive(self) -> Tuple[socket.socket, str, Dict[str, Any], bytes]:
+        while True:
+            data, fds, _, _ = socket.recv_fds(self.channel, HANDOFF_SIZE, 1)
+            if not data:
+                raise EOFError("handoff channel closed")
+            if fds:
+                break
+        header, _, unread = data.partition(b"\n")
+        fields = json.loads(header)
+        sock = socket.socket(fileno=fds[0])
+        return sock, fields["format"], fields["message"], unread
+
+
+# forwards handed off connections from the worker that read the request to
+# the worker that owns the room, the descriptor is only held for the copy
+def switchboard(channels: List[socket.socket]) -> None:
+    selector = selectors.DefaultSelector()
+    for channel in channels:
+        selector.register(channel, selectors.EVENT_READ)
+
+    while True:
+        for key, _ in selector.select():
+            channel = key.fileobj
+            try:
+                data, fds, _, _ = socket.recv_fds(
+                    channel, HANDOFF_SIZE, 1  # type: ignore[arg-type]
+                )
+            except OSError:
+                data, fds = b"", []
+            if not data:
+                # a worker died, keep serving the others
+                selector.unregister(channel)
+                continue
+            try:
+                header, _, _ = data.partition(b"\n")
+                target = channels[json.loads(header)["worker"]]
+                socket.send_fds(target, [data], fds)
+            except (OSError, ValueError, KeyError, IndexError):
+                pass  # the client is dropped, it reconnects
+            finally:
+                for fd in fds:
+                    os.close(fd)
+
+
+# runs in the forked worker - the copies of the parent's channel ends are
+# closed so a worker sees its own channel end once the parent is gone
+def start_worker(
+    run_worker: Callable[[int, Shard], None],
+    index: int,
+    shard: Shard,
+    inherited: List[socket.socket]
+) -> None:
+    for channel in inherited:
+        channel.close()
+    run_worker(index, shard)
+
+
+# forks the workers, each one builds its own server on the shared port with
+# run_worker(index, shard), the parent only passes connections around
+def run_workers(
+    count: int,
+    run_worker: Callable[[int, Shard], None]
+) -> None:
+    # a plain kill stops the workers too instead of orphaning them
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    context = multiprocessing.get_context("fork")
+    channels: List[socket.socket] = []
+    processes: List[Any] = []
+    for index in range(count):
+        parent_end, worker_end = socket.socketpair(
+            socket.AF_UNIX, socket.SOCK_SEQPACKET
+        )
+        shard = Shard(index, count, worker_end)
+        process = context.Process(
+            target=start_worker,
+            args=(run_worker, index, shard, channels + [parent_end]),
+            name=f"worker-{index}"
+        )
+        process.start()
+        worker_end.close()
+        channels.append(parent_end)
+        processes.append(process)
+
+    print(f"Started {count} workers")
+    try:
+        switchboard(channels)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+
+
+# room code a create or join request asks for, None if it has none
+def requested_room(message: Dict[str, Any]) -> Optional[str]:
+    data = message.get("data")
+    if not isinstance(data, dict):
+        return None
+    room_code = data.get("room_code")
+    return room_code if isinstance(room_code, str) else None
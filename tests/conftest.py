@@ -0,0 +1,87 @@
+import json
+import signal
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+import pytest
+
+# server modules import each other by name (python server/main.py puts the
+# folder on the path), the tests run them the same way
+SERVER_DIR = Path(__file__).resolve().parent.parent / "server"
+sys.path.insert(0, str(SERVER_DIR))
+
+
+# the database on its sqlite fallback, in a fresh folder (no .env there)
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    from db import DB
+    monkeypatch.chdir(tmp_path)
+    database = DB()
+    yield database
+    database.close()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# starts server scripts (main.py, gateway.py) as real processes in a fresh
+# folder and waits until they accept connections, serve(script, *args)
+# returns the port
+@pytest.fixture
+def serve(tmp_path):
+    processes = []
+
+    def start(script, *args):
+        port = free_port()
+        process = subprocess.Popen(
+            [sys.executable, str(SERVER_DIR / script), "--port", str(port), *args],
+            cwd=tmp_path, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        processes.append(process)
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), 0.5).close()
+                return port
+            except OSError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError(f"{script} did not start")
+                time.sleep(0.05)
+
+    yield start
+    for process in processes:
+        process.send_signal(signal.SIGINT)
+    for process in processes:
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+# a json lines client talking to a server (or gateway) port
+class LineClient:
+    def __init__(self, port):
+        self.sock = socket.create_connection(("127.0.0.1", port), 5)
+        self.file = self.sock.makefile("rb")
+
+    def send(self, r_type, data):
+        line = json.dumps({"type": r_type, "data": data}) + "\n"
+        self.sock.sendall(line.encode("ascii"))
+
+    # reads messages until one of the given types arrives
+    def wait_for(self, *r_types):
+        while True:
+            line = self.file.readline()
+            assert line, "connection closed"
+            message = json.loads(line)
+            if message["type"] in r_types:
+                return message
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
@@ -0,0 +1,98 @@
+import threading
+import time
+import pytest
+from actor import MAX_TASKS_PER_TURN, ActorPool
+
+
+@pytest.fixture
+def pool():
+    actors = ActorPool(workers=8)
+    yield actors
+    actors.shutdown()
+
+
+def test_one_mailbox_runs_concurrent_writers_in_order(pool):
+    mailbox = pool.mailbox()
+    ran = []
+    running = [0]
+    overlapped = []
+
+    def task(writer, number):
+        def run():
+            running[0] += 1
+            if running[0] > 1:
+                overlapped.append((writer, number))
+            ran.append((writer, number))
+            time.sleep(0)  # let other threads in while this one runs
+            running[0] -= 1
+            return number
+        return run
+
+    start = threading.Barrier(2)
+    futures = {}
+
+    def writer(name):
+        start.wait()
+        futures[name] = [mailbox.submit(task(name, i)) for i in range(500)]
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in "ab"]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [f.result(5) for f in futures["a"]] == list(range(500))
+    assert [f.result(5) for f in futures["b"]] == list(range(500))
+    assert overlapped == []
+    # each writer's tasks ran in the order that writer submitted them
+    for name in "ab":
+        assert [n for w, n in ran if w == name] == list(range(500))
+    assert mailbox.pending() == 0
+
+
+def test_rooms_run_in_parallel(pool):
+    # a room blocked in a task does not hold up another room
+    blocked, other = pool.mailbox(), pool.mailbox()
+    release = threading.Event()
+    stuck = blocked.submit(release.wait)
+    assert other.submit(lambda: "done").result(5) == "done"
+    assert not stuck.done()
+    release.set()
+    assert stuck.result(5) is True
+
+
+def test_errors_and_hooks():
+    after_task, after_drain = [], []
+    actors = ActorPool(
+        workers=2,
+        after_task=lambda: after_task.append(1),
+        after_drain=lambda: after_drain.append(1)
+    )
+    mailbox = actors.mailbox()
+    gate = threading.Event()
+    mailbox.submit(gate.wait)
+
+    def fail():
+        raise ValueError("bad request")
+
+    failed = mailbox.submit(fail)
+    # more than one turn's worth, the mailbox hands its worker back in between
+    rest = [mailbox.submit(lambda i=i: i) for i in range(MAX_TASKS_PER_TURN * 2)]
+    gate.set()
+
+    with pytest.raises(ValueError):
+        failed.result(5)
+    # a failing task does not stop the ones behind it
+    assert [f.result(5) for f in rest] == list(range(MAX_TASKS_PER_TURN * 2))
+    actors.shutdown()
+    assert len(after_task) == 2 + MAX_TASKS_PER_TURN * 2
+    assert len(after_drain) >= 3
+
+
+def test_tasks_still_run_after_shutdown():
+    # a client disconnecting while the server stops must not wait forever
+    actors = ActorPool(workers=2)
+    mailbox = actors.mailbox()
+    actors.shutdown()
+    assert mailbox.submit(lambda: "cleaned up").result(5) == "cleaned up"
+    assert mailbox.submit(lambda: "again").result(5) == "again"
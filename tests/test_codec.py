@@ -0,0 +1,132 @@
+import pytest
+from codec import (
+    BINARY, CODECS, JSON, KIND_JSON, KIND_PACKED, MESSAGE_IDS, MESSAGE_TYPES,
+    PACKED_LAYOUTS, TYPE_AND_KIND
+)
+from framing import FrameBuffer
+from protocols import Protocols
+
+SAMPLES = [
+    None,
+    "Room not found",
+    {"room_code": "ABCD", "nickname": "ana", "mode": 6},
+    [{"username": "ana", "wins": 3}],
+]
+
+
+# encodes with a codec and cuts the bytes back into frames the way a reader
+# would before decoding
+def round_trip(wire_format, r_type, data):
+    codec = CODECS[wire_format]
+    framer = FrameBuffer()
+    framer.length_prefixed = wire_format == BINARY
+    framer.feed(codec.encode(r_type, data))
+    frames = list(framer)
+    assert len(frames) == 1 and framer.pending() == 0
+    return codec.decode(frames[0])
+
+
+def test_ids_are_unique_and_in_range():
+    assert len(MESSAGE_TYPES) == len(MESSAGE_IDS)
+    assert all(0 < message_id < 256 for message_id in MESSAGE_IDS.values())
+    assert MESSAGE_IDS[Protocols.Response.START] == 1
+    assert MESSAGE_IDS[Protocols.Request.ANSWER] == 128
+
+
+@pytest.mark.parametrize("wire_format", [JSON, BINARY])
+@pytest.mark.parametrize("r_type", sorted(MESSAGE_IDS))
+def test_round_trip_every_message(wire_format, r_type):
+    for data in SAMPLES:
+        assert round_trip(wire_format, r_type, data) == {
+            "type": r_type, "data": data
+        }
+
+
+# what the server actually sends of every packed type
+PACKED_SAMPLES = {
+    Protocols.Response.SETTINGS: [{
+        "mode": 7, "max_guesses": 8, "rounds": 300, "infinite": True,
+        "players": 64, "hard_mode": True
+    }],
+    Protocols.Response.ROUND_START: [{"round": 3, "remaining": 2315}],
+    Protocols.Response.GUESS_RESULT: [
+        {
+            "round": 2, "word": "CRANE", "pattern": 201, "guess": 1,
+            "solved": False, "remaining": 41
+        },
+        {
+            "round": 2, "word": "SPEED", "pattern": 242, "guess": 6,
+            "solved": True, "remaining": 1, "answer": "SPEED"
+        },
+        # given up with ANSWER
+        {"round": 9, "guess": 6, "solved": False, "answer": "ÉCLAT"},
+    ],
+    Protocols.Response.STANDINGS: [
+        {
+            "players": [
+                {"name": "ana", "points": 120, "rank": 1},
+                {"name": "bob ✓", "points": -5, "rank": 2},
+            ],
+            "left": ["eve"], "round": 4, "full": False
+        },
+        {"players": [], "left": [], "round": 1, "full": True},
+    ],
+}
+
+
+def test_every_packed_type_has_samples():
+    assert set(PACKED_SAMPLES) == set(PACKED_LAYOUTS)
+
+
+@pytest.mark.parametrize(
+    "r_type, data",
+    [(r_type, data) for r_type in PACKED_SAMPLES for data in PACKED_SAMPLES[r_type]]
+)
+def test_packed_layouts(r_type, data):
+    frame = CODECS[BINARY].encode(r_type, data)
+    assert frame[4 + 1] == KIND_PACKED
+    # smaller than the json body it replaces
+    assert len(frame) < len(CODECS[JSON].encode(r_type, data))
+    assert round_trip(BINARY, r_type, data) == {"type": r_type, "data": data}
+
+
+def test_settings_layout_size():
+    settings = PACKED_SAMPLES[Protocols.Response.SETTINGS][0]
+    frame = CODECS[BINARY].encode(Protocols.Response.SETTINGS, settings)
+    assert len(frame) == 4 + TYPE_AND_KIND.size + 7
+
+
+@pytest.mark.parametrize("r_type, data", [
+    # out of range for the layout
+    (Protocols.Response.ROUND_START, {"round": 2 ** 40, "remaining": 0}),
+    # extra fields the layout has no room for
+    (Protocols.Response.ROUND_START, {"round": 1, "remaining": 2, "x": 3}),
+    # a type the layout would change (1 is not True)
+    (Protocols.Response.SETTINGS, {
+        "mode": 5, "max_guesses": 6, "rounds": 3, "infinite": 1,
+        "players": 2, "hard_mode": False
+    }),
+    # half of the guess fields
+    (Protocols.Response.GUESS_RESULT, {
+        "round": 1, "word": "CRANE", "guess": 1, "solved": False
+    }),
+    (Protocols.Response.STANDINGS, {
+        "players": [{"name": "ana", "points": 1.5, "rank": 1}],
+        "left": [], "round": 1, "full": False
+    }),
+    (Protocols.Response.STANDINGS, {
+        "players": [], "left": [None], "round": 1, "full": False
+    }),
+])
+def test_packed_falls_back_to_json(r_type, data):
+    frame = CODECS[BINARY].encode(r_type, data)
+    assert frame[4 + 1] == KIND_JSON
+    assert round_trip(BINARY, r_type, data)["data"] == data
+
+
+def test_unknown_types():
+    with pytest.raises(ValueError):
+        CODECS[BINARY].encode("protocol.nope", None)
+    free_id = next(i for i in range(256) if i not in MESSAGE_TYPES)
+    with pytest.raises(ValueError):
+        CODECS[BINARY].decode(TYPE_AND_KIND.pack(free_id, 0))
@@ -0,0 +1,56 @@
+import socket
+import threading
+import time
+import pytest
+import connection
+from connection import BacklogWriter, Connection
+
+
+@pytest.fixture(params=[True, False], ids=["sendmsg", "send"])
+def non_blocking_send(request, monkeypatch):
+    # False is the windows path (no sendmsg / MSG_DONTWAIT)
+    monkeypatch.setattr(connection, "NON_BLOCKING_SEND", request.param)
+    return request.param
+
+
+def read_all(sock: socket.socket, size: int) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        data += chunk
+    return bytes(data)
+
+
+def test_flush_never_waits_for_a_slow_reader(non_blocking_send):
+    server, client = socket.socketpair()
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+    conn = Connection(server, BacklogWriter())
+
+    messages = [bytes([i % 256]) * 1000 for i in range(500)]
+    started = time.perf_counter()
+    for message in messages:
+        conn.send(message)
+        conn.flush()
+    # nobody reads yet, so most of it has to wait in the backlog
+    assert time.perf_counter() - started < 1.0
+    assert conn.backlog_size > 0
+
+    expected = b"".join(messages)
+    assert read_all(client, len(expected)) == expected
+    conn.close()
+    client.close()
+
+
+def test_recv_waits_on_a_non_blocking_socket(non_blocking_send):
+    server, client = socket.socketpair()
+    conn = Connection(server, BacklogWriter())
+    threading.Timer(0.1, client.sendall, args=(b"late",)).start()
+
+    buffer = bytearray(16)
+    size = conn.recv_into(buffer)
+    assert buffer[:size] == b"late"
+    client.close()
+    assert conn.recv_into(buffer) == 0
+    conn.close()
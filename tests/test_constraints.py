@@ -0,0 +1,95 @@
+import random
+from collections import Counter
+from constraints import Constraints
+from feedback import feedback, pattern_digits
+
+
+def played(answer, *guesses):
+    constraints = Constraints(len(answer))
+    for guess in guesses:
+        constraints.update(guess, feedback(answer, guess))
+    return constraints
+
+
+# the hard mode rules checked row by row - greens stay, every row's
+# coloured copies are needed again, letters never coloured in any row but
+# shown grey are out
+def allowed(answer, guesses, word):
+    coloured = set()
+    grey = set()
+    for guess in guesses:
+        digits = pattern_digits(feedback(answer, guess), len(guess))
+        needed = Counter()
+        for i, (letter, digit) in enumerate(zip(guess, digits)):
+            if digit == 2 and word[i] != letter:
+                return False
+            if digit:
+                needed[letter] += 1
+                coloured.add(letter)
+            else:
+                grey.add(letter)
+        counts = Counter(word)
+        if any(counts[letter] < count for letter, count in needed.items()):
+            return False
+    return not (set(word) & (grey - coloured))
+
+
+def test_green_must_stay():
+    constraints = played("CRANE", "CRONY")
+    assert constraints.violation("TRACE") == "1st letter must be C"
+    assert constraints.violation("CHAIR") == "2nd letter must be R"
+    assert constraints.violation("CRANE") is None
+
+
+def test_yellow_must_be_used_again():
+    constraints = played("CRANE", "ACTOR")
+    assert constraints.violation("CRUMB") == "Guess must contain A"
+    assert constraints.violation("CARAT") == "T is not in the word"
+    assert constraints.violation("RACED") is None
+
+
+def test_grey_letters_are_out():
+    constraints = played("CRANE", "BUMPY")
+    assert constraints.violation("BRACE") == "B is not in the word"
+    assert constraints.violation("CRANE") is None
+
+
+def test_repeated_letters():
+    # one E green, the second E grey - E is not excluded, but one copy
+    # has to stay at the end
+    constraints = played("CRANE", "EERIE")
+    assert constraints.violation("CRANE") is None
+    assert constraints.violation("EPOCH") == "5th letter must be E"
+
+    # both Ls coloured, a guess needs two of them
+    constraints = played("LLAMA", "ALLOY")
+    assert constraints.violation("ALLAH") is None
+    assert constraints.violation("LEAFY") == "2nd letter must be L"
+    assert constraints.violation("PLAZA") == "Guess must contain L"
+
+
+def test_rows_add_up():
+    constraints = played("CRANE", "BUMPY", "TRACE")
+    assert constraints.violation("BRACE") == "B is not in the word"
+    assert constraints.violation("TRACE") == "T is not in the word"
+    assert constraints.violation("CRAVE") is None
+    # letters no row showed are still allowed
+    assert constraints.violation("GRACE") is None
+
+
+def test_random_games_match_the_rules():
+    rng = random.Random(0)
+    letters = "ABCDEL"
+    for length in (5, 6, 7):
+        for _ in range(300):
+            words = [
+                "".join(rng.choice(letters) for _ in range(length))
+                for _ in range(6)
+            ]
+            answer, guesses, probe = words[0], words[1:4], words[4]
+            constraints = played(answer, *guesses)
+            # the answer always fits its own colours
+            assert constraints.violation(answer) is None
+            assert (constraints.violation(probe) is None) == allowed(
+                answer, guesses, probe
+            )
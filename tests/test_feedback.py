@@ -0,0 +1,66 @@
+import random
+import pytest
+from feedback import (
+    ABSENT, CORRECT, PRESENT, feedback, pattern_digits, solved_pattern
+)
+
+
+def colours(answer, guess):
+    return pattern_digits(feedback(answer, guess), len(guess))
+
+
+# the rules written out the slow way - greens take their letter, every other
+# guessed letter is yellow while the answer has unmatched copies left
+def reference(answer, guess):
+    result = [ABSENT] * len(guess)
+    left = list(answer)
+    for i, letter in enumerate(guess):
+        if answer[i] == letter:
+            result[i] = CORRECT
+            left[i] = None
+    for i, letter in enumerate(guess):
+        if result[i] != CORRECT and letter in left:
+            result[i] = PRESENT
+            left[left.index(letter)] = None
+    return result
+
+
+@pytest.mark.parametrize("answer, guess, expected", [
+    ("CRANE", "CRANE", [2, 2, 2, 2, 2]),
+    ("CRANE", "BUMPY", [0, 0, 0, 0, 0]),
+    ("CRANE", "NACRE", [1, 1, 1, 1, 2]),
+    # one E in the answer, only the first guessed E is yellow
+    ("CRANE", "EERIE", [0, 0, 1, 0, 2]),
+    ("ABIDE", "SPEED", [0, 0, 1, 0, 1]),
+    # two Ss in the answer, the green one is used up first
+    ("SASSY", "SSSSS", [2, 0, 2, 2, 0]),
+    # the answer's only O is green, the earlier guessed O stays grey
+    ("ERROR", "ROBOT", [1, 0, 0, 2, 0]),
+    ("LLAMA", "ALLAY", [1, 2, 1, 1, 0]),
+    # green beats an earlier yellow for the same letter
+    ("BANAL", "ALLAY", [1, 1, 0, 2, 0]),
+    ("KEEPER", "REPEEK", [1, 2, 1, 1, 2, 1]),
+    # both Ls of the answer are green, the third guessed L gets nothing
+    ("BALLOON", "LOLLIPO", [0, 1, 2, 2, 0, 0, 1]),
+])
+def test_repeated_letters(answer, guess, expected):
+    assert colours(answer, guess) == expected
+    assert reference(answer, guess) == expected
+
+
+def test_random_words_match_the_reference():
+    rng = random.Random(0)
+    # few letters so repeats are common
+    letters = "ABCDE"
+    for length in (5, 6, 7):
+        for _ in range(2000):
+            answer = "".join(rng.choice(letters) for _ in range(length))
+            guess = "".join(rng.choice(letters) for _ in range(length))
+            assert colours(answer, guess) == reference(answer, guess)
+
+
+def test_solved_pattern():
+    for length in (5, 6, 7):
+        word = "ABCDEFG"[:length]
+        assert feedback(word, word) == solved_pattern(length)
+        assert pattern_digits(solved_pattern(length), length) == [CORRECT] * length
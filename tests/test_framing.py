@@ -0,0 +1,88 @@
+import pytest
+from framing import LENGTH_PREFIX, FrameBuffer, FrameTooLarge
+
+
+def frames(framer: FrameBuffer):
+    return list(framer)
+
+
+def test_lines_split_over_reads():
+    framer = FrameBuffer()
+    framer.feed(b'{"type": "a"}\n{"ty')
+    assert frames(framer) == [b'{"type": "a"}']
+    assert framer.pending() == 4
+
+    framer.feed(b'pe": "b"}')
+    assert frames(framer) == []
+    framer.feed(b"\n")
+    assert frames(framer) == [b'{"type": "b"}']
+    assert framer.pending() == 0
+
+
+def test_pipelined_lines_and_keep_alives():
+    framer = FrameBuffer()
+    framer.feed(b"one\n\n  \ntwo\nthree\n")
+    assert frames(framer) == [b"one", b"two", b"three"]
+
+
+def test_memoryview_chunks():
+    framer = FrameBuffer()
+    chunk = bytearray(b"abc\ndef\n")
+    framer.feed(memoryview(chunk)[:6])
+    chunk[:] = b"xxxxxxxx"  # the receive buffer is reused
+    assert frames(framer) == [b"abc"]
+    framer.feed(b"\n")
+    assert frames(framer) == [b"de"]
+
+
+def test_length_prefixed_partial_frames():
+    framer = FrameBuffer()
+    framer.length_prefixed = True
+    data = LENGTH_PREFIX.pack(5) + b"hello" + LENGTH_PREFIX.pack(0)
+    for byte in data[:-1]:
+        framer.feed(bytes([byte]))
+    assert frames(framer) == [b"hello"]
+    framer.feed(data[-1:])
+    assert frames(framer) == [b""]
+
+
+def test_switching_framing_keeps_the_rest():
+    framer = FrameBuffer()
+    framer.feed(b"json\n" + LENGTH_PREFIX.pack(3) + b"bin")
+    assert framer.pop() == b"json"
+    framer.length_prefixed = True
+    assert framer.pop() == b"bin"
+
+
+def test_oversized_line_without_newline():
+    framer = FrameBuffer(max_frame_size=8)
+    framer.feed(b"12345678")
+    assert frames(framer) == []
+    framer.feed(b"9")
+    with pytest.raises(FrameTooLarge):
+        framer.pop()
+
+
+def test_oversized_line_with_newline():
+    framer = FrameBuffer(max_frame_size=8)
+    framer.feed(b"ok\n123456789\n")
+    assert framer.pop() == b"ok"
+    with pytest.raises(FrameTooLarge):
+        framer.pop()
+
+
+def test_oversized_length_prefix():
+    framer = FrameBuffer(max_frame_size=8)
+    framer.length_prefixed = True
+    # rejected from the header alone, before the body arrives
+    framer.feed(LENGTH_PREFIX.pack(9))
+    with pytest.raises(FrameTooLarge):
+        framer.pop()
+
+
+def test_take_unread():
+    framer = FrameBuffer()
+    framer.feed(b"done\npart")
+    assert framer.pop() == b"done"
+    assert framer.take_unread() == b"part"
+    assert framer.pending() == 0
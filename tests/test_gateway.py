@@ -0,0 +1,129 @@
+import asyncio
+import socket
+import threading
+import time
+import pytest
+from conftest import LineClient, free_port
+from gateway import Gateway, HashRing, RoomDirectory
+from protocols import Protocols
+
+
+# a gateway in front of two real server nodes, run on a loop in this process
+# so the test can look at its directory
+@pytest.fixture
+def gateway(serve):
+    nodes = [
+        ("127.0.0.1", serve("main.py", "--host", "127.0.0.1"))
+        for _ in range(2)
+    ]
+    front = Gateway(nodes, "127.0.0.1", free_port())
+    loop = asyncio.new_event_loop()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        task = loop.create_task(front.serve())
+        try:
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+        # sessions still open when the test ended
+        loop.run_until_complete(asyncio.gather(
+            *asyncio.all_tasks(loop), return_exceptions=True
+        ))
+        loop.close()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", front.port), 0.5).close()
+            break
+        except OSError:
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+    yield front
+
+    def stop():
+        for task in asyncio.all_tasks(loop):
+            task.cancel()
+    loop.call_soon_threadsafe(stop)
+    thread.join(5)
+
+
+def wait_until(condition):
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def code_on(ring, node):
+    return next(
+        code for code in (f"G{i}" for i in range(1000))
+        if ring.node_for(code) == node
+    )
+
+
+def test_a_room_code_brings_both_players_to_one_node(gateway):
+    # one room on each node, the players' lobby nodes are picked by address
+    for node in gateway.ring.nodes():
+        code = code_on(gateway.ring, node)
+        host, guest = LineClient(gateway.port), LineClient(gateway.port)
+        host.send(Protocols.Request.CREATE_GAME, {
+            "room_code": code, "nickname": "ana"
+        })
+        host.wait_for(Protocols.Response.SETTINGS)
+        assert gateway.directory.lookup(code) == node
+
+        guest.send(Protocols.Request.JOIN_GAME, {
+            "room_code": code, "nickname": "bob"
+        })
+        for client in (host, guest):
+            message = client.wait_for(Protocols.Response.ROUND_START)
+            assert message["data"]["round"] == 0
+        assert gateway.directory.connections[code] == 2
+
+        host.close()
+        guest.close()
+        wait_until(lambda: gateway.directory.lookup(code) is None)
+
+
+def test_joining_an_unknown_code_claims_nothing(gateway):
+    client = LineClient(gateway.port)
+    for r_type in (Protocols.Request.JOIN_GAME, Protocols.Request.SPECTATE):
+        client.send(r_type, {"room_code": "NOPE", "nickname": "ana"})
+        message = client.wait_for(Protocols.Response.INVALID_REQUEST)
+        assert message["data"] == "Room not found"
+        assert gateway.directory.lookup("NOPE") is None
+    assert len(gateway.directory) == 0
+
+    # the session can still open a room afterwards
+    client.send(Protocols.Request.CREATE_GAME, {
+        "room_code": "OPEN", "nickname": "ana"
+    })
+    client.wait_for(Protocols.Response.SETTINGS)
+    assert gateway.directory.lookup("OPEN") == gateway.ring.node_for("OPEN")
+    client.close()
+
+
+def test_open_rooms_stay_put_when_a_node_is_added():
+    nodes = [("10.0.0.1", 1), ("10.0.0.2", 1)]
+    front = Gateway(nodes)
+    codes = [f"R{i}" for i in range(200)]
+    for code in codes:
+        front.directory.acquire(code, front.ring.node_for(code))
+    front.add_node(("10.0.0.3", 1))
+    assert all(front.route(code) in nodes for code in codes)
+    moved = [code for code in codes if front.ring.node_for(code) not in nodes]
+    assert 0 < len(moved) < len(codes) / 2
+
+    directory = RoomDirectory()
+    directory.acquire("X", nodes[0])
+    directory.acquire("X", nodes[1])
+    assert directory.lookup("X") == nodes[0]
+    directory.release("X")
+    assert directory.lookup("X") == nodes[0]
+    directory.release("X")
+    assert directory.lookup("X") is None
+    assert HashRing().nodes() == []
@@ -0,0 +1,57 @@
+import time
+from matchmaking import (
+    Matchmaker, bucket_key, bucket_of, nearby_buckets, route_key
+)
+
+
+def settings(mode=5, attempts=6, rounds=5, infinite=False):
+    return bucket_of({
+        "mode": mode, "attempts": attempts, "rounds": rounds,
+        "infinite": infinite
+    })
+
+
+def test_widening_never_leaves_the_routed_process():
+    # workers and the gateway place a queue by route_key, every bucket a
+    # widened search looks at must be placed in the same process
+    for mode in (5, 6, 7):
+        for attempts in range(2, mode + 2):
+            for rounds in range(1, 8):
+                for infinite in (False, True):
+                    bucket = settings(mode, attempts, rounds, infinite)
+                    for other in nearby_buckets(bucket):
+                        assert route_key(other) == route_key(bucket)
+    assert route_key(settings(5)) != route_key(settings(6))
+    assert route_key(settings(5)) != route_key(settings(5, infinite=True))
+    # the stats still tell the exact buckets apart
+    assert bucket_key(settings(5, 6)) != bucket_key(settings(5, 5))
+
+
+def test_exact_pairs_first_then_widened_after_the_timeout():
+    matchmaker = Matchmaker(widen_seconds=0.05)
+    assert matchmaker.find("a", "ana", settings(attempts=6)) is None
+    assert matchmaker.find("b", "bob", settings(attempts=5)) is None
+    # nobody waited long enough yet
+    assert matchmaker.widen() == []
+
+    host, guest = matchmaker.find("c", "cid", settings(attempts=6))
+    assert (host.client, guest.client) == ("a", "c")
+
+    assert matchmaker.find("d", "dan", settings(attempts=6)) is None
+    time.sleep(0.06)
+    [(host, guest)] = matchmaker.widen()
+    # b waited longest and takes d, who keeps its settings
+    assert (host.client, guest.client) == ("d", "b")
+    assert host.bucket == settings(attempts=6)
+    assert not matchmaker.queued("b") and not matchmaker.queued("d")
+
+
+def test_same_nickname_is_skipped():
+    matchmaker = Matchmaker(widen_seconds=0.0)
+    assert matchmaker.find("a", "ana", settings()) is None
+    assert matchmaker.find("a2", "ana", settings()) is None
+    assert matchmaker.widen() == []
+    host, guest = matchmaker.find("b", "bob", settings())
+    assert host.client == "a"
+    assert matchmaker.cancel("a2")
+    assert matchmaker.stats()["queued"] == 0
@@ -0,0 +1,183 @@
+import bisect
+import random
+import threading
+from ranking import RankedSkipList, RankingIndex
+
+
+def random_keys(rng, count):
+    names = [f"player{i}" for i in range(count)]
+    return [(-rng.randint(0, 20), name) for name in names]
+
+
+# every rank, range and count the skip list answers, checked against the
+# sorted keys
+def check(skip_list, expected):
+    assert len(skip_list) == len(expected)
+    assert skip_list.range(1, len(expected) + 5) == expected
+    for rank, key in enumerate(expected, start=1):
+        assert skip_list.rank(key) == rank
+        assert skip_list.node_at(rank).key == key
+        assert skip_list.count_before(key) == rank - 1
+        assert skip_list.count_before(key, inclusive=True) == rank
+    assert skip_list.node_at(0) is None
+    assert skip_list.node_at(len(expected) + 1) is None
+
+
+def test_insert_and_remove_match_a_sorted_list():
+    rng = random.Random(1)
+    skip_list = RankedSkipList()
+    expected = []
+    keys = random_keys(rng, 300)
+    for key in keys:
+        skip_list.insert(key)
+        bisect.insort(expected, key)
+    check(skip_list, expected)
+
+    rng.shuffle(keys)
+    for key in keys[:200]:
+        assert skip_list.remove(key)
+        expected.remove(key)
+        assert not skip_list.remove(key)
+        assert skip_list.rank(key) is None
+    check(skip_list, expected)
+
+    for key in keys[:200]:
+        skip_list.insert(key)
+    check(skip_list, sorted(keys))
+
+
+def test_from_sorted_matches_inserts():
+    rng = random.Random(2)
+    keys = sorted(random_keys(rng, 500))
+    skip_list = RankedSkipList.from_sorted(keys)
+    check(skip_list, keys)
+    # still a working list after the bulk load
+    skip_list.remove(keys[10])
+    skip_list.insert((-100, "leader"))
+    check(skip_list, sorted(keys[:10] + keys[11:] + [(-100, "leader")]))
+
+
+def test_ranges_and_ends():
+    keys = [(-3, "a"), (-2, "b"), (-2, "c"), (0, "d")]
+    skip_list = RankedSkipList.from_sorted(keys)
+    assert skip_list.range(2, 2) == keys[1:3]
+    assert skip_list.range(4, 10) == keys[3:]
+    assert skip_list.range(5, 10) == []
+    assert skip_list.range(0, 1) == keys[:1]
+    assert RankedSkipList().range(1, 10) == []
+    assert RankedSkipList().rank((0, "a")) is None
+
+
+def test_index_pages_against_sorted_rows():
+    rng = random.Random(3)
+    rows = [(f"p{i:03}", rng.randint(0, 10)) for i in range(120)]
+    index = RankingIndex()
+    index.load(rows)
+    for _ in range(50):
+        username = f"p{rng.randrange(150):03}"
+        index.add_wins(username, rng.randint(1, 3))
+
+    ordered = sorted((-wins, name) for name, wins in index.wins.items())
+    expected = [
+        {"rank": rank, "username": name, "wins": -negative}
+        for rank, (negative, name) in enumerate(ordered, start=1)
+    ]
+    assert index.top(10) == [
+        {"username": row["username"], "wins": row["wins"]} for row in expected[:10]
+    ]
+
+    # offset pages and cursor pages walk the same rows
+    walked = []
+    page = index.page(limit=7)
+    while True:
+        walked += page["rows"]
+        if page["next"] is None:
+            break
+        page = index.page(limit=7, after=page["next"])
+    assert walked == expected
+    assert index.page(limit=7, offset=14)["rows"] == expected[14:21]
+    assert index.page(limit=7, offset=len(expected))["rows"] == []
+
+
+def test_index_rank_and_neighbours():
+    index = RankingIndex()
+    index.load([("a", 5), ("b", 4), ("c", 4), ("d", 1)])
+    result = index.rank("c", radius=1)
+    assert result["rank"] == 3 and result["wins"] == 4
+    assert [row["username"] for row in result["above"]] == ["b"]
+    assert [row["username"] for row in result["below"]] == ["d"]
+
+    index.add_wins("d", 5)
+    assert index.rank("d", radius=0)["rank"] == 1
+    assert index.rank("nobody")["rank"] is None
+
+
+def test_database_pages_carry_the_rank(db, monkeypatch):
+    rng = random.Random(7)
+    wins = {f"player{i}": rng.randint(1, 20) for i in range(40)}
+    db.increase_wins_batch(wins)
+    index = RankingIndex()
+    index.load(wins.items())
+
+    # the first page counts nothing, later pages start from the cursor's rank
+    def no_count(*args):
+        raise AssertionError("rank counted")
+    real_rank_of = db.rank_of
+    monkeypatch.setattr(db, "rank_of", no_count)
+
+    walked = []
+    page = db.get_leaderboard_page(limit=7)
+    assert page == index.page(limit=7)
+    while True:
+        walked += page["rows"]
+        if page["next"] is None:
+            break
+        assert page["next"][2] == page["rows"][-1]["rank"]
+        page = db.get_leaderboard_page(limit=7, after=page["next"])
+    assert walked == index.around_rank(1, len(wins))
+
+    # a cursor without the rank still works, it is counted
+    monkeypatch.setattr(db, "rank_of", real_rank_of)
+    cursor = walked[13]
+    page = db.get_leaderboard_page(
+        limit=7, after=[cursor["wins"], cursor["username"]]
+    )
+    assert page["rows"] == walked[14:21]
+
+
+def test_index_follows_wins_committed_from_many_threads(db):
+    from recorder import WinRecorder
+    db.increase_wins_batch({f"old{i}": i for i in range(1, 30)})
+    index = db.enable_ranking_index()
+    assert len(index) == 29
+
+    recorder = WinRecorder(db, max_batch=7)
+    names = [f"old{i}" for i in range(0, 40, 3)] + ["new"]
+
+    def play(seed):
+        rng = random.Random(seed)
+        for _ in range(200):
+            recorder.record(rng.choice(names))
+
+    threads = [threading.Thread(target=play, args=(seed,)) for seed in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    recorder.close()
+    assert recorder.stats()["committed"] == 1600
+
+    # every answer from the index matches the database read without it
+    indexed = (
+        db.get_leaderboard(),
+        db.get_leaderboard_page(limit=100),
+        [db.get_rank(name, 2) for name in names],
+    )
+    db.ranking = None
+    db.invalidate_leaderboard()
+    assert indexed == (
+        db.get_leaderboard(),
+        db.get_leaderboard_page(limit=100),
+        [db.get_rank(name, 2) for name in names],
+    )
+    check(index.ranks, sorted((-wins, name) for name, wins in index.wins.items()))
@@ -0,0 +1,126 @@
+import sqlite3
+import threading
+import pytest
+from db import DB
+from recorder import WinRecorder
+
+
+def wins(db):
+    return dict(db.fetch_all("SELECT username, wins FROM wins;"))
+
+
+# a database that holds every commit until released, and can refuse rows the
+# way postgres refuses a username over VARCHAR(255)
+class SlowDB(DB):
+    def __init__(self):
+        super().__init__()
+        self.gate = threading.Event()
+        self.gate.set()
+        self.batches = []
+        self.transient_failures = 0
+
+    def increase_wins_batch(self, wins_by_username):
+        self.gate.wait()
+        if self.transient_failures:
+            self.transient_failures -= 1
+            raise sqlite3.OperationalError("database is locked")
+        if any(len(name) > 255 for name in wins_by_username):
+            raise sqlite3.IntegrityError("value too long")
+        self.batches.append(dict(wins_by_username))
+        super().increase_wins_batch(wins_by_username)
+
+
+@pytest.fixture
+def slow_db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    database = SlowDB()
+    yield database
+    database.gate.set()
+    database.close()
+
+
+def test_queued_wins_are_merged_into_one_commit(slow_db):
+    recorder = WinRecorder(slow_db)
+    slow_db.gate.clear()
+    recorder.record("first")
+    # the writer is now stuck on the first commit, everything after it waits
+    # in the queue and goes out together
+    while recorder.in_flight != {"first": 1}:
+        pass
+    for name in ["ana", "bob", "ana", "ana"]:
+        recorder.record(name)
+    slow_db.gate.set()
+    recorder.flush()
+
+    assert slow_db.batches == [{"first": 1}, {"ana": 3, "bob": 1}]
+    assert wins(slow_db) == {"first": 1, "ana": 3, "bob": 1}
+    stats = recorder.stats()
+    assert stats["recorded"] == stats["committed"] == 5
+    assert stats["commits"] == 2
+    recorder.close()
+
+
+def test_close_commits_what_is_still_queued(db):
+    recorder = WinRecorder(db)
+    for _ in range(50):
+        recorder.record("ana")
+    recorder.record("bob")
+    recorder.close()
+
+    assert not recorder.thread.is_alive()
+    assert wins(db) == {"ana": 50, "bob": 1}
+
+
+def test_refused_rows_are_dropped_and_the_rest_committed(slow_db):
+    recorder = WinRecorder(slow_db)
+    slow_db.gate.clear()
+    recorder.record("first")
+    while not recorder.in_flight:
+        pass
+    poison = "x" * 300
+    for name in ["ana", poison, "bob", "cid", poison]:
+        recorder.record(name)
+    slow_db.gate.set()
+    recorder.flush()
+
+    assert wins(slow_db) == {"first": 1, "ana": 1, "bob": 1, "cid": 1}
+    stats = recorder.stats()
+    assert stats["dropped"] == 2
+    assert stats["committed"] == 4
+
+    # later wins are not held up behind it
+    recorder.record("ana")
+    recorder.flush()
+    assert wins(slow_db)["ana"] == 2
+    recorder.close()
+
+
+def test_transient_errors_are_retried(slow_db, monkeypatch):
+    monkeypatch.setattr("recorder.RETRY_SECONDS", 0.01)
+    slow_db.transient_failures = 2
+    recorder = WinRecorder(slow_db)
+    recorder.record("ana")
+    recorder.flush()
+
+    assert wins(slow_db) == {"ana": 1}
+    stats = recorder.stats()
+    assert stats["failed_commits"] == 2
+    assert stats["dropped"] == 0
+    recorder.close()
+
+
+def test_record_never_blocks_on_a_full_queue(slow_db):
+    recorder = WinRecorder(slow_db, max_queued=3)
+    slow_db.gate.clear()
+    recorder.record("first")
+    while not recorder.in_flight:
+        pass
+    for _ in range(5):
+        recorder.record("ana")
+    stats = recorder.stats()
+    assert stats["dropped"] == 2
+    assert stats["queue_depth"] == 3
+
+    slow_db.gate.set()
+    recorder.close()
+    assert wins(slow_db) == {"first": 1, "ana": 3}
@@ -0,0 +1,101 @@
+import threading
+from registry import RoomRegistry
+from room import Room
+
+
+def new_room(players=2):
+    return Room({
+        "mode": 5, "rounds": 3, "infinite": False, "max_guesses": 6,
+        "players": players
+    })
+
+
+def empty(registry):
+    return all(count == 0 for count in registry.stats().values())
+
+
+def test_join_leave_and_reverse_indexes():
+    registry = RoomRegistry()
+    room = new_room()
+    for client in ("host", "guest", "watcher"):
+        registry.connect(client)
+    registry.create_room("ABCD", room, "host", "ana")
+    assert registry.join_room(room, "guest", "bob")
+    registry.spectate(room, "watcher")
+
+    assert registry.room_by_code("ABCD") is room
+    assert registry.code_of(room) == "ABCD"
+    assert registry.room_of("guest") is room
+    assert registry.name_of("guest") == "bob"
+    assert room.spectators == {"watcher"}
+
+    # a taken nickname or a full room is refused without touching the indexes
+    assert not registry.join_room(room, "late", "ana")
+    assert not registry.join_room(room, "late", "cid")
+    assert registry.room_of("late") is None and registry.name_of("late") is None
+
+    left, remaining = registry.leave_room("guest")
+    assert left is room and remaining == ["host"]
+    assert registry.room_by_code("ABCD") is room
+
+    # the last human leaving drops the room, spectators go with it
+    left, remaining = registry.disconnect("host")
+    assert left is room and remaining == []
+    assert registry.room_by_code("ABCD") is None
+    assert registry.code_of(room) is None
+    registry.drop_spectators(room)
+    for client in ("guest", "watcher"):
+        registry.disconnect(client)
+    assert empty(registry)
+
+
+def test_a_new_room_under_a_taken_code_replaces_it():
+    registry = RoomRegistry()
+    old, new = new_room(), new_room()
+    registry.create_room("SAME", old, "a", "ana")
+    registry.create_room("SAME", new, "b", "bob")
+    assert registry.room_by_code("SAME") is new
+
+    # the old room's last player leaving must not drop the new room
+    registry.leave_room("a")
+    assert registry.room_by_code("SAME") is new
+    registry.leave_room("b")
+    assert registry.room_by_code("SAME") is None
+
+
+def test_concurrent_joins_fill_every_seat_once():
+    registry = RoomRegistry()
+    room = new_room(players=8)
+    registry.create_room("FULL", room, "host", "host")
+
+    results = {}
+    start = threading.Barrier(32)
+
+    def join(number):
+        client = f"client{number}"
+        registry.connect(client)
+        start.wait()
+        results[client] = registry.join_room(room, client, f"player{number}")
+
+    threads = [threading.Thread(target=join, args=(i,)) for i in range(32)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    joined = [client for client, ok in results.items() if ok]
+    assert len(joined) == 7
+    assert set(room.round_indexes) == set(joined) | {"host"}
+    assert all(registry.room_of(client) is room for client in joined)
+
+    # every client going away at once leaves nothing behind
+    clients = list(results) + ["host"]
+    threads = [
+        threading.Thread(target=registry.disconnect, args=(client,))
+        for client in clients
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert empty(registry)
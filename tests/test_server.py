@@ -0,0 +1,134 @@
+import json
+import time
+import pytest
+from codec import CODECS, JSON
+from conftest import LineClient
+from protocols import Protocols
+
+
+@pytest.fixture
+def port(serve):
+    return serve("main.py", "--host", "127.0.0.1")
+
+
+# a started two player room of one round
+def start_game(port, code, host_name, guest_name):
+    host, guest = LineClient(port), LineClient(port)
+    host.send(Protocols.Request.CREATE_GAME, {
+        "room_code": code, "nickname": host_name, "rounds": 1
+    })
+    host.wait_for(Protocols.Response.SETTINGS)
+    guest.send(Protocols.Request.JOIN_GAME, {
+        "room_code": code, "nickname": guest_name
+    })
+    for client in (host, guest):
+        client.wait_for(Protocols.Response.ROUND_START)
+    return host, guest
+
+
+def leaderboard_names(client):
+    client.send(Protocols.Request.GET_LEADERBOARD, None)
+    rows = client.wait_for(Protocols.Response.LEADERBOARD)["data"]
+    return {row["username"] for row in rows}
+
+
+def test_a_lone_player_does_not_win(port):
+    host, guest = start_game(port, "LONE", "ana", "bob")
+    guest.send(Protocols.Request.LEAVE, None)
+    host.wait_for(Protocols.Response.OPPONENT_LEFT)
+
+    # giving up the last round no longer ends in a win
+    host.send(Protocols.Request.ANSWER, None)
+    host.send(Protocols.Request.GET_LEADERBOARD, None)
+    message = host.wait_for(
+        Protocols.Response.WINNER, Protocols.Response.LEADERBOARD
+    )
+    assert message["type"] == Protocols.Response.LEADERBOARD
+    host.close()
+    guest.close()
+
+    # a finished game records its winner, wins are committed in order so
+    # once it shows up ana's game is known to have recorded nothing
+    first, second = start_game(port, "FULL", "cid", "dan")
+    for client in (first, second):
+        client.send(Protocols.Request.ANSWER, None)
+    winner = first.wait_for(Protocols.Response.WINNER)["data"]
+    deadline = time.monotonic() + 5
+    while winner not in leaderboard_names(first):
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    assert "ana" not in leaderboard_names(first)
+    first.close()
+    second.close()
+
+
+# stands in for a connection, keeps what the server sent it
+class FakeClient:
+    def __init__(self):
+        self.codec = CODECS[JSON]
+        self.sent = []
+
+    def send(self, data):
+        self.sent.append(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def types(self):
+        return [json.loads(frame)["type"] for frame in self.sent]
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    from main import Server
+    monkeypatch.chdir(tmp_path)
+    instance = Server("127.0.0.1", 0)
+    instance.bots_ready.wait(60)
+    recorded = []
+    monkeypatch.setattr(instance.recorder, "record", recorded.append)
+    instance.recorded = recorded
+    yield instance
+    instance.shutdown()
+    instance.server.close()
+
+
+def play_to_the_end(server, bot):
+    room = server.new_room({
+        "mode": 5, "rounds": 1, "infinite": False, "max_guesses": 6
+    })
+    ana, bob = FakeClient(), FakeClient()
+    server.open_room(room, "CODE", ana, "ana", bot)
+    if bot is None:
+        server.registry.join_room(room, bob, "bob")
+        server.start_game(room)
+    room.client_finished(ana, 1, 1.0, True)
+    server.end_game(room)
+    return room, ana
+
+
+def test_games_with_bots_are_not_recorded(server):
+    room, ana = play_to_the_end(server, "easy")
+    assert room.bots
+    assert Protocols.Response.WINNER in ana.types()
+    assert server.recorded == []
+
+    room, ana = play_to_the_end(server, None)
+    assert Protocols.Response.WINNER in ana.types()
+    assert server.recorded == ["ana"]
+
+
+def test_nothing_is_encoded_for_bots(server, monkeypatch):
+    room, ana = play_to_the_end(server, "easy")
+    [bot] = room.bots
+    encoded = []
+    for codec in CODECS.values():
+        def encode(r_type, data, codec=codec, real=codec.encode):
+            encoded.append(codec.name)
+            return real(r_type, data)
+        monkeypatch.setattr(codec, "encode", encode)
+
+    # the human's json frame is the only encoding a broadcast does
+    server.broadcast(Protocols.Response.WINNER, "ana", room.audience())
+    assert encoded == [JSON]
+    assert bot.codec.encode(Protocols.Response.WINNER, "ana") == b""
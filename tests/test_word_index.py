@@ -0,0 +1,57 @@
+import random
+from feedback import feedback
+from word_index import WordIndex
+
+WORDS = (
+    "CRANE", "CRATE", "TRACE", "REACT", "CARET", "EERIE", "SPEED", "ABIDE",
+    "LLAMA", "ALLAY", "BANAL", "SASSY", "ERROR", "ROBOT", "NACRE", "BUMPY",
+)
+
+
+# indexes of the words that would have shown the pattern for the guess
+def brute_force(words, guess, pattern):
+    return [i for i, word in enumerate(words) if feedback(word, guess) == pattern]
+
+
+def test_narrow_matches_scoring_every_word():
+    index = WordIndex(WORDS)
+    for answer in WORDS:
+        for guess in WORDS:
+            pattern = feedback(answer, guess)
+            found = index.narrow(index.all, guess, pattern)
+            assert list(index.members(found)) == brute_force(WORDS, guess, pattern)
+            assert index.count(found) == len(brute_force(WORDS, guess, pattern))
+
+
+def test_narrowing_twice_keeps_the_answer():
+    rng = random.Random(0)
+    letters = "ABCDEL"
+    words = tuple(sorted({
+        "".join(rng.choice(letters) for _ in range(6)) for _ in range(400)
+    }))
+    index = WordIndex(words)
+    for _ in range(200):
+        answer, first, second = (words[rng.randrange(len(words))] for _ in range(3))
+        candidates = index.narrow(index.all, first, feedback(answer, first))
+        candidates = index.narrow(candidates, second, feedback(answer, second))
+        expected = [
+            i for i, word in enumerate(words)
+            if feedback(word, first) == feedback(answer, first)
+            and feedback(word, second) == feedback(answer, second)
+        ]
+        assert list(index.members(candidates)) == expected
+        assert words.index(answer) in expected
+
+
+def test_pick_and_empty_sets():
+    index = WordIndex(WORDS)
+    assert index.count(index.all) == len(WORDS)
+    assert index.pick(0) is None
+    assert len(index.members(0)) == 0
+
+    pattern = feedback("CRANE", "SPEED")
+    candidates = index.narrow(index.all, "SPEED", pattern)
+    possible = {WORDS[i] for i in brute_force(WORDS, "SPEED", pattern)}
+    assert len(possible) > 1
+    for _ in range(20):
+        assert index.pick(candidates) in possible
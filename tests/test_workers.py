@@ -0,0 +1,75 @@
+import socket
+import threading
+import pytest
+from conftest import LineClient
+from protocols import Protocols
+from workers import Shard, owner_of, supported, switchboard
+
+pytestmark = pytest.mark.skipif(
+    not supported(), reason="workers need SO_REUSEPORT and fd passing"
+)
+
+
+def code_owned_by(worker, workers):
+    return next(
+        code for code in (f"ROOM{i}" for i in range(1000))
+        if owner_of(code, workers) == worker
+    )
+
+
+def test_every_code_has_one_owner():
+    shards = [Shard(i, 3, None) for i in range(3)]
+    for number in range(300):
+        code = f"code{number}"
+        assert [shard.owns(code) for shard in shards].count(True) == 1
+    # the same in every process (no per process string hash)
+    assert owner_of("ABCD", 3) == owner_of("ABCD", 3)
+
+
+def test_hand_off_moves_the_socket_to_the_owner():
+    # the parent's switchboard between two workers, as run_workers sets it up
+    parent_ends, shards = [], []
+    for index in range(2):
+        parent_end, worker_end = socket.socketpair(
+            socket.AF_UNIX, socket.SOCK_SEQPACKET
+        )
+        parent_ends.append(parent_end)
+        shards.append(Shard(index, 2, worker_end))
+    threading.Thread(target=switchboard, args=(parent_ends,), daemon=True).start()
+
+    client, accepted = socket.socketpair()
+    code = code_owned_by(1, 2)
+    message = {"type": Protocols.Request.JOIN_GAME, "data": {"room_code": code}}
+    shards[0].hand_off(accepted, code, "binary", message, b"next request")
+    # the worker that accepted it no longer holds the socket
+    assert accepted.fileno() == -1
+
+    sock, wire_format, received, unread = shards[1].receive()
+    assert (wire_format, received, unread) == ("binary", message, b"next request")
+    # the same connection, both ways
+    sock.sendall(b"hello")
+    assert client.recv(5) == b"hello"
+    client.sendall(b"back")
+    assert sock.recv(4) == b"back"
+    sock.close()
+    client.close()
+
+
+def test_players_meet_whichever_worker_accepted_them(serve):
+    port = serve("main.py", "--host", "127.0.0.1", "--workers", "2")
+    # the kernel spreads the connections over both workers, so some of these
+    # rooms are created or joined on the worker that does not own them
+    for number in range(6):
+        code = f"W{number}"
+        host, guest = LineClient(port), LineClient(port)
+        host.send(Protocols.Request.CREATE_GAME, {
+            "room_code": code, "nickname": "ana"
+        })
+        assert host.wait_for(Protocols.Response.SETTINGS)["data"]["mode"] == 5
+        guest.send(Protocols.Request.JOIN_GAME, {
+            "room_code": code, "nickname": "bob"
+        })
+        for client in (host, guest):
+            message = client.wait_for(Protocols.Response.ROUND_START)
+            assert message["data"]["round"] == 0
+            client.close()